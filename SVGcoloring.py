@@ -1,6 +1,39 @@
 import pandas as pd
+import numpy as np
 from bs4 import BeautifulSoup
 import os
+import uuid
+from map_templates import templateStore
+from datastore import getStore
+from crosswalk import STATE_CODES
+
+# ---------------- Output ----------------
+# outputDir=None returns the SVG text instead of writing it, so a caller can
+# keep its render private to the request. Files are written under a unique
+# temporary name and renamed into place, so readers never see a partial map.
+def writeAtomic(outputFile, svg):
+    tmpFile = f"{outputFile}.{uuid.uuid4().hex}.tmp"
+    with open(tmpFile, "w", encoding="utf-8") as f:
+        f.write(svg)
+    os.replace(tmpFile, outputFile)
+    return outputFile
+
+def saveSvg(svg, outputDir, fileName):
+    if outputDir is None:
+        return svg
+    return writeAtomic(os.path.join(outputDir, fileName), svg)
+
+# ---------------- Recoloring ----------------
+# Maps are parsed once into templates (map_templates.py); a render only
+# works out the colors and fills the template's attribute slots. store is the
+# DataStore to color from (default: the current one).
+def regionColors(names, categories, categoryColors, default="#ffffff"):
+    # Whole-column name -> color mapping. When a name repeats, the last row
+    # wins, as it did when rows were applied one by one.
+    colors = categories.astype(str).str.strip().map(categoryColors).fillna(default)
+    table = pd.DataFrame({"name": names, "color": colors}).dropna(subset=["name"])
+    table = table.drop_duplicates("name", keep="last")
+    return dict(zip(table["name"], table["color"]))
 
 # ---------------- Rainfall Classification ----------------
 def classifyRainfall(mm):
@@ -16,151 +49,90 @@ def classifyRainfall(mm):
         return "D"
     else:
         return "LD"
-    
-def rainfallColoring(stateName,outputDir="static"):
-    outputFile = os.path.join(outputDir, f"rainfall.svg")
-    df = pd.read_csv("databases\\rainfall_database.csv")
-    df["SvgCat"] = df["NORMAL"].apply(classifyRainfall)
 
+def classifyRainfallColumn(mm):
+    # Vectorized classifyRainfall
+    mm = mm.astype(float)
+    category = np.select(
+        [mm.isna() | (mm <= 0), mm > 1500, mm > 1000, mm > 700, mm > 400],
+        ["*", "LE", "E", "N", "D"],
+        default="LD"
+    )
+    return pd.Series(category, index=mm.index)
+
+def rainfallColoring(stateName,outputDir="static", highlight=None, store=None):
+    store = store or getStore()
     categoryColors = {
         "LE": "#08306b", "E": "#2171b5", "N": "#6baed6",
         "D": "#9ecae1", "LD": "#c6dbef", "*": "#f2f2f2"
     }
 
-    with open(f"maps\\{stateName}.svg", "r", encoding="utf-8") as f:
-        soup = BeautifulSoup(f, "lxml-xml")
-    if not soup.find("svg").has_attr("xmlns"):
-        soup.find("svg")["xmlns"] = "http://www.w3.org/2000/svg"
-
-    df["NAME"] = df["NAME"].str.strip().str.upper()
-    for _, row in df.iterrows():
-        district = row["NAME"]
-        cat = str(row["SvgCat"]).strip()
-        color = categoryColors.get(cat, "#ffffff")
-        for path in soup.find_all("path"):
-            if path.get("id", "").strip().upper() == district:
-                path["fill"] = color
-                path["stroke"] = "#000000"
-                path["stroke-width"] = "0.75"
-                break
-
-    with open(outputFile, "w", encoding="utf-8") as f:
-        f.write(str(soup))
-    return outputFile
+    names = pd.Series(store.keys("rainfall_database", "NAME"))
+    normal = pd.Series(store.column("rainfall_database", "NORMAL"))
+    colors = regionColors(names, classifyRainfallColumn(normal), categoryColors)
+    svg = templateStore.get(stateName).render(colors, highlight=highlight)
+    return saveSvg(svg, outputDir, "rainfall.svg")
 
-def preMonsoonColoring(stateName,outputDir="static"):
-    outputFile = os.path.join(outputDir, f"premonsoon.svg")
-    df = pd.read_csv("databases\\groundwater2023.csv")
+def preMonsoonColoring(stateName,outputDir="static", highlight=None, store=None):
+    store = store or getStore()
     categoryColors = {
         "0 to 2": "#ffffcc", "2 to 5": "#ffeda0", "5 to 10": "#fed976",
         "10 to 20": "#feb24c", "20 to 40": "#fd8d3c", ">40": "#e31a1c"
     }
 
-    with open(f"maps\\{stateName}.svg", "r", encoding="utf-8") as f:
-        soup = BeautifulSoup(f, "lxml-xml")
-    if not soup.find("svg").has_attr("xmlns"):
-        soup.find("svg")["xmlns"] = "http://www.w3.org/2000/svg"
-
-    df["District"] = df["District"].str.strip().str.upper()
-    for _, row in df.iterrows():
-        district = row["District"]
-        cat = str(row["Pre_Monsoon"]).strip()
-        color = categoryColors.get(cat, "#ffffff")
-        for path in soup.find_all("path"):
-            if path.get("id", "").strip().upper() == district:
-                path["fill"] = color
-                path["stroke"] = "#000000"
-                path["stroke-width"] = "0.75"
-                break
-
-    with open(outputFile, "w", encoding="utf-8") as f:
-        f.write(str(soup))
-    return outputFile
+    names = pd.Series(store.keys("groundwater2023", "District"))
+    depths = pd.Series(store.column("groundwater2023", "Pre_Monsoon"))
+    colors = regionColors(names, depths, categoryColors)
+    svg = templateStore.get(stateName).render(colors, highlight=highlight)
+    return saveSvg(svg, outputDir, "premonsoon.svg")
 
-def postMonsoonColoring(stateName,outputDir="static"):
-    outputFile = os.path.join(outputDir, f"postmonsoon.svg")
-    df = pd.read_csv("databases\\groundwater2023.csv")
+def postMonsoonColoring(stateName,outputDir="static", highlight=None, store=None):
+    store = store or getStore()
     categoryColors = {
         "0 to 2": "#00441b", "2 to 5": "#006d2c", "5 to 10": "#238b45",
         "10 to 20": "#41ab5d", "20 to 40": "#74c476", ">40": "#c7e9c0"
     }
 
-    with open(f"maps\\{stateName}.svg", "r", encoding="utf-8") as f:
-        soup = BeautifulSoup(f, "lxml-xml")
-    if not soup.find("svg").has_attr("xmlns"):
-        soup.find("svg")["xmlns"] = "http://www.w3.org/2000/svg"
-
-    df["District"] = df["District"].str.strip().str.upper()
-    for _, row in df.iterrows():
-        district = row["District"]
-        cat = str(row["Pre_Monsoon"]).strip()
-        color = categoryColors.get(cat, "#ffffff")
-        for path in soup.find_all("path"):
-            if path.get("id", "").strip().upper() == district:
-                path["fill"] = color
-                path["stroke"] = "#000000"
-                path["stroke-width"] = "0.75"
-                break
-
-    with open(outputFile, "w", encoding="utf-8") as f:
-        f.write(str(soup))
-    return outputFile
+    names = pd.Series(store.keys("groundwater2023", "District"))
+    depths = pd.Series(store.column("groundwater2023", "Pre_Monsoon"))
+    colors = regionColors(names, depths, categoryColors)
+    svg = templateStore.get(stateName).render(colors, highlight=highlight)
+    return saveSvg(svg, outputDir, "postmonsoon.svg")
 
-def aquiferColoring(outputDir="static"):
-    outputFile = os.path.join(outputDir, f"aquiferMap.svg")
-    df = pd.read_csv("databases\\statewise_aquifier.csv")
+def aquiferColoring(outputDir="static", highlight=None, store=None):
+    store = store or getStore()
     aquiferColors = {
         "ALLUVIUM": "#FFF3B0", "SANDSTONE": "#A3C4F3", "BASALT": "#B9FBC0",
         "CRYSTALLINE": "#FFADAD", "LIMESTONE": "#D7BDE2", "OTHER": "#E6B8A2"
     }
-    stateCodeMap = {
-        "ANDHRA PRADESH": "AP","ARUNACHAL PRADESH": "AR","ASSAM": "AS","BIHAR": "BR",
-        "CHHATTISGARH": "CG","GOA": "GA","GUJARAT": "GJ","HARYANA": "HR",
-        "HIMACHAL PRADESH": "HP","JAMMU & KASHMIR": "JK","LADAKH": "LA","JHARKHAND": "JH",
-        "KARNATAKA": "KA","KERALA": "KL","MADHYA PRADESH": "MP","MAHARASHTRA": "MH",
-        "MANIPUR": "MN","MEGHALAYA": "ML","MIZORAM": "MZ","NAGALAND": "NL","ODISHA": "OD",
-        "PUNJAB": "PB","RAJASTHAN": "RJ","SIKKIM": "SK","TAMIL NADU": "TN","TELANGANA": "TG",
-        "TRIPURA": "TR","UTTAR PRADESH": "UP","UTTARAKHAND": "UK","WEST BENGAL": "WB",
-        "DELHI": "DL","CHANDIGARH": "CH","PUDUCHERRY": "PY","DAMAN & DIU": "DD",
-        "ANDAMAN & NICOBAR": "AN"
-    }
 
-    with open("maps\\INDIA.svg", "r", encoding="utf-8") as f:
-        soup = BeautifulSoup(f, "lxml-xml")
-
-    for _, row in df.iterrows():
-        state = row["State"].strip().upper()
-        aquifer = row["Dominant_Aquifer_Type"].upper()
-        stateCode = stateCodeMap.get(state)
-        if not stateCode: continue
-        aquiferMain = next((k for k in aquiferColors if k in aquifer), "OTHER")
-        color = aquiferColors[aquiferMain]
-        path = soup.find("path", {"id": stateCode})
-        if path:
-            path["fill"] = color
-            path["stroke"] = "#000000"
-            path["stroke-width"] = "0.75"
-
-    if not soup.find("svg").has_attr("xmlns"):
-        soup.find("svg")["xmlns"] = "http://www.w3.org/2000/svg"
-
-    with open(outputFile, "w", encoding="utf-8") as f:
-        f.write(str(soup))
-    return outputFile
+    aquifer = pd.Series(store.column("statewise_aquifier", "Dominant_Aquifer_Type")).str.upper()
+    # First aquifer key (in dict order) named in the description, else OTHER
+    aquiferMain = np.select(
+        [aquifer.str.contains(k, regex=False) for k in aquiferColors],
+        list(aquiferColors),
+        default="OTHER"
+    )
+    stateCodes = pd.Series(store.keys("statewise_aquifier", "State")).map(STATE_CODES)
+    colors = regionColors(stateCodes, pd.Series(aquiferMain, index=stateCodes.index), aquiferColors)
+    svg = templateStore.get("INDIA").render(colors, normalize=False, highlight=highlight)
+    return saveSvg(svg, outputDir, "aquiferMap.svg")
 
 # ---------------- Highlight Border ----------------
-def highlightBorder(name, inputFile, outputDir="static"):
-    baseName = os.path.splitext(os.path.basename(inputFile))[0]
-    outputFile = os.path.join(outputDir, f"{baseName}.svg")
-
-    with open(inputFile, "r", encoding="utf-8") as f:
-        soup = BeautifulSoup(f, "lxml-xml")
-
+def highlightSvg(name, svg):
+    soup = BeautifulSoup(svg, "lxml-xml")
     path = soup.find("path", {"id": name})
     if path:
         path["stroke"] = "#FF00FF"
         path["stroke-width"] = "2.6"
+    return str(soup)
 
-    with open(outputFile, "w", encoding="utf-8") as f:
-        f.write(str(soup))
-    return outputFile
+def highlightBorder(name, inputFile, outputDir="static"):
+    baseName = os.path.splitext(os.path.basename(inputFile))[0]
+
+    with open(inputFile, "r", encoding="utf-8") as f:
+        svg = highlightSvg(name, f.read())
+
+    if outputDir is None:
+        return svg
+    return writeAtomic(os.path.join(outputDir, f"{baseName}.svg"), svg)
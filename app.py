@@ -1,17 +1,33 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 import os
-import uuid
 from pydantic import BaseModel
 from rwh import RainwaterHarvesting
-from file_handling import getAquifer, getRainfall, aquiferScore, getGroundWaterLevel
-from SVGcoloring import rainfallColoring, postMonsoonColoring,preMonsoonColoring,aquiferColoring, highlightBorder
-import pandas as pd
-import glob
+from result_cache import resultCache
+from crosswalk import STATE_CODES
+from data_registry import registry, DatasetVersionMiddleware
+from map_cache import MapCache
+from trends import GroundwaterTrends
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    registry.start()
+    yield
+    registry.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+mapCache = MapCache(version=registry.current().mapVersion)
+groundwaterTrends = GroundwaterTrends()
+
+def onDataReload(snapshot):
+    mapCache.setDataset(snapshot.mapVersion, snapshot.store)
+    groundwaterTrends.refresh()
+
+registry.subscribe(onDataReload)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -22,6 +38,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(DatasetVersionMiddleware, registry=registry)
 
 class RWHRequest(BaseModel):
     district: str
@@ -31,71 +48,24 @@ class RWHRequest(BaseModel):
     dwellers: int
 
 def createSVGs(districtName,stateName):
-    uid = uuid.uuid4()
-    state_code_map = {
-        "ANDHRA PRADESH": "AP",
-        "ARUNACHAL PRADESH": "AR",
-        "ASSAM": "AS",
-        "BIHAR": "BR",
-        "CHHATTISGARH": "CG",
-        "GOA": "GA",
-        "GUJARAT": "GJ",
-        "HARYANA": "HR",
-        "HIMACHAL PRADESH": "HP",
-        "JAMMU & KASHMIR": "JK",
-        "LADAKH": "LA",
-        "JHARKHAND": "JH",
-        "KARNATAKA": "KA",
-        "KERALA": "KL",
-        "MADHYA PRADESH": "MP",
-        "MAHARASHTRA": "MH",
-        "MANIPUR": "MN",
-        "MEGHALAYA": "ML",
-        "MIZORAM": "MZ",
-        "NAGALAND": "NL",
-        "ODISHA": "OD",
-        "PUNJAB": "PB",
-        "RAJASTHAN": "RJ",
-        "SIKKIM": "SK",
-        "TAMIL NADU": "TN",
-        "TELANGANA": "TG",
-        "TRIPURA": "TR",
-        "UTTAR PRADESH": "UP",
-        "UTTARAKHAND": "UK",
-        "WEST BENGAL": "WB",
-        "DELHI": "DL",
-        "CHANDIGARH": "CH",
-        "PUDUCHERRY": "PY",
-        "DAMAN & DIU": "DD",
-        "ANDAMAN & NICOBAR": "AN"
-    }
-    stateCode = state_code_map[f"{stateName.upper()}"]
-    
-    rainfallColoring(stateCode,)
-    preMonsoonColoring(stateCode)
-    postMonsoonColoring(stateCode)
-    aquiferColoring()
-    highlightBorder(districtName,"postmonsoon.svg")
-    highlightBorder(districtName,"premonsoon.svg")
-    highlightBorder(districtName,"rainfall.svg")
-    highlightBorder(stateCode,"aquifer_map.svg")
-    return
+    stateCode = STATE_CODES[f"{stateName.upper()}"]
+    # Outline the district's path in the state map under its own id, matched
+    # ignoring case as the result cache keys names
+    highlight = registry.current().crosswalk.pathId(stateCode, districtName)
 
+    maps = {}
+    for layer in ("rainfall", "premonsoon", "postmonsoon"):
+        maps[layer] = mapCache.url(stateCode, layer, highlight)
+    maps["aquifer"] = mapCache.url("INDIA", "aquifer", stateCode)
+    return maps
 
-@app.get("/groundwater-trends")
-def groundwater_trends():
-    allFiles = glob.glob("databases\\groundwater*.csv")
-    fileList = [pd.read_csv(f) for f in allFiles]
-    groundwater = pd.concat(fileList, ignore_index=True)
-    trend_data = {}
-    for district, group in groundwater.groupby("District"):
-        group_sorted = group.sort_values("Year")
-        trend_data[district] = {
-            "Pre_Monsoon": group_sorted[["Year","Pre_Monsoon"]].values.tolist(),
-            "Post_Monsoon": group_sorted[["Year","Post_Monsoon"]].values.tolist()
-        }
 
-    return trend_data
+@app.get("/groundwater-trends")
+def groundwater_trends(request: Request):
+    status, body, headers = groundwaterTrends.response(
+        request.headers.get("if-none-match"), request.headers.get("accept-encoding")
+    )
+    return Response(body, status_code=status, headers=headers, media_type="application/json")
 
 
 
@@ -108,10 +78,15 @@ def serve_index():
 def process_location(data: RWHRequest):
     try:
         # Fetch data
-        rainfall = getRainfall(data.district, data.state)
-        aquifer = getAquifer(data.district, data.state)
-        score = aquiferScore(aquifer)
-        gw_pre, gw_post = getGroundWaterLevel(data.district, data.state)
+        snapshot = registry.current()
+        cached = resultCache.response(snapshot, data)
+        if cached is not None:
+            return cached
+        context = resultCache.locationContext(snapshot, data.district, data.state)
+        rainfall = context["rainfallMM"]
+        aquifer = context["aquiferType"]
+        score = context["aquiferScore"]
+        gw_pre, gw_post = context["groundwaterPreMonsoon"], context["groundwaterPostMonsoon"]
 
         # Calculate RWH
         user_rwh = RainwaterHarvesting(
@@ -123,8 +98,9 @@ def process_location(data: RWHRequest):
 
         feasibility = user_rwh.feasibility(gw_pre, gw_post, score)
 
+        maps = {}
         try:
-            createSVGs(data.district,data.state)
+            maps = createSVGs(data.district,data.state)
         except Exception as e:
             print("SVG generation failed:", e)
 
@@ -141,8 +117,12 @@ def process_location(data: RWHRequest):
             "rainfallMM": rainfall,
             "annualDemandLiters": user_rwh.annualDemand(),
             "harvestedWaterLiters": user_rwh.harvestedWaterFromRoof(),
-            "feasibilityScore": feasibility
+            "feasibilityScore": feasibility,
+            "maps": maps
         }
+        # A failed map render is not cached; the aquifer map is made last
+        if "aquifer" in maps:
+            resultCache.storeResponse(snapshot, data, response)
 
         return response
 
@@ -0,0 +1,277 @@
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from depth_range import DepthRange
+from npz_arrays import load_arrays
+
+MODEL_PATH = "aquifer_recommendation_model.pkl"
+# Array export of MODEL_PATH that loads without scikit-learn (see export_model)
+ARTIFACT_PATH = "aquifer_recommendation_model.npz"
+ARTIFACT_VERSION = 1
+# Batches up to this size walk the trees in plain Python, which beats
+# NumPy's per-call overhead when there are only a few rows
+SMALL_BATCH = 3
+# Rows evaluated together by the level-by-level traversal, sized so its
+# working arrays stay in cache
+LEVEL_CHUNK = 512
+
+
+class AquiferPredictor:
+    """The pickled aquifer model plus its encoders, predicting whole batches
+    of requests with one scaler.transform and one predict_proba call."""
+
+    def __init__(self, model, scaler, label_encoder, target_encoder, features):
+        self.model = model
+        self.scaler = scaler
+        self.label_encoder = label_encoder
+        self.target_encoder = target_encoder
+        self.features = list(features)
+        # LabelEncoder.transform is an index into classes_; unknown names encode as 0
+        self.label_codes = {label: code for code, label in enumerate(label_encoder.classes_)}
+        self.classes = list(target_encoder.inverse_transform(model.classes_))
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        import joblib
+        model_data = joblib.load(path)
+        return cls(
+            model_data['model'],
+            model_data['scaler'],
+            model_data['label_encoder'],
+            model_data['target_encoder'],
+            model_data['features']
+        )
+
+    def feature_matrix(self, requests) -> np.ndarray:
+        """One row per request, columns in self.features order."""
+        rows = [
+            (
+                DepthRange.parse(r.pre_monsoon).midpoint,
+                DepthRange.parse(r.post_monsoon).midpoint,
+                r.fluctuation,
+                r.elevation,
+                r.actual_rainfall,
+                r.normal_rainfall,
+                r.percent_dep,
+                self.label_codes.get(r.state, 0),
+                self.label_codes.get(r.district, 0)
+            )
+            for r in requests
+        ]
+        return np.array(rows, dtype=float).reshape(len(rows), len(self.features))
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        scaled = self.scaler.transform(pd.DataFrame(X, columns=self.features))
+        return self.model.predict_proba(scaled)
+
+    def predict(self, requests):
+        """Prediction and class probabilities per request. Rows the model
+        cannot score (e.g. an unparseable depth range) get an error instead."""
+        X = self.feature_matrix(requests)
+        valid = ~np.isnan(X).any(axis=1)
+        results = [
+            {"prediction": None, "probabilities": None, "error": "Input contains missing or invalid values"}
+            for _ in range(len(X))
+        ]
+        if valid.any():
+            probabilities = self.predict_proba(X[valid])
+            # RandomForestClassifier.predict is the argmax of predict_proba
+            best = probabilities.argmax(axis=1)
+            for i, row, label in zip(np.flatnonzero(valid), probabilities, best):
+                results[i] = {
+                    "prediction": self.classes[label],
+                    "probabilities": {target: float(p) for target, p in zip(self.classes, row)},
+                    "error": None
+                }
+        return results
+
+
+# ---------------- Array artifact ----------------
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def export_model(model_path=MODEL_PATH, artifact_path=ARTIFACT_PATH):
+    """Write the pickled model, scaler and encoders to an uncompressed .npz.
+
+    Trees are stored back to back: node arrays for all trees with child
+    indices made absolute, tree_offsets[t] the root of tree t, and value the
+    per-node class distribution already normalized the way
+    DecisionTreeClassifier.predict_proba normalizes it.
+    """
+    predictor = AquiferPredictor.load(model_path)
+    scaler = predictor.scaler
+    n_features = len(predictor.features)
+
+    offsets, left, right, feature, threshold, value = [0], [], [], [], [], []
+    for estimator in predictor.model.estimators_:
+        tree = estimator.tree_
+        base = offsets[-1]
+        is_leaf = tree.children_left == -1
+        left.append(np.where(is_leaf, -1, tree.children_left + base))
+        right.append(np.where(is_leaf, -1, tree.children_right + base))
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(tree.threshold)
+        proba = tree.value[:, 0, :predictor.model.n_classes_]
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        value.append(proba / normalizer)
+        offsets.append(base + tree.node_count)
+
+    np.savez(
+        artifact_path,
+        format_version=np.array(ARTIFACT_VERSION),
+        source_sha256=np.array(file_sha256(model_path)),
+        features=np.array(predictor.features),
+        label_classes=np.array(predictor.label_encoder.classes_, dtype=str),
+        classes=np.array(predictor.classes, dtype=str),
+        scaler_mean=np.asarray(scaler.mean_ if scaler.with_mean else np.zeros(n_features), dtype=float),
+        scaler_scale=np.asarray(scaler.scale_ if scaler.with_std else np.ones(n_features), dtype=float),
+        tree_offsets=np.array(offsets, dtype=np.int64),
+        left=np.concatenate(left).astype(np.int64),
+        right=np.concatenate(right).astype(np.int64),
+        feature=np.concatenate(feature).astype(np.int64),
+        threshold=np.concatenate(threshold).astype(np.float64),
+        value=np.concatenate(value).astype(np.float64),
+    )
+    return artifact_path
+
+
+def float32_floor(values):
+    """Largest float32 not above each value: for a float32 x, x <= t exactly
+    when x <= float32_floor(t)."""
+    floor = values.astype(np.float32)
+    above = floor.astype(np.float64) > values
+    floor[above] = np.nextafter(floor[above], np.float32(-np.inf))
+    return floor
+
+
+def forest_depth(roots, left, right):
+    """Steps from the roots to the deepest leaf (-1 children mark leaves)."""
+    depth = 0
+    level = roots[left[roots] != -1]
+    while len(level):
+        depth += 1
+        level = np.concatenate([left[level], right[level]])
+        level = level[left[level] != -1]
+    return depth
+
+
+class CompiledAquiferPredictor(AquiferPredictor):
+    """AquiferPredictor backed by the exported arrays: scaling and forest
+    traversal in plain NumPy, giving the same probabilities as scikit-learn.
+
+    Batches walk every tree at once, one level per step, over a rows x
+    trees array of slots (slot = 2 * node): a step adds x <= threshold to
+    the slot and looks up the next slot, which for a leaf is its own, so
+    trees that reach a leaf early stay there until the deepest is done.
+    """
+
+    def __init__(self, arrays):
+        if int(arrays["format_version"]) != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported model artifact version {int(arrays['format_version'])}")
+        self.model = None
+        self.scaler = None
+        self.label_encoder = None
+        self.target_encoder = None
+        self.arrays = arrays
+        self.source_sha256 = str(arrays["source_sha256"])
+        self.features = [str(f) for f in arrays["features"]]
+        self.label_codes = {str(label): code for code, label in enumerate(arrays["label_classes"])}
+        self.classes = [str(c) for c in arrays["classes"]]
+        self.mean = arrays["scaler_mean"]
+        self.scale = arrays["scaler_scale"]
+        self.tree_offsets = arrays["tree_offsets"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.value = arrays["value"]
+        self.n_trees = len(self.tree_offsets) - 1
+        self.roots = self.tree_offsets[:-1]
+        nodes = np.arange(len(self.left))
+        is_leaf = self.left == -1
+        children = np.stack([np.where(is_leaf, nodes, self.right), np.where(is_leaf, nodes, self.left)], axis=1)
+        self.next_slot = 2 * children.ravel()
+        self.slot_feature = np.repeat(self.feature, 2)
+        self.slot_threshold = np.repeat(float32_floor(self.threshold), 2)
+        self.max_depth = forest_depth(self.roots, self.left, self.right)
+        self.nodes = None
+
+    @classmethod
+    def load(cls, path=ARTIFACT_PATH, mmap=True):
+        return cls(load_arrays(path, mmap=mmap))
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        # StandardScaler.transform, then the float32 cast trees apply to their input
+        Xf = ((np.asarray(X, dtype=np.float64) - self.mean) / self.scale).astype(np.float32)
+        if len(Xf) <= SMALL_BATCH:
+            return self._predict_small(Xf)
+        proba = np.zeros((len(Xf), self.value.shape[1]))
+        for start in range(0, len(Xf), LEVEL_CHUNK):
+            self._predict_levels(Xf[start:start + LEVEL_CHUNK], proba[start:start + LEVEL_CHUNK])
+        proba /= self.n_trees
+        return proba
+
+    def _predict_levels(self, Xf, proba):
+        # Adds the chunk's per-tree probabilities to proba
+        n_rows, n_features = Xf.shape
+        flat = Xf.ravel()
+        row_offsets = (np.arange(n_rows) * n_features)[:, np.newaxis]
+        slot = np.repeat(2 * self.roots[np.newaxis, :], n_rows, axis=0)
+        for _ in range(self.max_depth):
+            index = self.slot_feature[slot]
+            index += row_offsets
+            slot += flat[index] <= self.slot_threshold[slot]
+            slot = self.next_slot[slot]
+        leaf = slot // 2
+        # Summed tree by tree, in order, as RandomForestClassifier does
+        for tree in range(self.n_trees):
+            proba += self.value[leaf[:, tree]]
+
+    def _predict_small(self, Xf):
+        if self.nodes is None:
+            self.nodes = (
+                self.left.tolist(), self.right.tolist(), self.feature.tolist(),
+                self.threshold.tolist(), [tuple(v) for v in self.value.tolist()],
+                self.tree_offsets[:-1].tolist()
+            )
+        left, right, feature, threshold, value, roots = self.nodes
+        proba = np.zeros((len(Xf), self.value.shape[1]))
+        for i, x in enumerate(Xf.tolist()):
+            total = [0.0] * proba.shape[1]
+            for node in roots:
+                while left[node] != -1:
+                    node = left[node] if x[feature[node]] <= threshold[node] else right[node]
+                total = [t + v for t, v in zip(total, value[node])]
+            proba[i] = total
+        proba /= self.n_trees
+        return proba
+
+
+def load_predictor(model_path=MODEL_PATH, artifact_path=ARTIFACT_PATH, backend="auto"):
+    """The predictor to serve with. backend "numpy" needs the artifact,
+    "sklearn" the pickle; "auto" takes the artifact when it was exported
+    from the current pickle (or the pickle is absent) and the pickle otherwise."""
+    if backend == "sklearn":
+        return AquiferPredictor.load(model_path)
+    if backend == "numpy" or (backend == "auto" and os.path.exists(artifact_path)):
+        predictor = CompiledAquiferPredictor.load(artifact_path)
+        if backend == "numpy" or not os.path.exists(model_path) or \
+                predictor.source_sha256 == file_sha256(model_path):
+            return predictor
+        print(f"Warning: '{artifact_path}' is out of date with '{model_path}', using the pickle. "
+              f"Re-export with: python aquifer_model.py export")
+    return AquiferPredictor.load(model_path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        print("Wrote", export_model(*sys.argv[2:4]))
+    else:
+        print("Usage: python aquifer_model.py export [MODEL_PATH] [ARTIFACT_PATH]")
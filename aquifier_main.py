@@ -4,12 +4,10 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
-import pandas as pd
-import numpy as np
-import joblib
 import os
-from typing import Dict
+from typing import Dict, List, Optional
 from pathlib import Path
+from aquifer_model import load_predictor, MODEL_PATH
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -39,15 +37,9 @@ app.add_middleware(
 )
 
 # Load model and encoders
-MODEL_PATH = "aquifer_recommendation_model.pkl"
-
 try:
-    model_data = joblib.load(MODEL_PATH)
-    model = model_data['model']
-    scaler = model_data['scaler']
-    label_encoder = model_data['label_encoder']
-    target_encoder = model_data['target_encoder']
-    features = model_data['features']
+    predictor = load_predictor(backend=os.environ.get("AQUIFER_MODEL_BACKEND", "auto"))
+    features = predictor.features
 except FileNotFoundError:
     print(f"Error: Model file '{MODEL_PATH}' not found.")
     model_loaded = False
@@ -70,29 +62,12 @@ class AquiferPredictionResponse(BaseModel):
     prediction: str
     probabilities: Dict[str, float]
 
-# Helper function
-def range_to_midpoint(range_str: str) -> float:
-    if not range_str or pd.isna(range_str):
-        return np.nan
-    if 'to' in range_str:
-        parts = range_str.split('to')
-        try:
-            low = float(parts[0].strip())
-            high = float(parts[1].strip())
-            return (low + high) / 2
-        except (ValueError, IndexError):
-            return np.nan
-    elif '>' in range_str:
-        try:
-            value = float(range_str.replace('>', '').strip())
-            return value + 5  # Assume >40 means ~45
-        except ValueError:
-            return np.nan
-    else:
-        try:
-            return float(range_str)
-        except ValueError:
-            return np.nan
+class AquiferBatchPredictionItem(BaseModel):
+    prediction: Optional[str] = None
+    probabilities: Optional[Dict[str, float]] = None
+    error: Optional[str] = None
+
+MAX_BATCH = 10000
 
 # Frontend route
 @app.get("/", response_class=HTMLResponse)
@@ -116,53 +91,25 @@ async def predict_aquifer(data: AquiferPredictionRequest):
         raise HTTPException(status_code=503, detail="Model not loaded. Please check the server logs.")
     
     try:
-        # Encode state and district
-        try:
-            state_encoded = int(label_encoder.transform([data.state])[0])
-        except:
-            state_encoded = 0
-
-        try:
-            district_encoded = int(label_encoder.transform([data.district])[0])
-        except:
-            district_encoded = 0
-
-        # Prepare input data
-        input_data = {
-            'Pre_Monsoon_mid': range_to_midpoint(data.pre_monsoon),
-            'Post_Monsoon_mid': range_to_midpoint(data.post_monsoon),
-            'Fluctuation': data.fluctuation,
-            'Elevation (m)': data.elevation,
-            'ACTUAL (mm)': data.actual_rainfall,
-            'NORMAL (mm)': data.normal_rainfall,
-            '% DEP.': data.percent_dep,
-            'State_encoded': state_encoded,
-            'District_encoded': district_encoded
-        }
-
-        # Create DataFrame and handle missing values
-        input_df = pd.DataFrame([input_data])
-        input_df = input_df.fillna(input_df.mean())
-
-        # Scale features
-        input_scaled = scaler.transform(input_df)
-
-        # Make prediction
-        prediction_encoded = model.predict(input_scaled)
-        prediction = target_encoder.inverse_transform(prediction_encoded)[0]
-
-        # Get probabilities
-        probabilities = model.predict_proba(input_scaled)[0]
-        probability_dict = {
-            target: float(prob)
-            for target, prob in zip(target_encoder.classes_, probabilities)
-        }
-
-        return {
-            "prediction": prediction,
-            "probabilities": probability_dict
-        }
+        result = predictor.predict([data])[0]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if result["error"]:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return {
+        "prediction": result["prediction"],
+        "probabilities": result["probabilities"]
+    }
 
+@app.post("/predict/batch", response_model=List[AquiferBatchPredictionItem])
+def predict_aquifer_batch(data: List[AquiferPredictionRequest]):
+    if not model_loaded:
+        raise HTTPException(status_code=503, detail="Model not loaded. Please check the server logs.")
+    if len(data) > MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(data)} items, limit is {MAX_BATCH}")
+
+    try:
+        return predictor.predict(data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -176,7 +123,7 @@ async def get_features():
 async def get_classes():
     if not model_loaded:
         raise HTTPException(status_code=503, detail="Model not loaded")
-    return {"classes": list(target_encoder.classes_)}
+    return {"classes": predictor.classes}
 
 if __name__ == "__main__":
     import uvicorn
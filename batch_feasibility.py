@@ -0,0 +1,155 @@
+import io
+import itertools
+import json
+
+import numpy as np
+import pandas as pd
+
+from data_registry import registry
+from result_cache import resultCache
+from rwh import RainwaterHarvestingBatch, depthArray
+from stations import NEAREST_STATIONS, STATION_MAX_KM
+
+MAX_BATCH_ROWS = 100000
+# Request bodies past this size are refused before they are read in full
+MAX_BATCH_BYTES = 64 * 1024 * 1024
+REQUEST_COLUMNS = ["district", "state", "roofArea", "roofType", "dwellers"]
+# Optional rooftop coordinates, as on /process-location
+POINT_COLUMNS = ["lat", "lon"]
+LOCATION_COLUMNS = [
+    "aquiferType", "aquiferScore", "groundwaterPreMonsoon", "groundwaterPostMonsoon", "rainfallMM", "error"
+]
+
+
+def readBatchRecords(body, contentType):
+    """Parse a JSON array, CSV or NDJSON request body into a rooftop DataFrame.
+    Parsing stops once the body is known to hold more than MAX_BATCH_ROWS."""
+    contentType = (contentType or "").split(";")[0].strip().lower()
+    if contentType in ("text/csv", "application/csv"):
+        frame = pd.read_csv(io.BytesIO(body), dtype={"district": str, "state": str, "roofType": str},
+                            nrows=MAX_BATCH_ROWS + 1)
+    elif contentType in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        lines = itertools.islice((line for line in body.splitlines() if line.strip()), MAX_BATCH_ROWS + 1)
+        frame = pd.DataFrame([json.loads(line) for line in lines])
+    else:
+        records = json.loads(body)
+        if isinstance(records, dict):
+            records = records.get("records", [])
+        if len(records) > MAX_BATCH_ROWS:
+            raise OverflowError(f"Batch too large: {len(records)} rows, limit is {MAX_BATCH_ROWS}")
+        frame = pd.DataFrame(records)
+    if len(frame) > MAX_BATCH_ROWS:
+        raise OverflowError(f"Batch too large: more than {MAX_BATCH_ROWS} rows")
+    if not len(frame):
+        return pd.DataFrame(columns=REQUEST_COLUMNS)
+
+    points = [column for column in POINT_COLUMNS if column in frame.columns]
+    if points and points != POINT_COLUMNS:
+        raise ValueError("Give both lat and lon columns, or neither")
+    if points:
+        # With coordinates the names can be left out, and are found from those
+        for column in ("district", "state"):
+            if column not in frame.columns:
+                frame[column] = ""
+    missing = [column for column in REQUEST_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    frame = frame[REQUEST_COLUMNS + points].copy()
+    frame["district"] = frame["district"].fillna("").astype(str)
+    frame["state"] = frame["state"].fillna("").astype(str)
+    frame["roofType"] = frame["roofType"].fillna("").astype(str)
+    frame["roofArea"] = pd.to_numeric(frame["roofArea"], errors="coerce")
+    frame["dwellers"] = pd.to_numeric(frame["dwellers"], errors="coerce")
+    if points:
+        lat = pd.to_numeric(frame["lat"], errors="coerce")
+        lon = pd.to_numeric(frame["lon"], errors="coerce")
+        frame["lat"] = lat.where(lat.between(-90, 90))
+        frame["lon"] = lon.where(lon.between(-180, 180))
+    return frame
+
+
+def resolveLocation(district, state, snapshot=None):
+    return resultCache.locationContext(snapshot or registry.current(), district, state)
+
+
+def resolveLocations(locations, snapshot):
+    """LOCATION_COLUMNS for each distinct (district, state) in locations."""
+    resolved = []
+    for district, state in locations[["district", "state"]].drop_duplicates().itertuples(index=False):
+        try:
+            context = resolveLocation(district, state, snapshot)
+            if not isinstance(context["aquiferScore"], (int, float)):
+                raise ValueError(f"Aquifer score for {district}, {state} not available.")
+        except ValueError as e:
+            context = {"error": str(e)}
+        resolved.append({"district": district, "state": state, **context})
+    return pd.DataFrame(resolved, columns=["district", "state"] + LOCATION_COLUMNS)
+
+
+def locateFailures(frame, resolved, snapshot):
+    """frame with the district and state at their coordinates in place of
+    names that did not resolve (or were left out), and resolved extended to
+    the new names."""
+    failed = resolved.loc[resolved["error"].notna(), ["district", "state"]]
+    failedKeys = pd.MultiIndex.from_frame(failed)
+    rows = pd.MultiIndex.from_frame(frame[["district", "state"]]).isin(failedKeys)
+    rows |= (frame["district"].str.strip() == "").to_numpy()
+    rows &= frame["lat"].notna().to_numpy() & frame["lon"].notna().to_numpy()
+    if not rows.any():
+        return frame, resolved
+    located = snapshot.geocoder.resolveMany(frame.loc[rows, "lat"], frame.loc[rows, "lon"])
+    found = np.array([answer is not None for answer in located], dtype=bool)
+    if not found.any():
+        return frame, resolved
+    index = frame.index[rows][found]
+    frame = frame.copy()
+    frame.loc[index, "district"] = [answer["district"] for answer in located[found]]
+    frame.loc[index, "state"] = [answer["state"] for answer in located[found]]
+    known = pd.MultiIndex.from_frame(resolved[["district", "state"]])
+    new = frame.loc[index, ["district", "state"]]
+    new = new[~pd.MultiIndex.from_frame(new).isin(known)]
+    return frame, pd.concat([resolved, resolveLocations(new, snapshot)], ignore_index=True)
+
+
+def batchFeasibility(frame):
+    """Feasibility for every rooftop in frame, resolving each distinct
+    (district, state) once and computing the numbers as arrays. Rooftops
+    with lat and lon use the nearest wells' measured level, and the
+    district at their coordinates when their names do not resolve, as
+    /process-location does."""
+    snapshot = registry.current()
+    resolved = resolveLocations(frame, snapshot)
+    hasPoints = all(column in frame.columns for column in POINT_COLUMNS)
+    if hasPoints:
+        frame, resolved = locateFailures(frame, resolved, snapshot)
+    result = frame.merge(resolved, on=["district", "state"], how="left")
+    ok = result["error"].isna().to_numpy()
+    if hasPoints:
+        result["groundwaterMeasured"] = snapshot.stations.estimateLevels(
+            result["lat"], result["lon"], NEAREST_STATIONS, STATION_MAX_KM
+        )
+
+    result["annualDemandLiters"] = RainwaterHarvestingBatch(
+        result["roofArea"], result["roofType"], result["rainfallMM"], result["dwellers"]
+    ).annualDemand()
+    result["harvestedWaterLiters"] = np.nan
+    result["feasibilityScore"] = np.nan
+    if ok.any():
+        rows = result[ok]
+        rwh = RainwaterHarvestingBatch.fromFrame(rows)
+        current = rows["groundwaterPostMonsoon"]
+        if hasPoints:
+            measured = rows["groundwaterMeasured"].to_numpy()
+            current = np.where(np.isnan(measured), depthArray(current), measured)
+        result.loc[ok, "harvestedWaterLiters"] = rwh.harvestedWaterFromRoof()
+        result.loc[ok, "feasibilityScore"] = rwh.feasibility(
+            rows["groundwaterPreMonsoon"], current, rows["aquiferScore"]
+        )
+
+    points = POINT_COLUMNS if hasPoints else []
+    measured = ["groundwaterMeasured"] if hasPoints else []
+    columns = REQUEST_COLUMNS + points + LOCATION_COLUMNS[:-1] + measured + [
+        "annualDemandLiters", "harvestedWaterLiters", "feasibilityScore", "error"
+    ]
+    return result[columns]
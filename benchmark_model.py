@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Aquifer model inference time per batch size: scikit-learn (the pickled
+forest, as /aquifer/predict once called it, with predict and predict_proba)
+against the exported arrays evaluated tree by tree, in plain Python and
+level by level across all trees. Also checks every evaluator returns
+exactly scikit-learn's probabilities.
+
+Run from the project root: python benchmark_model.py [BATCH_SIZE ...]
+"""
+
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from aquifer_model import LEVEL_CHUNK, AquiferPredictor, CompiledAquiferPredictor
+
+BATCH_SIZES = [1, 100, 10000]
+
+
+def sklearnBoth(predictor, X):
+    # The original route: two passes over the forest, each validating X
+    scaled = predictor.scaler.transform(pd.DataFrame(X, columns=predictor.features))
+    predictor.model.predict(scaled)
+    return predictor.model.predict_proba(scaled)
+
+
+def scaled32(compiled, X):
+    return ((np.asarray(X, dtype=np.float64) - compiled.mean) / compiled.scale).astype(np.float32)
+
+
+def treeByTree(compiled, X):
+    # The NumPy evaluator before the level-by-level one: a loop per tree,
+    # narrowing to the rows not yet at a leaf
+    Xf = scaled32(compiled, X)
+    rows = np.arange(len(Xf))
+    proba = np.zeros((len(Xf), compiled.value.shape[1]))
+    for root in compiled.roots:
+        node = np.full(len(Xf), root)
+        active = compiled.left[node] != -1
+        while active.any():
+            idx = node[active]
+            goLeft = Xf[rows[active], compiled.feature[idx]] <= compiled.threshold[idx]
+            node[active] = np.where(goLeft, compiled.left[idx], compiled.right[idx])
+            active = compiled.left[node] != -1
+        proba += compiled.value[node]
+    return proba / compiled.n_trees
+
+
+def pythonWalk(compiled, X):
+    return compiled._predict_small(scaled32(compiled, X))
+
+
+def levelByLevel(compiled, X):
+    Xf = scaled32(compiled, X)
+    proba = np.zeros((len(Xf), compiled.value.shape[1]))
+    for start in range(0, len(Xf), LEVEL_CHUNK):
+        compiled._predict_levels(Xf[start:start + LEVEL_CHUNK], proba[start:start + LEVEL_CHUNK])
+    return proba / compiled.n_trees
+
+
+def timeit(fn, *args, minSeconds=0.5):
+    # Fastest of repeated calls: this is shared hardware, and the minimum is
+    # the least disturbed by other work
+    fn(*args)
+    best, start = float("inf"), time.perf_counter()
+    while time.perf_counter() - start < minSeconds:
+        callStart = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - callStart)
+    return best
+
+
+def main(batchSizes):
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    predictor = AquiferPredictor.load()
+    compiled = CompiledAquiferPredictor.load()
+    rng = np.random.default_rng(0)
+    print(f"{compiled.n_trees} trees, {len(compiled.left)} nodes, depth {compiled.max_depth}\n")
+
+    evaluators = [
+        ("sklearn predict + predict_proba", lambda X: sklearnBoth(predictor, X)),
+        ("sklearn predict_proba", predictor.predict_proba),
+        ("arrays, tree by tree", lambda X: treeByTree(compiled, X)),
+        ("arrays, Python walk", lambda X: pythonWalk(compiled, X)),
+        ("arrays, level by level", lambda X: levelByLevel(compiled, X)),
+        ("CompiledAquiferPredictor", compiled.predict_proba),
+    ]
+    header = f"{'evaluator':<34}" + "".join(f"{f'batch {n}':>16}" for n in batchSizes)
+    print(header)
+    batches = {n: predictor.scaler.mean_ + predictor.scaler.scale_ * rng.standard_normal((n, 9)) for n in batchSizes}
+    expected = {n: predictor.predict_proba(X) for n, X in batches.items()}
+    for name, fn in evaluators:
+        cells = []
+        for n, X in batches.items():
+            if name == "arrays, Python walk" and n > 1000:
+                cells.append(f"{'-':>16}")
+                continue
+            exact = np.array_equal(fn(X), expected[n])
+            seconds = timeit(fn, X)
+            cells.append(f"{seconds * 1e3:12.3f} ms{'' if exact else '!'}".rjust(16))
+        print(f"{name:<34}" + "".join(cells))
+    print("\n! marks results that differ from sklearn predict_proba")
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or BATCH_SIZES)
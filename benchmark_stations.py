@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Nearest-station lookup time as the station table grows: the KD-tree index
+(StationIndex) against a linear haversine scan over every station. The real
+CGWB stations are padded with synthetic ones scattered over India. Also
+checks both find the same stations.
+
+Run from the project root: python benchmark_stations.py [STATION_COUNT ...]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_registry import registry
+from stations import EARTH_RADIUS_KM, StationIndex
+
+STATION_COUNTS = [1000, 10000, 50000]
+QUERIES = 2000
+K = 5
+
+
+def syntheticStations(real, n, rng):
+    extra = max(0, n - len(real.stations))
+    padding = pd.DataFrame({
+        "date": pd.Timestamp("2023-01-01"),
+        "state": "Synthetic",
+        "district": "Synthetic",
+        "station": [f"S{i}" for i in range(extra)],
+        "lat": rng.uniform(8, 35, extra),
+        "lon": rng.uniform(68, 97, extra),
+        "currentlevel": rng.uniform(0, 40, extra),
+        "levelDiff": 0.0,
+    })
+    return StationIndex(pd.concat([real.stations, padding], ignore_index=True).iloc[:n])
+
+
+def haversineScan(index, lat, lon, k):
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(index.lat), np.radians(index.lon)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+    nearest = np.argpartition(distances, k)[:k]
+    return nearest[np.argsort(distances[nearest])]
+
+
+def perQuery(fn, points):
+    start = time.perf_counter()
+    for lat, lon in points:
+        fn(lat, lon)
+    return (time.perf_counter() - start) / len(points)
+
+
+def main(counts):
+    rng = np.random.default_rng(0)
+    real = registry.current().stations
+    points = np.column_stack([rng.uniform(8, 35, QUERIES), rng.uniform(68, 97, QUERIES)])
+    print(f"{QUERIES} queries, k={K}, mean time per query\n")
+    print(f"{'stations':>10}{'build':>12}{'scan':>14}{'query':>14}{'nearest':>14}{'estimate':>14}")
+    for n in counts:
+        start = time.perf_counter()
+        index = syntheticStations(real, n, rng)
+        build = time.perf_counter() - start
+        same = all(
+            np.array_equal(index.query(lat, lon, K)[0], haversineScan(index, lat, lon, K)) for lat, lon in points[:200]
+        )
+        cells = [perQuery(fn, points) for fn in (
+            lambda lat, lon: haversineScan(index, lat, lon, K),
+            lambda lat, lon: index.query(lat, lon, K),
+            lambda lat, lon: index.nearest(lat, lon, K),
+            lambda lat, lon: index.estimate(lat, lon, K),
+        )]
+        print(f"{len(index):>10}{build * 1e3:9.1f} ms" + "".join(f"{c * 1e6:11.1f} us" for c in cells)
+              + ("" if same else "  (differs from scan!)"))
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or STATION_COUNTS)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Per-state SVG render time: the original row-by-row recoloring loop against
+the current SVGcoloring functions. Also checks both produce the same SVG and
+reports the size, parse time and slot-fill time of each map template.
+
+Run from the project root: python benchmark_svg.py [STATE_CODE ...]
+"""
+
+import os
+import sys
+import time
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+import SVGcoloring
+from map_templates import templateStore
+
+GROUNDWATER_COLORS = {
+    "0 to 2": "#ffffcc", "2 to 5": "#ffeda0", "5 to 10": "#fed976",
+    "10 to 20": "#feb24c", "20 to 40": "#fd8d3c", ">40": "#e31a1c"
+}
+RAINFALL_COLORS = {
+    "LE": "#08306b", "E": "#2171b5", "N": "#6baed6",
+    "D": "#9ecae1", "LD": "#c6dbef", "*": "#f2f2f2"
+}
+
+
+def legacyColoring(stateName, layer):
+    # The iterrows x find_all("path") loop SVGcoloring used before
+    if layer == "rainfall":
+        df = pd.read_csv(os.path.join("databases", "rainfall_database.csv"))
+        df["Cat"] = df["NORMAL"].apply(SVGcoloring.classifyRainfall)
+        nameColumn, categoryColors = "NAME", RAINFALL_COLORS
+    else:
+        df = pd.read_csv(os.path.join("databases", "groundwater2023.csv"))
+        df["Cat"] = df["Pre_Monsoon"]
+        nameColumn, categoryColors = "District", GROUNDWATER_COLORS
+
+    with open(os.path.join("maps", f"{stateName}.svg"), "r", encoding="utf-8") as f:
+        soup = BeautifulSoup(f, "lxml-xml")
+    if not soup.find("svg").has_attr("xmlns"):
+        soup.find("svg")["xmlns"] = "http://www.w3.org/2000/svg"
+
+    df[nameColumn] = df[nameColumn].str.strip().str.upper()
+    for _, row in df.iterrows():
+        district = row[nameColumn]
+        color = categoryColors.get(str(row["Cat"]).strip(), "#ffffff")
+        for path in soup.find_all("path"):
+            if path.get("id", "").strip().upper() == district:
+                path["fill"] = color
+                path["stroke"] = "#000000"
+                path["stroke-width"] = "0.75"
+                break
+    return str(soup)
+
+
+def timeIt(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(stateCodes, repeat=3):
+    layers = {
+        "rainfall": SVGcoloring.rainfallColoring,
+        "premonsoon": SVGcoloring.preMonsoonColoring,
+    }
+    print(f"{'state':<6}{'layer':<12}{'before (ms)':>12}{'after (ms)':>12}{'speedup':>9}  same")
+    totals = [0.0, 0.0]
+    for stateCode in stateCodes:
+        for layer, renderFn in layers.items():
+            before, old = timeIt(lambda: legacyColoring(stateCode, layer), repeat)
+            after, new = timeIt(lambda: renderFn(stateCode, None), repeat)
+            totals[0] += before
+            totals[1] += after
+            print(f"{stateCode:<6}{layer:<12}{before * 1000:>12.1f}{after * 1000:>12.1f}"
+                  f"{before / after:>8.1f}x  {old == new}")
+    print(f"{'total':<18}{totals[0] * 1000:>12.1f}{totals[1] * 1000:>12.1f}{totals[0] / totals[1]:>8.1f}x")
+
+    print(f"\n{'map':<7}{'paths':>6}{'template KB':>13}{'parse (ms)':>12}{'render (ms)':>13}")
+    for name, stats in templateStore.stats()["maps"].items():
+        print(f"{name:<7}{stats['paths']:>6}{stats['bytes'] / 1024:>13.1f}"
+              f"{stats['parseMs']:>12.1f}{stats['avgRenderMs']:>13.3f}")
+
+
+if __name__ == "__main__":
+    codes = sys.argv[1:] or sorted(
+        name[:-4] for name in os.listdir("maps") if name.endswith(".svg") and name != "INDIA.svg"
+    )
+    main(codes)
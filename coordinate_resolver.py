@@ -0,0 +1,132 @@
+import os
+
+import numpy as np
+
+from lru_cache import MISSING, LRUCache
+from stations import MIN_DISTANCE_KM, STATION_MAX_KM, chordToKm, kmToChord, unitVectors
+
+# Points are answered per grid cell of this many degrees (0.01: about 1 km),
+# from the cell's centre, by a vote of this many nearest stations
+CELL_DEGREES = float(os.environ.get("GEOCODE_CELL_DEGREES", "0.01"))
+VOTING_STATIONS = int(os.environ.get("GEOCODE_NEIGHBOURS", "7"))
+
+
+class CoordinateResolver:
+    """(district, state) of a latitude/longitude, from the labels of the
+    groundwater monitoring stations around it.
+
+    Each station's district and state are mapped once to the crosswalk's
+    canonical spelling, the names the other lookups accept. A point's
+    nearest k stations (within maxKm) then vote for their district, each
+    with weight 1 / distance. Answers are cached per grid cell, so nearby
+    points share one tree query; resolveMany answers arrays of points with
+    one query for all the cells not cached yet.
+    """
+
+    def __init__(self, stations, crosswalk, resolver, cellDegrees=CELL_DEGREES, k=VOTING_STATIONS,
+                 maxKm=STATION_MAX_KM, cacheSize=65536):
+        self.stations = stations
+        self.cellDegrees = cellDegrees
+        self.k = min(k, len(stations))
+        self.maxKm = maxKm
+        self.cache = LRUCache(cacheSize)
+
+        labelIds = {}
+        for district, state in zip(stations.districts, stations.states):
+            labelIds.setdefault((district, state), None)
+        canonical = {}
+        for district, state in labelIds:
+            row = crosswalk.get(district, state)
+            if row is None:
+                resolvedDistrict, resolvedState = resolver.resolve(district, state)
+                if resolvedDistrict and resolvedState:
+                    row = crosswalk.get(resolvedDistrict, resolvedState)
+            label = (row.district, row.state, row.complete()) if row is not None else (district, state, False)
+            labelIds[(district, state)] = canonical.setdefault(label, len(canonical))
+        self.labels = list(canonical)
+        self.stationLabels = np.array(
+            [labelIds[(district, state)] for district, state in zip(stations.districts, stations.states)],
+            dtype=np.int64,
+        )
+
+    def cells(self, lat, lon):
+        return (np.floor(np.asarray(lat, dtype=float) / self.cellDegrees).astype(np.int64),
+                np.floor(np.asarray(lon, dtype=float) / self.cellDegrees).astype(np.int64))
+
+    def vote(self, lat, lon):
+        """(winning label or -1, its share of the votes, nearest station km)
+        for arrays of points."""
+        lat = np.asarray(lat, dtype=float)
+        if self.k <= 0:
+            return np.full(len(lat), -1), np.zeros(len(lat)), np.full(len(lat), np.nan)
+        chords, indices = self.stations.tree.query(
+            unitVectors(lat, lon), k=self.k, distance_upper_bound=kmToChord(self.maxKm)
+        )
+        chords, indices = chords.reshape(-1, self.k), indices.reshape(-1, self.k)
+        found = np.isfinite(chords)
+        distances = chordToKm(np.where(found, chords, 0))
+        weights = np.where(found, 1 / np.maximum(distances, MIN_DISTANCE_KM), 0)
+        labels = np.where(found, self.stationLabels[np.where(found, indices, 0)], -1)
+        # Each neighbour scores the weight of all neighbours sharing its label;
+        # ties go to the nearer one
+        scores = (weights[:, None, :] * (labels[:, :, None] == labels[:, None, :])).sum(axis=2)
+        best = scores.argmax(axis=1)
+        rows = np.arange(len(labels))
+        total = weights.sum(axis=1)
+        share = np.divide(scores[rows, best], total, out=np.zeros(len(total)), where=total > 0)
+        return labels[rows, best], share, np.where(found[:, 0], distances[:, 0], np.nan)
+
+    def answer(self, cellLat, cellLon, label, share, nearestKm):
+        if label < 0:
+            return None
+        district, state, complete = self.labels[label]
+        return {
+            "district": district,
+            "state": state,
+            "complete": complete,
+            "confidence": round(float(share), 3),
+            "nearestStationKm": round(float(nearestKm), 3),
+            "cell": [round((cellLat + 0.5) * self.cellDegrees, 6), round((cellLon + 0.5) * self.cellDegrees, 6)],
+        }
+
+    def lookup(self, cellLats, cellLons):
+        """Answers for arrays of cells, voting once for all the uncached ones."""
+        answers = [self.cache.get(cell, MISSING) for cell in zip(cellLats.tolist(), cellLons.tolist())]
+        missing = [i for i, answer in enumerate(answers) if answer is MISSING]
+        if missing:
+            lat = (cellLats[missing] + 0.5) * self.cellDegrees
+            lon = (cellLons[missing] + 0.5) * self.cellDegrees
+            for i, label, share, nearestKm in zip(missing, *self.vote(lat, lon)):
+                answers[i] = self.answer(cellLats[i], cellLons[i], label, share, nearestKm)
+                self.cache.put((int(cellLats[i]), int(cellLons[i])), answers[i])
+        return answers
+
+    def resolve(self, lat, lon):
+        """The district and state at a point as a dict, or None when no
+        station is within maxKm."""
+        cellLat, cellLon = self.cells([lat], [lon])
+        return self.lookup(cellLat, cellLon)[0]
+
+    def resolveMany(self, lat, lon):
+        """resolve for arrays of points; None where there is no answer or no
+        coordinates."""
+        lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+        answers = np.full(len(lat), None, dtype=object)
+        valid = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        if not len(valid):
+            return answers
+        cellLats, cellLons = self.cells(lat[valid], lon[valid])
+        cells, inverse = np.unique(np.stack([cellLats, cellLons], axis=1), axis=0, return_inverse=True)
+        unique = np.empty(len(cells), dtype=object)
+        unique[:] = self.lookup(cells[:, 0], cells[:, 1])
+        answers[valid] = unique[inverse.ravel()]
+        return answers
+
+    def stats(self):
+        return {
+            "districts": len(self.labels),
+            "cellDegrees": self.cellDegrees,
+            "neighbours": self.k,
+            "maxKm": self.maxKm,
+            "cache": self.cache.stats(),
+        }
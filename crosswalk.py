@@ -0,0 +1,197 @@
+import threading
+
+from file_handling import aquiferScore
+from location_resolver import normalizeName
+from map_templates import templateStore
+
+# Map file (maps/<code>.svg) and INDIA.svg path id of each state
+STATE_CODES = {
+    "ANDHRA PRADESH": "AP", "ARUNACHAL PRADESH": "AR", "ASSAM": "AS", "BIHAR": "BR",
+    "CHHATTISGARH": "CG", "GOA": "GA", "GUJARAT": "GJ", "HARYANA": "HR",
+    "HIMACHAL PRADESH": "HP", "JAMMU & KASHMIR": "JK", "LADAKH": "LA", "JHARKHAND": "JH",
+    "KARNATAKA": "KA", "KERALA": "KL", "MADHYA PRADESH": "MP", "MAHARASHTRA": "MH",
+    "MANIPUR": "MN", "MEGHALAYA": "ML", "MIZORAM": "MZ", "NAGALAND": "NL",
+    "ODISHA": "OD", "PUNJAB": "PB", "RAJASTHAN": "RJ", "SIKKIM": "SK",
+    "TAMIL NADU": "TN", "TELANGANA": "TG", "TRIPURA": "TR", "UTTAR PRADESH": "UP",
+    "UTTARAKHAND": "UK", "WEST BENGAL": "WB", "DELHI": "DL", "CHANDIGARH": "CH",
+    "PUDUCHERRY": "PY", "DAMAN & DIU": "DD", "ANDAMAN & NICOBAR": "AN"
+}
+# The same codes by normalizeName, so "Jammu and Kashmir" finds JK too
+NORMALIZED_STATE_CODES = {normalizeName(name): code for name, code in STATE_CODES.items()}
+NORMALIZED_STATE_CODES.setdefault(normalizeName("Andaman and Nicobar Islands"), "AN")
+GROUNDWATER_YEAR_TABLES = ("groundwater2019", "groundwater2020", "groundwater2021", "groundwater2022", "groundwater2023")
+
+
+def stateCodeFor(stateName):
+    """Map code of a state name, or None."""
+    code = STATE_CODES.get(stateName.upper())
+    if code is None:
+        code = NORMALIZED_STATE_CODES.get(normalizeName(stateName))
+    return code
+
+
+class CrosswalkRow:
+    """One canonical district and where it is in every table.
+
+    rainfallRow, aquiferRow and groundwaterRow are the rows getRainfall,
+    getAquifer and getGroundWaterLevel pick for this district (None where
+    they find nothing); groundwaterRows holds the district's own row in each
+    yearly groundwater table.
+    """
+
+    def __init__(self, district, state, stateCode, rainfallRow, aquiferRow, groundwaterRow, groundwaterRows):
+        self.district = district
+        self.state = state
+        self.stateCode = stateCode
+        self.rainfallRow = rainfallRow
+        self.aquiferRow = aquiferRow
+        self.groundwaterRow = groundwaterRow
+        self.groundwaterRows = groundwaterRows
+
+    def complete(self):
+        return None not in (self.rainfallRow, self.aquiferRow, self.groundwaterRow)
+
+
+def findFirst(index, keys):
+    for key in keys:
+        if key:
+            pos = index.find(key)
+            if pos is not None:
+                return pos
+    return None
+
+
+class LocationCrosswalk:
+    """Every canonical (district, state) joined to its rows in the rainfall,
+    aquifer and groundwater tables, keyed by the upper-cased names.
+
+    Rows are picked with the same lookups the getters use, so a known
+    district resolves to exactly what getRainfall, getAquifer and
+    getGroundWaterLevel would return, in one dict lookup. SVG path ids come
+    from the state's map template, read when the state is first asked for.
+    """
+
+    def __init__(self, tables, resolver):
+        self.tables = tables
+        store = tables.store
+        yearRows = {}
+        for table in GROUNDWATER_YEAR_TABLES:
+            if table not in store.tableHashes:
+                continue
+            rows = {}
+            keys = zip(store.keys(table, "District").tolist(), store.keys(table, "State").tolist())
+            for row, (district, state) in enumerate(keys):
+                rows.setdefault((district, normalizeName(state)), row)
+            yearRows[table] = rows
+
+        self.rows = {}
+        for entryId, kind in enumerate(resolver.kinds):
+            stateId = resolver.states[entryId]
+            if kind != "district" or stateId == -1:
+                continue
+            district, state = resolver.names[entryId], resolver.names[stateId]
+            key = (district.upper(), state.upper())
+            if key in self.rows:
+                continue
+            groundwaterRow = tables.groundwaterDistrictIndex.find(key[0])
+            if groundwaterRow is None:
+                groundwaterRow = tables.groundwaterStateIndex.find(key[1])
+            groundwaterKey = (district.strip().upper(), normalizeName(state))
+            self.rows[key] = CrosswalkRow(
+                district, state, stateCodeFor(state),
+                findFirst(tables.rainfallIndex, key),
+                findFirst(tables.aquiferStateIndex, key),
+                groundwaterRow,
+                {table: rows[groundwaterKey] for table, rows in yearRows.items() if groundwaterKey in rows},
+            )
+        self.lock = threading.Lock()
+        self.pathIds = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, districtName, stateName):
+        return self.rows.get((districtName.upper(), stateName.upper()))
+
+    def pathId(self, stateCode, districtName):
+        """Id of a district's path in a state map, matched ignoring case, or
+        None."""
+        if stateCode is None:
+            return None
+        ids = self.pathIds.get(stateCode)
+        if ids is None:
+            try:
+                template = templateStore.get(stateCode)
+                ids = {pathId.strip().upper(): pathId for pathId in reversed(template.pathIds) if pathId}
+            except OSError:
+                ids = {}
+            with self.lock:
+                self.pathIds[stateCode] = ids
+        return ids.get(districtName.strip().upper())
+
+    def svgPathId(self, row):
+        """Id of the row's district in its state map, or None."""
+        return self.pathId(row.stateCode, row.district)
+
+    def locationContext(self, districtName, stateName):
+        """What resolveLocation returns for a request, raising the same
+        ValueError the first failing getter would."""
+        row = self.get(districtName, stateName)
+        if row is None:
+            self.misses += 1
+            return locationContextFromTables(self.tables, districtName, stateName)
+        self.hits += 1
+        if row.rainfallRow is None:
+            raise ValueError(f"Rainfall data for {districtName}, {stateName} not available.")
+        if row.aquiferRow is None:
+            raise ValueError(f"Aquifer data for {districtName}, {stateName} not available.")
+        if row.groundwaterRow is None:
+            raise ValueError(f"GroundWaterLevel data for {districtName}, {stateName} not available.")
+        aquifer = self.tables.aquiferTypes[row.aquiferRow]
+        gw_pre, gw_post = self.tables.groundwaterLevels[row.groundwaterRow]
+        return {
+            "aquiferType": aquifer,
+            "aquiferScore": aquiferScore(aquifer),
+            "groundwaterPreMonsoon": gw_pre,
+            "groundwaterPostMonsoon": gw_post,
+            "rainfallMM": self.tables.rainfallNormal[row.rainfallRow],
+            "error": None,
+        }
+
+    def describe(self, row):
+        return {
+            "district": row.district,
+            "state": row.state,
+            "stateCode": row.stateCode,
+            "rainfallRow": row.rainfallRow,
+            "aquiferRow": row.aquiferRow,
+            "groundwaterRow": row.groundwaterRow,
+            "groundwaterRows": row.groundwaterRows,
+            "svgPathId": self.svgPathId(row),
+        }
+
+    def stats(self):
+        return {
+            "districts": len(self.rows),
+            "complete": sum(row.complete() for row in self.rows.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def locationContextFromTables(tables, districtName, stateName):
+    rainfall = tables.getRainfall(districtName, stateName)
+    aquifer = tables.getAquifer(districtName, stateName)
+    score = aquiferScore(aquifer)
+    gw_pre, gw_post = tables.getGroundWaterLevel(districtName, stateName)
+    return {
+        "aquiferType": aquifer,
+        "aquiferScore": score,
+        "groundwaterPreMonsoon": gw_pre,
+        "groundwaterPostMonsoon": gw_post,
+        "rainfallMM": rainfall,
+        "error": None,
+    }
+
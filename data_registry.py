@@ -0,0 +1,254 @@
+import os
+import threading
+import time
+
+from aquifer_model import ARTIFACT_PATH, MODEL_PATH, file_sha256, load_predictor
+from coordinate_resolver import CoordinateResolver
+from crosswalk import LocationCrosswalk
+from datastore import openStore, sourceSignature, storeHolder
+from file_handling import LocationTables
+from location_resolver import LocationResolver
+from map_cache import datasetHash
+from station_series import StationSeries, appendedReadings
+from stations import StationIndex
+
+
+def fileSignature(paths):
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+class DataSnapshot:
+    """Everything served from one version of databases/ and the aquifer
+    model. Snapshots are never changed once built: a reload builds a new
+    one (reusing the parts whose inputs did not change) and swaps it in, so
+    a request that took a snapshot sees the same data throughout.
+    """
+
+    def __init__(self, store, tables, resolver, crosswalk, stations, geocoder, series, mapVersion, predictor,
+                 modelVersion, modelError=None):
+        self.store = store
+        self.tables = tables
+        self.resolver = resolver
+        self.crosswalk = crosswalk
+        self.stations = stations
+        self.geocoder = geocoder
+        self.series = series
+        self.mapVersion = mapVersion
+        self.predictor = predictor
+        self.modelVersion = modelVersion
+        self.modelError = modelError
+        self.version = f"{store.sourceHash[:12]}-{modelVersion[:12]}"
+        self.createdAt = time.time()
+
+    @property
+    def dataVersion(self):
+        return self.store.sourceHash
+
+
+class DataRegistry:
+    """The current DataSnapshot, rebuilt when databases/*.csv or the model
+    files change.
+
+    current() is one attribute read. A watcher thread (start()) polls the
+    CSVs' and model files' mtimes and sizes every interval seconds; on a
+    change the new snapshot is built in that thread while requests keep
+    using the old one, then swapped in. A build that fails (e.g. a
+    malformed CSV) leaves the old snapshot in place until the files change
+    again. Callbacks given to subscribe() run after each swap.
+    """
+
+    def __init__(self, holder=storeHolder, modelPath=MODEL_PATH, artifactPath=ARTIFACT_PATH,
+                 backend="auto", interval=2.0):
+        self.holder = holder
+        self.modelPath = modelPath
+        self.artifactPath = artifactPath
+        self.backend = backend
+        self.interval = interval
+        self.snapshot = None
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.stopEvent = threading.Event()
+        self.watcher = None
+        self.storeSignature = None
+        self.modelSignature = None
+
+        self.reloads = 0
+        self.failures = 0
+        self.lastError = None
+        self.lastReloadAt = None
+        self.lastBuildSeconds = 0.0
+        self.previousVersion = None
+
+    def current(self):
+        snapshot = self.snapshot
+        if snapshot is None:
+            with self.lock:
+                if self.snapshot is None:
+                    self.storeSignature = sourceSignature(self.holder.databaseDir)
+                    self.modelSignature = fileSignature((self.modelPath, self.artifactPath))
+                    self.snapshot = self.build(self.holder.get(), None)
+                    self.lastBuildSeconds = time.time() - self.snapshot.createdAt
+                snapshot = self.snapshot
+        return snapshot
+
+    def loadModel(self):
+        """(predictor, version, error); predictor None when there is no model."""
+        try:
+            predictor = load_predictor(self.modelPath, self.artifactPath, backend=self.backend)
+        except FileNotFoundError as e:
+            return None, "none", str(e)
+        version = getattr(predictor, "source_sha256", None) or file_sha256(self.modelPath)
+        return predictor, version, None
+
+    def buildSeries(self, store, previous):
+        # Readings only added to the end of the station CSV are appended to
+        # the previous history instead of rebuilding it
+        if previous is not None:
+            added = appendedReadings(previous.store, store)
+            if added is not None:
+                return previous.series.append(added)
+        return StationSeries.fromStore(store)
+
+    def build(self, store, previous, reloadModel=True):
+        started = time.time()
+        if previous is not None and previous.store.sourceHash == store.sourceHash:
+            # Same contents (e.g. a file was only touched): keep the old store
+            store, tables, resolver, crosswalk, stations, geocoder, series, mapVersion = (
+                previous.store, previous.tables, previous.resolver, previous.crosswalk, previous.stations,
+                previous.geocoder, previous.series, previous.mapVersion
+            )
+        else:
+            tables = LocationTables(store)
+            resolver = LocationResolver(store)
+            crosswalk = LocationCrosswalk(tables, resolver)
+            stations = StationIndex.fromStore(store)
+            geocoder = CoordinateResolver(stations, crosswalk, resolver)
+            series = self.buildSeries(store, previous)
+            mapVersion = datasetHash(store=store)
+        if previous is not None and not reloadModel:
+            model = (previous.predictor, previous.modelVersion, previous.modelError)
+        else:
+            model = self.loadModel()
+        snapshot = DataSnapshot(store, tables, resolver, crosswalk, stations, geocoder, series, mapVersion, *model)
+        snapshot.createdAt = started
+        return snapshot
+
+    def reload(self, force=False):
+        """Rebuild the snapshot if its files changed (or always, with force).
+        Returns whether a new snapshot was swapped in."""
+        self.current()
+        with self.lock:
+            previous = self.snapshot
+            storeSignature = sourceSignature(self.holder.databaseDir)
+            modelSignature = fileSignature((self.modelPath, self.artifactPath))
+            storeChanged = force or storeSignature != self.storeSignature
+            modelChanged = force or modelSignature != self.modelSignature
+            if not (storeChanged or modelChanged):
+                return False
+
+            started = time.perf_counter()
+            try:
+                store = openStore(self.holder.databaseDir, self.holder.storePath) if storeChanged else previous.store
+                snapshot = self.build(store, previous, reloadModel=modelChanged)
+            except Exception as e:
+                # Keep serving the last good snapshot until the files change again
+                self.failures += 1
+                self.lastError = f"{type(e).__name__}: {e}"
+                print(f"Warning: could not reload data: {self.lastError}")
+                self.storeSignature, self.modelSignature = storeSignature, modelSignature
+                return False
+
+            self.snapshot = snapshot
+            self.holder.publish(snapshot.store, storeSignature)
+            self.storeSignature, self.modelSignature = storeSignature, modelSignature
+            self.lastBuildSeconds = time.perf_counter() - started
+            self.lastReloadAt = time.time()
+            self.lastError = None
+            self.reloads += 1
+            self.previousVersion = previous.version
+
+        for listener in list(self.listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"Warning: data reload listener failed: {e}")
+        return True
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def start(self):
+        """Start the watcher thread (no-op when interval is 0 or it runs)."""
+        if self.interval <= 0 or (self.watcher is not None and self.watcher.is_alive()):
+            return
+        self.current()
+        self.stopEvent.clear()
+        self.watcher = threading.Thread(target=self.watch, name="data-registry", daemon=True)
+        self.watcher.start()
+
+    def stop(self):
+        self.stopEvent.set()
+
+    def watch(self):
+        while not self.stopEvent.wait(self.interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Warning: data registry watcher: {e}")
+
+    def stats(self):
+        snapshot = self.current()
+        return {
+            "version": snapshot.version,
+            "previousVersion": self.previousVersion,
+            "dataVersion": snapshot.dataVersion,
+            "modelVersion": snapshot.modelVersion,
+            "modelLoaded": snapshot.predictor is not None,
+            "mapVersion": snapshot.mapVersion,
+            "tables": sorted(snapshot.store.tables()),
+            "snapshotAgeSeconds": round(time.time() - snapshot.createdAt, 3),
+            "watching": self.watcher is not None and self.watcher.is_alive(),
+            "interval": self.interval,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "lastError": self.lastError,
+            "lastReloadAt": self.lastReloadAt,
+            "lastBuildMs": round(self.lastBuildSeconds * 1000, 3),
+        }
+
+
+class DatasetVersionMiddleware:
+    """ASGI middleware adding an X-Dataset-Version header (the registry's
+    current snapshot version) to every HTTP response."""
+
+    def __init__(self, app, registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        version = self.registry.current().version.encode("latin-1")
+
+        async def sendWithVersion(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-dataset-version", version)]
+            await send(message)
+
+        await self.app(scope, receive, sendWithVersion)
+
+
+# AQUIFER_MODEL_BACKEND: "auto" (NumPy artifact when current), "numpy" or "sklearn";
+# DATA_RELOAD_INTERVAL: seconds between checks for changed files (0 disables)
+registry = DataRegistry(
+    backend=os.environ.get("AQUIFER_MODEL_BACKEND", "auto"),
+    interval=float(os.environ.get("DATA_RELOAD_INTERVAL", "2")),
+)
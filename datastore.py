@@ -0,0 +1,263 @@
+import glob
+import hashlib
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from depth_range import depthBounds, depthRangesFromCodes, range_to_midpoint
+from npz_arrays import MappedArrays
+
+DATABASE_DIR = 'databases'
+STORE_PATH = os.path.join(DATABASE_DIR, 'datastore.npz')
+STORE_VERSION = 1
+# Columns holding depth ranges like "10 to 20", stored pre-parsed as well
+DEPTH_COLUMNS = ('Pre_Monsoon', 'Post_Monsoon')
+
+
+def sourceFiles(databaseDir=DATABASE_DIR):
+    return sorted(glob.glob(os.path.join(databaseDir, '*.csv')))
+
+
+def sourceSignature(databaseDir=DATABASE_DIR):
+    signature = []
+    for path in sourceFiles(databaseDir):
+        stat = os.stat(path)
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def fileHash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def combinedHash(tableHashes):
+    digest = hashlib.sha256()
+    for table, tableHash in sorted(tableHashes.items()):
+        digest.update(f'{table}:{tableHash}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def tableName(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def buildArrays(databaseDir=DATABASE_DIR):
+    """Every CSV in databaseDir as columnar arrays.
+
+    Numeric columns are stored as they parse. Text columns become int32
+    codes into a categories array (code -1 for missing), plus the stripped,
+    upper-cased form of each category for name lookups, and for
+    DEPTH_COLUMNS each category's depthBounds and range_to_midpoint.
+    """
+    arrays = {'__version__': np.array(STORE_VERSION)}
+    tables, hashes = [], []
+    for path in sourceFiles(databaseDir):
+        table = tableName(path)
+        frame = pd.read_csv(path)
+        tables.append(table)
+        hashes.append(fileHash(path))
+        arrays[f'{table}/__columns__'] = np.array(list(frame.columns), dtype=str)
+        arrays[f'{table}/__rows__'] = np.array(len(frame))
+        for column in frame.columns:
+            series = frame[column]
+            prefix = f'{table}/{column}'
+            if series.dtype != object:
+                arrays[prefix] = series.to_numpy()
+                continue
+            codes, categories = pd.factorize(series, sort=False)
+            categories = [str(c) for c in categories]
+            arrays[f'{prefix}/codes'] = codes.astype(np.int32)
+            arrays[f'{prefix}/categories'] = np.array(categories, dtype=str)
+            arrays[f'{prefix}/keys'] = np.array([c.strip().upper() for c in categories], dtype=str)
+            if column in DEPTH_COLUMNS:
+                bounds = []
+                for label in categories:
+                    try:
+                        bounds.append(depthBounds(label))
+                    except ValueError:
+                        bounds.append((np.nan, np.nan))
+                arrays[f'{prefix}/depthLow'] = np.array([lo for lo, _ in bounds], dtype=float)
+                arrays[f'{prefix}/depthHigh'] = np.array([hi for _, hi in bounds], dtype=float)
+                arrays[f'{prefix}/depthMid'] = np.array([range_to_midpoint(c) for c in categories], dtype=float)
+    arrays['__tables__'] = np.array(tables, dtype=str)
+    arrays['__hashes__'] = np.array(hashes, dtype=str)
+    arrays['__sourceHash__'] = np.array(combinedHash(dict(zip(tables, hashes))))
+    return arrays
+
+
+def compileStore(databaseDir=DATABASE_DIR, storePath=STORE_PATH):
+    arrays = buildArrays(databaseDir)
+    tmpPath = f'{storePath}.{os.getpid()}.tmp.npz'
+    np.savez(tmpPath, **arrays)
+    os.replace(tmpPath, storePath)
+    return storePath
+
+
+def currentSourceHash(databaseDir=DATABASE_DIR):
+    return combinedHash({tableName(path): fileHash(path) for path in sourceFiles(databaseDir)})
+
+
+class DataStore:
+    """A read-only snapshot of the compiled database tables.
+
+    Text columns come back as object arrays of str (NaN where missing), built
+    from the stored codes and categories without parsing any CSV.
+    """
+
+    def __init__(self, arrays):
+        if int(arrays['__version__']) != STORE_VERSION:
+            raise ValueError(f"Unsupported data store version {int(arrays['__version__'])}")
+        self.arrays = arrays
+        self.sourceHash = str(arrays['__sourceHash__'])
+        self.tableHashes = dict(zip(arrays['__tables__'].tolist(), arrays['__hashes__'].tolist()))
+        self.decoded = {}
+
+    @classmethod
+    def load(cls, storePath=STORE_PATH):
+        return cls(MappedArrays(storePath))
+
+    def tables(self):
+        return list(self.tableHashes)
+
+    def columns(self, table):
+        return self.arrays[f'{table}/__columns__'].tolist()
+
+    def rows(self, table):
+        return int(self.arrays[f'{table}/__rows__'])
+
+    def isText(self, table, column):
+        return f'{table}/{column}/codes' in self.arrays
+
+    def codes(self, table, column):
+        """(codes, categories) of a text column."""
+        prefix = f'{table}/{column}'
+        return self.arrays[f'{prefix}/codes'], self.arrays[f'{prefix}/categories']
+
+    def decode(self, table, column, part):
+        # Per-category values as objects, with NaN appended for code -1
+        name = f'{table}/{column}/{part}'
+        values = self.decoded.get(name)
+        if values is None:
+            values = np.append(self.arrays[name].astype(object), np.nan)
+            self.decoded[name] = values
+        return values
+
+    def column(self, table, column):
+        if not self.isText(table, column):
+            return self.arrays[f'{table}/{column}']
+        return self.decode(table, column, 'categories')[self.arrays[f'{table}/{column}/codes']]
+
+    def keys(self, table, column):
+        """Stripped, upper-cased values of a text column."""
+        return self.decode(table, column, 'keys')[self.arrays[f'{table}/{column}/codes']]
+
+    def depth(self, table, column, part):
+        """Per-row depthLow, depthHigh or depthMid of a depth range column."""
+        values = np.append(self.arrays[f'{table}/{column}/{part}'], np.nan)
+        return values[self.arrays[f'{table}/{column}/codes']]
+
+    def depthRanges(self, table, column):
+        """Per-row DepthRange objects of a depth range column."""
+        prefix = f'{table}/{column}'
+        return depthRangesFromCodes(
+            self.arrays[f'{prefix}/codes'],
+            self.arrays[f'{prefix}/categories'].tolist(),
+            self.arrays[f'{prefix}/depthLow'],
+            self.arrays[f'{prefix}/depthHigh'],
+            self.arrays[f'{prefix}/depthMid'],
+        )
+
+    def frame(self, table, columns=None):
+        columns = columns or self.columns(table)
+        return pd.DataFrame({column: self.column(table, column) for column in columns}, columns=columns)
+
+
+def openStore(databaseDir=DATABASE_DIR, storePath=STORE_PATH):
+    """The compiled store for databaseDir, recompiled first when it is
+    missing, from another format version or out of date with the CSVs. If
+    the store cannot be written it is built in memory instead."""
+    sourceHash = currentSourceHash(databaseDir)
+    try:
+        store = DataStore.load(storePath)
+        if store.sourceHash == sourceHash:
+            return store
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        compileStore(databaseDir, storePath)
+        return DataStore.load(storePath)
+    except OSError as e:
+        print(f"Warning: could not write data store '{storePath}' ({e}); building it in memory.")
+        return DataStore(buildArrays(databaseDir))
+
+
+class StoreHolder:
+    """The current DataStore, replaced when the CSVs change.
+
+    refresh() looks at the CSVs' mtimes and sizes at most every
+    checkInterval seconds and reopens (recompiling) the store when they moved.
+    A CSV that fails to load leaves the previous store in place. The data
+    registry (data_registry.py) does its own watching and hands the new
+    store over with publish() as it swaps in everything built from it.
+    """
+
+    def __init__(self, databaseDir=DATABASE_DIR, storePath=STORE_PATH, checkInterval=1.0):
+        self.databaseDir = databaseDir
+        self.storePath = storePath
+        self.checkInterval = checkInterval
+        self.lock = threading.Lock()
+        self.store = None
+        self.signature = None
+        self.lastCheck = 0.0
+
+    def get(self):
+        if self.store is None:
+            with self.lock:
+                if self.store is None:
+                    self.signature = sourceSignature(self.databaseDir)
+                    self.store = openStore(self.databaseDir, self.storePath)
+                    self.lastCheck = time.monotonic()
+        return self.store
+
+    def publish(self, store, signature):
+        with self.lock:
+            self.store = store
+            self.signature = signature
+            self.lastCheck = time.monotonic()
+
+    def refresh(self):
+        store = self.get()
+        now = time.monotonic()
+        if now - self.lastCheck < self.checkInterval:
+            return store
+        with self.lock:
+            if now - self.lastCheck >= self.checkInterval:
+                signature = sourceSignature(self.databaseDir)
+                if signature != self.signature:
+                    try:
+                        self.store = openStore(self.databaseDir, self.storePath)
+                    except Exception as e:
+                        # Keep serving the last good store until the CSVs change again
+                        print(f"Warning: could not reload data from '{self.databaseDir}': {e}")
+                    self.signature = signature
+                self.lastCheck = now
+            return self.store
+
+
+storeHolder = StoreHolder()
+
+
+def getStore():
+    return storeHolder.get()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'compile':
+        print('Wrote', compileStore(*sys.argv[2:4]))
+    else:
+        print('Usage: python datastore.py compile [DATABASE_DIR] [STORE_PATH]')
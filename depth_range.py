@@ -0,0 +1,113 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Labels the groundwater tables use when a season was not measured
+MISSING_LABELS = ('N.A.',)
+
+
+def depthBounds(label):
+    """(low, high) in metres of a depth range label: "a to b" -> (a, b),
+    ">x" -> (x, inf), anything else -> (6, 8)."""
+    if 'to' in label:
+        lo, hi = [float(x.strip()) for x in label.split('to')]
+    elif '>' in label:
+        lo, hi = float(label.replace('>', '').strip()), float('inf')
+    else:
+        lo = 6
+        hi = 8
+    return lo, hi
+
+
+# Helper function for range conversion
+def range_to_midpoint(range_str: str) -> float:
+    if not range_str or pd.isna(range_str):
+        return np.nan
+    if 'to' in range_str:
+        parts = range_str.split('to')
+        try:
+            low = float(parts[0].strip())
+            high = float(parts[1].strip())
+            return (low + high) / 2
+        except (ValueError, IndexError):
+            return np.nan
+    elif '>' in range_str:
+        try:
+            value = float(range_str.replace('>', '').strip())
+            return value + 5  # Assume >40 means ~45
+        except ValueError:
+            return np.nan
+    else:
+        try:
+            return float(range_str)
+        except ValueError:
+            return np.nan
+
+
+class DepthRange(str):
+    """A groundwater depth label ("10 to 20", ">40", "N.A.") carrying its
+    parsed values, so code that needs numbers never re-parses the string.
+
+    It is still the label itself, so it compares, hashes and serializes
+    exactly like the plain strings it replaces. low/high follow depthBounds
+    (">40" -> (40, inf)), which feasibility scores with; midpoint follows
+    range_to_midpoint (">40" -> 45), the value the aquifer model was trained
+    on. missing is set for the "N.A." marker and for labels that do not parse.
+    """
+
+    def __new__(cls, label, low, high, midpoint, missing):
+        self = super().__new__(cls, label)
+        self.low = low
+        self.high = high
+        self.midpoint = midpoint
+        self.missing = missing
+        return self
+
+    def __getnewargs__(self):
+        return (str(self), self.low, self.high, self.midpoint, self.missing)
+
+    def __repr__(self):
+        return (f"DepthRange({str(self)!r}, low={self.low}, high={self.high}, "
+                f"midpoint={self.midpoint}, missing={self.missing})")
+
+    @property
+    def label(self):
+        return str(self)
+
+    @classmethod
+    def parse(cls, label):
+        if isinstance(label, DepthRange):
+            return label
+        return parseDepthRange(label)
+
+    @classmethod
+    def single(cls, depth):
+        """A DepthRange for one depth in metres (a measured or projected level)."""
+        return cls(f"{depth:g}", depth, depth, depth, False)
+
+
+@lru_cache(maxsize=1024)
+def parseDepthRange(label):
+    if label is None or (isinstance(label, float) and np.isnan(label)):
+        label = MISSING_LABELS[0]
+    label = str(label)
+    try:
+        low, high = depthBounds(label)
+        missing = label in MISSING_LABELS
+    except ValueError:
+        low, high, missing = np.nan, np.nan, True
+    return DepthRange(label, low, high, range_to_midpoint(label), missing)
+
+
+def depthRangesFromCodes(codes, labels, low, high, midpoint):
+    """One DepthRange per row of a categorical depth column, sharing one
+    object per category; code -1 (no value) becomes the missing range."""
+    ranges = [
+        DepthRange(label, lo, hi, mid, label in MISSING_LABELS or bool(np.isnan(hi)))
+        for label, lo, hi, mid in zip(labels, low.tolist(), high.tolist(), midpoint.tolist())
+    ]
+    byCode = np.empty(len(ranges) + 1, dtype=object)
+    byCode[:len(ranges)] = ranges
+    byCode[-1] = parseDepthRange(None)
+    return byCode[codes]
@@ -1,74 +1,193 @@
 import pandas as pd
 import re
+from bisect import bisect_left, bisect_right
+
+from datastore import DATABASE_DIR
+from depth_range import DepthRange, depthBounds
+from lru_cache import MISSING, LRUCache
+
+# The full tables as DataFrames, by module attribute name
+DATA_FRAMES = {
+    'rainfallData': 'rainfall_database',
+    'stateAquiferData': 'statewise_aquifier',
+    'aquiferScores': 'aquifer_score',
+    'groundwaterData': 'groundwater2023',
+}
+
 
-# Load databases
-rainfallData = pd.read_csv('databases\\rainfall_database.csv')
-stateAquiferData = pd.read_csv('databases\\statewise_aquifier.csv')
-aquiferScores = pd.read_csv('databases\\aquifer_score.csv')
-aquiferScores['Aquifer_Type'] = aquiferScores['Aquifer_Type'].str.upper()
-groundwaterData = pd.read_csv('databases\\groundwater2023.csv')
+def currentTables():
+    """LocationTables of the data snapshot being served."""
+    from data_registry import registry
+    return registry.current().tables
+
+
+def __getattr__(name):
+    # store and the DataFrames follow the data registry's current snapshot
+    if name == 'store':
+        return currentTables().store
+    if name not in DATA_FRAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return currentTables().frame(name)
+# Characters that make a lookup key a pattern rather than a plain substring
+REGEX_METACHARACTERS = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+
+class LocationIndex:
+    """Upper-cased name index over one table column, built once at load.
+
+    Exact hits are a dict lookup. Otherwise the key is a regular expression
+    searched for in each name, as the old str.contains scan did, and the
+    first row (in table order) it matches wins. Keys without regex
+    metacharacters, nearly all of them, are plain substrings and search every
+    name at once in a single joined string.
+    """
+
+    SEPARATOR = '\n'
+    MAX_MEMO = 4096
+
+    def __init__(self, names):
+        self.keys = ['' if pd.isna(name) else str(name).upper() for name in names]
+        self.exact = {}
+        for pos, key in enumerate(self.keys):
+            if key:
+                self.exact.setdefault(key, pos)
+
+        self.offsets = []
+        start = 0
+        for key in self.keys:
+            self.offsets.append(start)
+            start += len(key) + len(self.SEPARATOR)
+        self.haystack = self.SEPARATOR.join(self.keys)
+        self.sortedKeys = sorted(self.exact)
+        self.memo = LRUCache(self.MAX_MEMO)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, key):
+        key = key.upper()
+        pos = self.exact.get(key)
+        if pos is not None:
+            return pos
+        return self.findSubstring(key)
+
+    def findSubstring(self, key):
+        pos = self.memo.get(key, MISSING)
+        if pos is not MISSING:
+            return pos
+        pos = None
+        if REGEX_METACHARACTERS.search(key):
+            pos = self.findPattern(key)
+        elif self.SEPARATOR not in key:
+            hit = self.haystack.find(key)
+            if hit != -1:
+                pos = bisect_right(self.offsets, hit) - 1
+        self.memo.put(key, pos)
+        return pos
+
+    def findPattern(self, key):
+        # "KAMRUP (METRO)" is a regex matching "KAMRUP METRO"; a key that is
+        # not a valid pattern matches nothing
+        try:
+            pattern = re.compile(key)
+        except re.error:
+            return None
+        for pos, name in enumerate(self.keys):
+            if name and pattern.search(name):
+                return pos
+        return None
+
+    def withPrefix(self, prefix, limit=10):
+        prefix = prefix.upper()
+        start = bisect_left(self.sortedKeys, prefix)
+        matches = []
+        for key in self.sortedKeys[start:]:
+            if not key.startswith(prefix) or len(matches) >= limit:
+                break
+            matches.append(key)
+        return matches
+
+
+class LocationTables:
+    """Name indexes and per-row values of the rainfall, aquifer and
+    groundwater tables of one DataStore, built once per store."""
+
+    def __init__(self, store):
+        self.store = store
+        self.frames = {}
+        self.rainfallIndex = LocationIndex(store.keys('rainfall_database', 'NAME'))
+        self.rainfallNormal = store.column('rainfall_database', 'NORMAL').astype(float).tolist()
+
+        self.aquiferStateIndex = LocationIndex(store.keys('statewise_aquifier', 'State'))
+        self.aquiferTypes = store.column('statewise_aquifier', 'Dominant_Aquifer_Type').tolist()
+
+        self.groundwaterDistrictIndex = LocationIndex(store.keys('groundwater2023', 'District'))
+        self.groundwaterStateIndex = LocationIndex(store.keys('groundwater2023', 'State'))
+        # (pre-monsoon, post-monsoon) DepthRange per row, parsed once here
+        self.groundwaterLevels = list(zip(
+            store.depthRanges('groundwater2023', 'Pre_Monsoon').tolist(),
+            store.depthRanges('groundwater2023', 'Post_Monsoon').tolist()
+        ))
+
+    def frame(self, name):
+        # Built only if someone asks for it
+        frame = self.frames.get(name)
+        if frame is None:
+            frame = self.store.frame(DATA_FRAMES[name])
+            if name == 'aquiferScores':
+                frame['Aquifer_Type'] = frame['Aquifer_Type'].str.upper()
+            self.frames[name] = frame
+        return frame
+
+    # Used for Rainfall
+    def getRainfall(self, districtName, stateName):
+        search_keys = [districtName, stateName]
+        for key in search_keys:
+            if not key:
+                continue
+            pos = self.rainfallIndex.find(key)
+            if pos is not None:
+                return self.rainfallNormal[pos]
+        raise ValueError(f"Rainfall data for {districtName}, {stateName} not available.")
+
+    # Used for Aquifer
+    def getAquifer(self, districtName, stateName):
+        search_keys = [districtName, stateName]
+        for key in search_keys:
+            if not key:
+                continue
+            pos = self.aquiferStateIndex.find(key)
+            if pos is not None:
+                return self.aquiferTypes[pos]
+        raise ValueError(f"Aquifer data for {districtName}, {stateName} not available.")
+
+    # Used to return the GroundWaterLevel
+    def getGroundWaterLevel(self, districtName, stateName):
+        pos = self.groundwaterDistrictIndex.find(districtName)
+        if pos is None:
+            pos = self.groundwaterStateIndex.find(stateName)
+        if pos is not None:
+            return self.groundwaterLevels[pos]
+
+        raise ValueError(f"GroundWaterLevel data for {districtName}, {stateName} not available.")
 
 
-# Used for Rainfall
 def getRainfall(districtName, stateName):
-    search_keys = [districtName, stateName]
-    for key in search_keys:
-        if not key:
-            continue
-        row = rainfallData[rainfallData['NAME'].str.upper() == key.upper()]
-        if not row.empty:
-            return float(row.iloc[0]['NORMAL'])
-        row = rainfallData[rainfallData['NAME'].str.upper().str.contains(key.upper(), na=False)]
-        if not row.empty:
-            return float(row.iloc[0]['NORMAL'])
-    raise ValueError(f"Rainfall data for {districtName}, {stateName} not available.")
-
-
-# Used for Aquifer
+    return currentTables().getRainfall(districtName, stateName)
+
+
 def getAquifer(districtName, stateName):
-    search_keys = [districtName, stateName]
-    for key in search_keys:
-        if not key:
-            continue
-        row = stateAquiferData[stateAquiferData['State'].str.upper() == key.upper()]
-        if not row.empty:
-            return row.iloc[0]['Dominant_Aquifer_Type']
-        row = stateAquiferData[stateAquiferData['State'].str.upper().str.contains(key.upper(), na=False)]
-        if not row.empty:
-            return row.iloc[0]['Dominant_Aquifer_Type']
-    raise ValueError(f"Aquifer data for {districtName}, {stateName} not available.")
-
-
-# Used to return the GroundWaterLevel
+    return currentTables().getAquifer(districtName, stateName)
+
+
 def getGroundWaterLevel(districtName, stateName):
-    row = groundwaterData[groundwaterData['District'].str.upper() == districtName.upper()]
-    if not row.empty:
-        return str(row.iloc[0]['Pre_Monsoon']), str(row.iloc[0]['Post_Monsoon'])
-    
-    row = groundwaterData[groundwaterData['District'].str.upper().str.contains(districtName.upper(), na=False)]
-    if not row.empty:
-        return str(row.iloc[0]['Pre_Monsoon']), str(row.iloc[0]['Post_Monsoon'])
-    
-    row = groundwaterData[groundwaterData['State'].str.upper() == stateName.upper()]
-    if not row.empty:
-        return str(row.iloc[0]['Pre_Monsoon']), str(row.iloc[0]['Post_Monsoon'])
-    
-    row = groundwaterData[groundwaterData['State'].str.upper().str.contains(stateName.upper(), na=False)]
-    if not row.empty:
-        return str(row.iloc[0]['Pre_Monsoon']), str(row.iloc[0]['Post_Monsoon'])
-    
-    raise ValueError(f"GroundWaterLevel data for {districtName}, {stateName} not available.")
+    return currentTables().getGroundWaterLevel(districtName, stateName)
 
 
 def parseDepth(groundWaterLevel):
-    if 'to' in groundWaterLevel:
-        lo, hi = [float(x.strip()) for x in groundWaterLevel.split('to')]
-    elif '>' in groundWaterLevel:
-        lo, hi = float(groundWaterLevel.replace('>', '').strip()), float('inf')
-    else:
-        lo = 6
-        hi = 8
-    mid = (lo + (hi if hi != float('inf') else lo)) / 2.0
+    if isinstance(groundWaterLevel, DepthRange):
+        return groundWaterLevel.high
+    lo, hi = depthBounds(groundWaterLevel)
     return hi
 
 
@@ -1,23 +1,33 @@
-from fastapi import FastAPI, HTTPException, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, FileResponse
-from pydantic import BaseModel
+from fastapi.responses import HTMLResponse, FileResponse, Response
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 import pandas as pd
 import numpy as np
-import joblib
+import asyncio
 import os
-import uuid
-import glob
-from typing import Dict
+from typing import Dict, List, Optional
 from pathlib import Path
 
+@asynccontextmanager
+async def lifespan(app):
+    # Watch databases/ and the model files for changes while serving
+    registry.start()
+    yield
+    registry.stop()
+    if renderPool is not None:
+        renderPool.shutdown()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Integrated Water Resource Management System",
     description="Combined Rainwater Harvesting and Aquifer Analysis System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Set up base dir
@@ -42,36 +52,80 @@ app.add_middleware(
 
 # Import custom modules
 from rwh import RainwaterHarvesting
-from file_handling import getAquifer, getRainfall, aquiferScore, getGroundWaterLevel
-from SVGcoloring import rainfallColoring, postMonsoonColoring, preMonsoonColoring, aquiferColoring, highlightBorder
-
-# Load aquifer model and encoders
-MODEL_PATH = "aquifer_recommendation_model.pkl"
-model_loaded = False
-
-try:
-    model_data = joblib.load(MODEL_PATH)
-    aquifer_model = model_data['model']
-    scaler = model_data['scaler']
-    label_encoder = model_data['label_encoder']
-    target_encoder = model_data['target_encoder']
-    features = model_data['features']
-    model_loaded = True
-except FileNotFoundError:
+from aquifer_model import MODEL_PATH
+from data_registry import registry, DatasetVersionMiddleware
+from result_cache import resultCache
+from crosswalk import stateCodeFor
+from batch_feasibility import MAX_BATCH_BYTES, readBatchRecords, batchFeasibility
+from map_cache import MapCache, RenderPool
+from microbatch import MicroBatcher, QueueFull
+from map_templates import templateStore
+from trends import GroundwaterTrends, parseFields
+from stations import NEAREST_STATIONS, STATION_MAX_KM
+from depth_range import DepthRange
+
+# Data tables, lookups and the aquifer model, swapped as one when files change
+snapshot = registry.current()
+app.add_middleware(DatasetVersionMiddleware, registry=registry)
+# Rendered maps are cached per (state, layer, dataset, highlight); misses are
+# rendered in RENDER_WORKERS processes (0: in threads of this one)
+render_workers = int(os.environ.get("RENDER_WORKERS", min(4, os.cpu_count() or 1)))
+renderPool = RenderPool(render_workers) if render_workers > 0 else None
+mapCache = MapCache(version=snapshot.mapVersion, renderPool=renderPool)
+# /groundwater-trends body, rebuilt only when the groundwater CSVs change
+groundwaterTrends = GroundwaterTrends()
+
+if snapshot.predictor is None:
     print(f"Warning: Aquifer model file '{MODEL_PATH}' not found. Aquifer prediction features will be disabled.")
-    aquifer_model = None
-    scaler = None
-    label_encoder = None
-    target_encoder = None
-    features = []
+
+def on_data_reload(snapshot):
+    mapCache.setDataset(snapshot.mapVersion, snapshot.store)
+    groundwaterTrends.refresh()
+
+registry.subscribe(on_data_reload)
+
+def current_predictor():
+    """The aquifer predictor of the current data snapshot, or None."""
+    return registry.current().predictor
+
+def predict_current(requests):
+    return current_predictor().predict(requests)
+
+def preload():
+    """Build everything requests read lazily (map templates, SVG path ids,
+    trends, the model's node lists), so prefork.py can share it with workers."""
+    snapshot = registry.current()
+    templateStore.preload()
+    for row in snapshot.crosswalk.rows.values():
+        snapshot.crosswalk.svgPathId(row)
+    groundwaterTrends.refresh()
+    if snapshot.predictor is not None:
+        snapshot.predictor.predict_proba(np.zeros((1, len(snapshot.predictor.features))))
+
+# Optional micro-batching of /aquifer/predict: concurrent requests share one model call
+aquifer_batcher = None
+if os.environ.get("AQUIFER_MICROBATCH", "0") == "1":
+    aquifer_batcher = MicroBatcher(
+        predict_current,
+        max_batch_size=int(os.environ.get("AQUIFER_BATCH_MAX_SIZE", "64")),
+        max_wait_ms=float(os.environ.get("AQUIFER_BATCH_MAX_WAIT_MS", "2")),
+        max_queue=int(os.environ.get("AQUIFER_BATCH_MAX_QUEUE", "1024"))
+    )
 
 # Request/Response Models for Rainwater Harvesting
 class RWHRequest(BaseModel):
-    district: str
-    state: str
+    # May be left empty when lat/lon are given
+    district: str = ""
+    state: str = ""
     roofArea: float
     roofType: str
     dwellers: int
+    # Optional rooftop location: feasibility then uses the nearest wells' measured level,
+    # and the district there when the names are missing or unknown
+    lat: Optional[float] = Field(None, ge=-90, le=90)
+    lon: Optional[float] = Field(None, ge=-180, le=180)
+    # Score with next year's projected groundwater depths (/groundwater-forecast)
+    useForecast: bool = False
 
 # Request/Response Models for Aquifer Prediction
 class AquiferPredictionRequest(BaseModel):
@@ -89,57 +143,36 @@ class AquiferPredictionResponse(BaseModel):
     prediction: str
     probabilities: Dict[str, float]
 
-# Helper function for range conversion
-def range_to_midpoint(range_str: str) -> float:
-    if not range_str or pd.isna(range_str):
-        return np.nan
-    if 'to' in range_str:
-        parts = range_str.split('to')
-        try:
-            low = float(parts[0].strip())
-            high = float(parts[1].strip())
-            return (low + high) / 2
-        except (ValueError, IndexError):
-            return np.nan
-    elif '>' in range_str:
-        try:
-            value = float(range_str.replace('>', '').strip())
-            return value + 5  # Assume >40 means ~45
-        except ValueError:
-            return np.nan
-    else:
-        try:
-            return float(range_str)
-        except ValueError:
-            return np.nan
+class AquiferBatchPredictionItem(BaseModel):
+    prediction: Optional[str] = None
+    probabilities: Optional[Dict[str, float]] = None
+    error: Optional[str] = None
 
-# Helper function for SVG generation
-def createSVGs(districtName, stateName):
-    uid = uuid.uuid4()
-    state_code_map = {
-        "ANDHRA PRADESH": "AP", "ARUNACHAL PRADESH": "AR", "ASSAM": "AS", "BIHAR": "BR",
-        "CHHATTISGARH": "CG", "GOA": "GA", "GUJARAT": "GJ", "HARYANA": "HR",
-        "HIMACHAL PRADESH": "HP", "JAMMU & KASHMIR": "JK", "LADAKH": "LA", "JHARKHAND": "JH",
-        "KARNATAKA": "KA", "KERALA": "KL", "MADHYA PRADESH": "MP", "MAHARASHTRA": "MH",
-        "MANIPUR": "MN", "MEGHALAYA": "ML", "MIZORAM": "MZ", "NAGALAND": "NL",
-        "ODISHA": "OD", "PUNJAB": "PB", "RAJASTHAN": "RJ", "SIKKIM": "SK",
-        "TAMIL NADU": "TN", "TELANGANA": "TG", "TRIPURA": "TR", "UTTAR PRADESH": "UP",
-        "UTTARAKHAND": "UK", "WEST BENGAL": "WB", "DELHI": "DL", "CHANDIGARH": "CH",
-        "PUDUCHERRY": "PY", "DAMAN & DIU": "DD", "ANDAMAN & NICOBAR": "AN"
-    }
-    stateCode = state_code_map.get(f"{stateName.upper()}", stateName.upper()[:2])
+MAX_AQUIFER_BATCH = 10000
 
-    try:
-        rainfallColoring(stateCode,)
-        preMonsoonColoring(stateCode)
-        postMonsoonColoring(stateCode)
-        aquiferColoring()
-        highlightBorder(districtName, "postmonsoon.svg")
-        highlightBorder(districtName, "premonsoon.svg")
-        highlightBorder(districtName, "rainfall.svg")
-        highlightBorder(stateCode, "aquifer_map.svg")
-    except Exception as e:
-        print(f"SVG generation warning: {e}")
+# Helper function for SVG generation
+async def createSVGs(districtName, stateName):
+    stateCode = stateCodeFor(stateName) or stateName.upper()[:2]
+    # Outline the district's path in the state map under its own id. It is
+    # matched ignoring case, as the result cache keys names, so every
+    # spelling of a district gets the same maps
+    crosswalk = registry.current().crosswalk
+    # The first lookup in a state parses its map template
+    highlight = crosswalk.pathId(stateCode, districtName) if stateCode in crosswalk.pathIds \
+        else await run_in_threadpool(crosswalk.pathId, stateCode, districtName)
+
+    # The four maps render concurrently; maps keeps the layers before the
+    # first failure, so "aquifer" is only there when all of them succeeded
+    layers = [(stateCode, layer, highlight) for layer in ("rainfall", "premonsoon", "postmonsoon")]
+    layers.append(("INDIA", "aquifer", stateCode))
+    urls = await asyncio.gather(*(mapCache.urlAsync(*args) for args in layers), return_exceptions=True)
+    maps = {}
+    for (_, layer, _), url in zip(layers, urls):
+        if isinstance(url, Exception):
+            print(f"SVG generation warning: {url}")
+            break
+        maps[layer] = url
+    return maps
 
 # Main Routes (from app.py)
 @app.get("/")
@@ -150,15 +183,65 @@ def serve_index():
         return FileResponse(file_path)
     return {"message": "Integrated Water Resource Management System is running"}
 
+def locate_request(snapshot, data):
+    """data with the district and state at its coordinates, or None."""
+    if data.lat is None or data.lon is None:
+        return None
+    located = snapshot.geocoder.resolve(data.lat, data.lon)
+    if located is None:
+        return None
+    return data.model_copy(update={"district": located["district"], "state": located["state"]})
+
 @app.post("/process-location")
-def process_location(data: RWHRequest):
+async def process_location(data: RWHRequest):
     """Process rainwater harvesting feasibility"""
     try:
         # Fetch data
-        rainfall = getRainfall(data.district, data.state)
-        aquifer = getAquifer(data.district, data.state)
-        score = aquiferScore(aquifer)
-        gw_pre, gw_post = getGroundWaterLevel(data.district, data.state)
+        snapshot = registry.current()
+        if not data.district.strip():
+            located = locate_request(snapshot, data)
+            if located is None:
+                raise ValueError("Give a district, or coordinates near a groundwater monitoring station.")
+            data = located
+        cached = resultCache.response(snapshot, data)
+        if cached is not None:
+            return cached
+        try:
+            context = resultCache.locationContext(snapshot, data.district, data.state)
+        except ValueError:
+            # Names the datasets do not know: use the district at the coordinates
+            located = locate_request(snapshot, data)
+            if located is None:
+                raise
+            data = located
+            cached = resultCache.response(snapshot, data)
+            if cached is not None:
+                return cached
+            context = resultCache.locationContext(snapshot, data.district, data.state)
+        rainfall = context["rainfallMM"]
+        aquifer = context["aquiferType"]
+        score = context["aquiferScore"]
+        gw_pre, gw_post = context["groundwaterPreMonsoon"], context["groundwaterPostMonsoon"]
+
+        # Projected depths in place of the district's ranges, where the trend could be fitted
+        gw_before, gw_current = gw_pre, gw_post
+        forecast = None
+        if data.useForecast:
+            forecast = groundwaterTrends.forecast().district(data.state, data.district)
+            # A trend projected up to the surface (clipped to 0) says nothing
+            # usable about depth, so the district's own range is kept for it
+            if forecast is not None:
+                if (forecast["preMonsoon"]["projected"] or 0) > 0:
+                    gw_before = DepthRange.single(forecast["preMonsoon"]["projected"])
+                if (forecast["postMonsoon"]["projected"] or 0) > 0:
+                    gw_current = DepthRange.single(forecast["postMonsoon"]["projected"])
+
+        # Measured level of the wells nearest the rooftop, in place of the post-monsoon depth
+        measured = None
+        if data.lat is not None and data.lon is not None:
+            measured = snapshot.stations.estimate(data.lat, data.lon, NEAREST_STATIONS, STATION_MAX_KM)
+        if measured is not None:
+            gw_current = DepthRange.single(measured["currentlevel"])
 
         # Calculate RWH
         user_rwh = RainwaterHarvesting(
@@ -168,11 +251,12 @@ def process_location(data: RWHRequest):
             dwellers=data.dwellers
         )
 
-        feasibility = user_rwh.feasibility(gw_pre, gw_post, score)
+        feasibility = user_rwh.feasibility(gw_before, gw_current, score)
 
         # Generate SVGs
+        maps = {}
         try:
-            createSVGs(data.district, data.state)
+            maps = await createSVGs(data.district, data.state)
         except Exception as e:
             print("SVG generation failed:", e)
 
@@ -189,28 +273,152 @@ def process_location(data: RWHRequest):
             "rainfallMM": rainfall,
             "annualDemandLiters": user_rwh.annualDemand(),
             "harvestedWaterLiters": user_rwh.harvestedWaterFromRoof(),
-            "feasibilityScore": feasibility
+            "feasibilityScore": feasibility,
+            "maps": maps
         }
+        if data.lat is not None and data.lon is not None:
+            response["groundwaterMeasured"] = measured
+        if data.useForecast:
+            response["groundwaterForecast"] = forecast
+        # A failed map render is not cached; the aquifer map is made last
+        if "aquifer" in maps:
+            resultCache.storeResponse(snapshot, data, response)
 
         return response
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def read_batch_body(request):
+    """The request body, refused with 413 as soon as it is known to be
+    larger than MAX_BATCH_BYTES (up front when it has a Content-Length)."""
+    too_large = HTTPException(status_code=413, detail=f"Batch too large: body over {MAX_BATCH_BYTES} bytes")
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > MAX_BATCH_BYTES:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_BATCH_BYTES:
+            raise too_large
+    return bytes(body)
+
+@app.post("/process-location/batch")
+async def process_location_batch(request: Request):
+    """Process rainwater harvesting feasibility for many rooftops at once.
+
+    Accepts a JSON array of /process-location bodies, or a CSV / NDJSON upload
+    (Content-Type text/csv or application/x-ndjson) with the same columns.
+    Maps are not generated; an empty batch gives an empty list.
+    """
+    body = await read_batch_body(request)
+    try:
+        frame = readBatchRecords(body, request.headers.get("content-type"))
+    except OverflowError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch: {e}")
+
+    result = await run_in_threadpool(batchFeasibility, frame)
+    return Response(content=result.to_json(orient="records", double_precision=15), media_type="application/json")
+
 @app.get("/groundwater-trends")
-def groundwater_trends():
+def groundwater_trends(request: Request):
     """Get historical groundwater level trends"""
-    allFiles = glob.glob("databases\\groundwater*.csv")
-    fileList = [pd.read_csv(f) for f in allFiles]
-    groundwater = pd.concat(fileList, ignore_index=True)
-    trend_data = {}
-    for district, group in groundwater.groupby("District"):
-        group_sorted = group.sort_values("Year")
-        trend_data[district] = {
-            "Pre_Monsoon": group_sorted[["Year","Pre_Monsoon"]].values.tolist(),
-            "Post_Monsoon": group_sorted[["Year","Post_Monsoon"]].values.tolist()
-        }
-    return trend_data
+    status, body, headers = groundwaterTrends.response(
+        request.headers.get("if-none-match"), request.headers.get("accept-encoding")
+    )
+    return Response(body, status_code=status, headers=headers, media_type="application/json")
+
+@app.get("/groundwater-trends/{state}")
+def groundwater_state_trends(
+    state: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    fields: Optional[str] = None
+):
+    """Get a page of groundwater level trends for the districts of one state"""
+    try:
+        selected = parseFields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = groundwaterTrends.index().state(state, offset, limit, selected)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No groundwater data for state {state}")
+    return result
+
+@app.get("/groundwater-trends/{state}/{district}")
+def groundwater_district_trends(state: str, district: str, fields: Optional[str] = None):
+    """Get groundwater level trends for one district"""
+    try:
+        selected = parseFields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = groundwaterTrends.index().district(state, district, selected)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No groundwater data for {district}, {state}")
+    return result
+
+@app.get("/groundwater-forecast")
+def groundwater_forecast(years_ahead: int = Query(1, ge=1, le=10), state: Optional[str] = None):
+    """Get projected groundwater depths and trends for every district, or one state's"""
+    result = groundwaterTrends.forecast().all(years_ahead, state)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No groundwater data for state {state}")
+    return result
+
+@app.get("/groundwater-forecast/{state}/{district}")
+def groundwater_district_forecast(state: str, district: str, years_ahead: int = Query(1, ge=1, le=10)):
+    """Get the projected groundwater depths and trend of one district"""
+    result = groundwaterTrends.forecast().district(state, district, years_ahead)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No groundwater data for {district}, {state}")
+    return result
+
+@app.get("/groundwater/nearest")
+async def groundwater_nearest(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=50),
+    max_km: Optional[float] = Query(None, gt=0)
+):
+    """Find the groundwater monitoring stations nearest to a point, with their latest readings"""
+    stations = registry.current().stations.nearest(lat, lon, k, max_km)
+    return {"latitude": lat, "longitude": lon, "stations": stations}
+
+@app.get("/groundwater/stations/{station_id}/series")
+async def groundwater_station_series(station_id: str):
+    """Get one monitoring station's readings with rolling, monthly, seasonal and monsoon aggregates"""
+    result = registry.current().series.station(station_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No groundwater station {station_id}")
+    return result
+
+@app.get("/groundwater/districts/{state}/{district}/series")
+async def groundwater_district_series(state: str, district: str):
+    """Get the readings of a district's monitoring stations aggregated as one series"""
+    result = registry.current().series.district(state, district)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No groundwater stations in {district}, {state}")
+    return result
+
+@app.get("/resolve-coordinates")
+async def resolve_coordinates(lat: float = Query(..., ge=-90, le=90), lon: float = Query(..., ge=-180, le=180)):
+    """Find the district and state at a point, spelt as the other lookups expect"""
+    located = registry.current().geocoder.resolve(lat, lon)
+    if located is None:
+        raise HTTPException(status_code=404, detail=f"No groundwater monitoring station near {lat}, {lon}")
+    return {"latitude": lat, "longitude": lon, **located}
+
+@app.get("/resolve-location")
+async def resolve_location(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    kind: Optional[str] = Query(None, pattern="^(district|state)$"),
+    state: Optional[str] = Query(None, max_length=100)
+):
+    """Autocomplete district and state names across all datasets"""
+    return {"query": q, "candidates": registry.current().resolver.search(q, limit, kind, state)}
 
 # Aquifer Prediction Routes (from aquifier_main.py)
 @app.get("/aquifer")
@@ -237,90 +445,109 @@ def aquifer_api_status():
     return {
         "message": "Aquifer Type Recommendation API",
         "status": "running",
-        "model_loaded": model_loaded
+        "model_loaded": current_predictor() is not None,
+        "microbatch": aquifer_batcher.stats() if aquifer_batcher else None
     }
 
 @app.post("/aquifer/predict", response_model=AquiferPredictionResponse)
-def predict_aquifer(data: AquiferPredictionRequest):
+async def predict_aquifer(data: AquiferPredictionRequest):
     """Predict aquifer type based on input parameters"""
-    if not model_loaded or aquifer_model is None:
+    predictor = current_predictor()
+    if predictor is None:
         raise HTTPException(status_code=503, detail="Aquifer model not loaded. Please check the server logs.")
 
     try:
-        # Encode state and district
-        try:
-            state_encoded = int(label_encoder.transform([data.state])[0])
-        except:
-            state_encoded = 0
-
-        try:
-            district_encoded = int(label_encoder.transform([data.district])[0])
-        except:
-            district_encoded = 0
-
-        # Prepare input data
-        input_data = {
-            'Pre_Monsoon_mid': range_to_midpoint(data.pre_monsoon),
-            'Post_Monsoon_mid': range_to_midpoint(data.post_monsoon),
-            'Fluctuation': data.fluctuation,
-            'Elevation (m)': data.elevation,
-            'ACTUAL (mm)': data.actual_rainfall,
-            'NORMAL (mm)': data.normal_rainfall,
-            '% DEP.': data.percent_dep,
-            'State_encoded': state_encoded,
-            'District_encoded': district_encoded
-        }
-
-        # Create DataFrame and handle missing values
-        input_df = pd.DataFrame([input_data])
-        input_df = input_df.fillna(input_df.mean())
-
-        # Scale features
-        input_scaled = scaler.transform(input_df)
-
-        # Make prediction
-        prediction_encoded = aquifer_model.predict(input_scaled)
-        prediction = target_encoder.inverse_transform(prediction_encoded)[0]
-
-        # Get probabilities
-        probabilities = aquifer_model.predict_proba(input_scaled)[0]
-        probability_dict = {
-            target: float(prob)
-            for target, prob in zip(target_encoder.classes_, probabilities)
-        }
+        if aquifer_batcher is not None:
+            result = await aquifer_batcher.submit(data)
+        else:
+            result = (await run_in_threadpool(predictor.predict, [data]))[0]
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if result["error"]:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return {
+        "prediction": result["prediction"],
+        "probabilities": result["probabilities"]
+    }
 
-        return {
-            "prediction": prediction,
-            "probabilities": probability_dict
-        }
+@app.post("/aquifer/predict/batch", response_model=List[AquiferBatchPredictionItem])
+def predict_aquifer_batch(data: List[AquiferPredictionRequest]):
+    """Predict aquifer types for many inputs with a single model call"""
+    predictor = current_predictor()
+    if predictor is None:
+        raise HTTPException(status_code=503, detail="Aquifer model not loaded. Please check the server logs.")
+    if len(data) > MAX_AQUIFER_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(data)} items, limit is {MAX_AQUIFER_BATCH}")
 
+    try:
+        return predictor.predict(data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/aquifer/features")
 def get_aquifer_features():
     """Get aquifer model features"""
-    if not model_loaded:
+    predictor = current_predictor()
+    if predictor is None:
         raise HTTPException(status_code=503, detail="Aquifer model not loaded")
-    return {"features": features}
+    return {"features": predictor.features}
 
 @app.get("/aquifer/classes")
 def get_aquifer_classes():
     """Get possible aquifer classes"""
-    if not model_loaded:
+    predictor = current_predictor()
+    if predictor is None:
         raise HTTPException(status_code=503, detail="Aquifer model not loaded")
-    return {"classes": list(target_encoder.classes_)}
+    return {"classes": predictor.classes}
+
+@app.get("/maps/stats")
+async def map_stats():
+    """Get map render cache and template store statistics"""
+    return {
+        "cache": mapCache.stats(),
+        "templates": templateStore.stats()
+    }
+
+# Admin: data registry state and on-demand reload
+# ADMIN_TOKEN, when set, must be sent in the X-Admin-Token header
+def check_admin_token(token):
+    expected = os.environ.get("ADMIN_TOKEN")
+    if expected and token != expected:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/data")
+def admin_data(x_admin_token: Optional[str] = Header(None)):
+    """Get the served dataset version and reload metrics"""
+    check_admin_token(x_admin_token)
+    return registry.stats()
+
+@app.post("/admin/data/reload")
+def admin_data_reload(force: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """Reload databases/ and the aquifer model now if they changed (or always, with force)"""
+    check_admin_token(x_admin_token)
+    reloaded = registry.reload(force=force)
+    return {"reloaded": reloaded, **registry.stats()}
 
 # Health check endpoint
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint"""
+    snapshot = registry.current()
     return {
         "status": "healthy",
         "services": {
             "rainwater_harvesting": "active",
-            "aquifer_prediction": "active" if model_loaded else "inactive"
-        }
+            "aquifer_prediction": "active" if snapshot.predictor is not None else "inactive"
+        },
+        "dataset_version": snapshot.version,
+        "groundwater_trends": groundwaterTrends.stats(),
+        "location_resolver": snapshot.resolver.stats(),
+        "groundwater_stations": snapshot.stations.stats(),
+        "coordinate_resolver": snapshot.geocoder.stats(),
+        "station_series": snapshot.series.stats(),
+        "result_cache": resultCache.stats()
     }
 
 if __name__ == "__main__":
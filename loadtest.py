@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Latency of /health and /aquifer/predict while /process-location requests
+keep the map renderer saturated.
+
+Probes are sent at a fixed rate, first with no other load and then while
+--concurrency clients post /process-location for districts whose maps are
+not cached yet, so every one of those requests renders. Reports p50 / p95 /
+p99 / max probe latency per phase and the render request rate.
+
+By default the app is served in-process (httpx over ASGI, rendering into a
+temporary map cache); --url measures a running server instead.
+
+Run from the project root:
+    python loadtest.py [--seconds S] [--concurrency N] [--url http://localhost:8000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+PROBE_INTERVAL = 0.02
+PREDICT_BODY = {
+    "state": "Karnataka", "district": "Bangalore", "pre_monsoon": "2 to 5", "post_monsoon": "0 to 2",
+    "fluctuation": 1.5, "elevation": 900.0, "actual_rainfall": 850.0, "normal_rainfall": 900.0,
+    "percent_dep": -5.5,
+}
+
+
+def summarize(latencies):
+    if not latencies:
+        return "no requests"
+    ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return f"n={len(ms):5d}  p50 {p50:8.1f}  p95 {p95:8.1f}  p99 {p99:8.1f}  max {ms.max():8.1f} ms"
+
+
+async def probe(client, stop, latencies):
+    probes = [("health", "GET", "/health", None), ("predict", "POST", "/aquifer/predict", PREDICT_BODY)]
+    i = 0
+    while not stop.is_set():
+        name, method, path, body = probes[i % len(probes)]
+        i += 1
+        start = time.perf_counter()
+        response = await client.request(method, path, json=body)
+        latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 500:
+            latencies["errors"].append(name)
+        await asyncio.sleep(PROBE_INTERVAL)
+
+
+async def render(client, stop, locations, done):
+    while not stop.is_set() and locations:
+        district, state = locations.pop()
+        start = time.perf_counter()
+        await client.post("/process-location", json={
+            "district": district, "state": state, "roofArea": 100, "roofType": "Concrete", "dwellers": 4
+        })
+        done.append(time.perf_counter() - start)
+
+
+async def phase(client, seconds, concurrency, locations):
+    stop = asyncio.Event()
+    latencies = {"health": [], "predict": [], "errors": []}
+    renders = []
+    tasks = [asyncio.create_task(probe(client, stop, latencies))]
+    tasks += [asyncio.create_task(render(client, stop, locations, renders)) for _ in range(concurrency)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return latencies, renders
+
+
+def uncachedLocations():
+    # Every known district in a state with a map: each is a new highlight,
+    # so its three state maps have to be rendered
+    from data_registry import registry
+
+    crosswalk = registry.current().crosswalk
+    maps = {name[:-4] for name in os.listdir("maps")}
+    locations = [(row.district, row.state) for row in crosswalk.rows.values() if row.stateCode in maps]
+    return sorted(locations)
+
+
+async def run(args):
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120)
+    else:
+        import integrated_app
+
+        integrated_app.mapCache.cacheDir = tempfile.mkdtemp(prefix="loadtest-maps-")
+        transport = httpx.ASGITransport(app=integrated_app.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120)
+    locations = uncachedLocations()
+
+    async with client:
+        await client.post("/aquifer/predict", json=PREDICT_BODY)
+        print(f"{args.seconds}s per phase, probes every {PROBE_INTERVAL * 1000:.0f} ms, "
+              f"{args.concurrency} render clients\n")
+        for title, concurrency in (("idle", 0), ("rendering", args.concurrency)):
+            latencies, renders = await phase(client, args.seconds, concurrency, locations)
+            print(title)
+            print(f"  /health          {summarize(latencies['health'])}")
+            print(f"  /aquifer/predict {summarize(latencies['predict'])}")
+            if concurrency:
+                print(f"  /process-location {len(renders) / args.seconds:.1f} req/s, {summarize(renders)}")
+            if latencies["errors"]:
+                print(f"  {len(latencies['errors'])} probe errors")
+            print()
+
+    if not args.url and getattr(integrated_app, "renderPool", None) is not None:
+        integrated_app.renderPool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--url", help="Base URL of a running server (default: serve in-process)")
+    sys.path.insert(0, os.getcwd())
+    asyncio.run(run(parser.parse_args()))
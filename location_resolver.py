@@ -0,0 +1,248 @@
+import re
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from lru_cache import LRUCache
+
+# (table, district column, state column) holding place names; None where a
+# table has no such column
+LOCATION_SOURCES = {
+    'groundwater': [
+        ('groundwater2019', 'District', 'State'),
+        ('groundwater2020', 'District', 'State'),
+        ('groundwater2021', 'District', 'State'),
+        ('groundwater2022', 'District', 'State'),
+        ('groundwater2023', 'District', 'State'),
+        ('groundwater_combined', 'District', 'State'),
+        ('cgwb_groundwater_levels', 'District Name (district_name)', 'State Name (state_name)'),
+    ],
+    'aquifer': [('statewise_aquifier', None, 'State')],
+    'rainfall': [('rainfall_database', 'NAME', None)],
+}
+# Candidates sharing fewer trigrams than this (Jaccard) with the query are
+# dropped unless they start with it
+MIN_SIMILARITY = 0.2
+# resolve() only accepts a fuzzy match at least this similar
+MIN_RESOLVE_SIMILARITY = 0.45
+
+
+def normalizeName(name):
+    """"Jammu & Kashmir" and "JAMMU AND KASHMIR" -> "JAMMU AND KASHMIR"."""
+    name = str(name).upper().replace('&', ' AND ')
+    return ' '.join(re.sub(r'[^A-Z0-9 ]', ' ', name).split())
+
+
+def trigrams(key):
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LocationResolver:
+    """Fuzzy lookup of district and state names across all datasets.
+
+    Every distinct (kind, name, state) is one entry. Queries are matched by
+    character trigrams: posting lists give each entry's shared trigram
+    count in one bincount, ranked by exact match, then prefix match, then
+    Jaccard similarity. Results, and resolved (district, state) pairs, are
+    memoized in bounded LRU caches.
+    """
+
+    KINDS = ('state', 'district')
+
+    def __init__(self, store, cacheSize=4096):
+        self.names, self.keys, self.kinds, self.states, self.sources = [], [], [], [], []
+        # (district key, state entry id) -> entry id, and district key -> entry ids
+        self.entryIds = {}
+        self.districtIds = {}
+        # state key, and the key without spaces ("TAMILNADU") -> entry id
+        self.stateIds = {}
+        self.load(store)
+        self.index()
+        self.searchCache = LRUCache(cacheSize)
+        self.resolveCache = LRUCache(cacheSize)
+
+    def add(self, name, kind, stateId, source):
+        key = normalizeName(name)
+        if not key:
+            return None
+        if kind == 'state':
+            entryId = self.stateIds.get(key)
+        else:
+            entryId = self.entryIds.get((key, stateId))
+            namesakes = self.districtIds.get(key, [])
+            if entryId is None and (stateId == -1 or source == 'rainfall') and len(namesakes) == 1:
+                # A district listed without a (reliable) state joins its only namesake
+                entryId = namesakes[0]
+        if entryId is None:
+            entryId = len(self.names)
+            self.names.append(str(name).strip())
+            self.keys.append(key)
+            self.kinds.append(kind)
+            self.states.append(stateId)
+            self.sources.append(set())
+            if kind == 'state':
+                self.stateIds[key] = entryId
+                self.stateIds.setdefault(key.replace(' ', ''), entryId)
+            else:
+                self.entryIds[(key, stateId)] = entryId
+                self.districtIds.setdefault(key, []).append(entryId)
+        self.sources[entryId].add(source)
+        return entryId
+
+    def load(self, store):
+        tables = set(store.tables())
+        for source in ('groundwater', 'aquifer'):
+            for table, districtColumn, stateColumn in LOCATION_SOURCES[source]:
+                if table not in tables:
+                    continue
+                states = store.column(table, stateColumn).tolist()
+                if districtColumn is None:
+                    # "Jammu & Kashmir, Ladakh" is one row for two states
+                    for state in states:
+                        for part in str(state).split(','):
+                            self.add(part, 'state', -1, source)
+                    continue
+                districts = store.column(table, districtColumn).tolist()
+                for district, state in dict.fromkeys(zip(districts, states)):
+                    stateId = self.add(state, 'state', -1, source)
+                    self.add(district, 'district', -1 if stateId is None else stateId, source)
+
+        # The rainfall table lists each state's districts after a row for the
+        # state itself ("TAMILNADU", "JAMMU & KASHMIR(UT)"). That only places
+        # districts the other datasets do not already place unambiguously.
+        for table, nameColumn, _ in LOCATION_SOURCES['rainfall']:
+            if table not in tables:
+                continue
+            stateId = -1
+            for name in store.column(table, nameColumn).tolist():
+                key = normalizeName(name)
+                if key.endswith(' UT'):
+                    key = key[:-3]
+                heading = self.stateIds.get(key, self.stateIds.get(key.replace(' ', '')))
+                if heading is not None:
+                    stateId = heading
+                    self.sources[heading].add('rainfall')
+                else:
+                    self.add(name, 'district', stateId, 'rainfall')
+
+    def index(self):
+        postings = {}
+        for entryId, key in enumerate(self.keys):
+            for gram in trigrams(key):
+                postings.setdefault(gram, []).append(entryId)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.gramCounts = np.array([len(trigrams(key)) for key in self.keys], dtype=np.int32)
+        self.kindCodes = np.array([self.KINDS.index(kind) for kind in self.kinds], dtype=np.int8)
+        self.stateCodes = np.array(self.states, dtype=np.int32)
+        self.lengths = np.array([len(key) for key in self.keys], dtype=np.int32)
+        self.sortedOrder = np.array(sorted(range(len(self.keys)), key=self.keys.__getitem__), dtype=np.int32)
+        self.sortedKeys = [self.keys[i] for i in self.sortedOrder]
+
+    def __len__(self):
+        return len(self.names)
+
+    def findState(self, state):
+        """Entry id of the state best matching state, or -1."""
+        key = normalizeName(state)
+        stateId = self.stateIds.get(key)
+        if stateId is not None:
+            return stateId
+        ranked, similarity = self.rank(key, kind='state')
+        if len(ranked) and similarity[ranked[0]] >= MIN_RESOLVE_SIMILARITY:
+            return int(ranked[0])
+        return -1
+
+    def rank(self, key, kind=None, stateId=None):
+        """(entry ids best first, per-entry similarity) for a normalized query."""
+        grams = trigrams(key)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.keys)) if lists \
+            else np.zeros(len(self.keys), dtype=np.int64)
+        similarity = shared / (len(grams) + self.gramCounts - shared)
+
+        isPrefix = np.zeros(len(self.keys), dtype=bool)
+        start = bisect_left(self.sortedKeys, key)
+        end = bisect_right(self.sortedKeys, key + '\uffff', start)
+        isPrefix[self.sortedOrder[start:end]] = True
+
+        keep = isPrefix | (similarity >= MIN_SIMILARITY)
+        if kind is not None:
+            keep &= self.kindCodes == self.KINDS.index(kind)
+        if stateId is not None:
+            keep &= self.stateCodes == stateId
+        ids = np.flatnonzero(keep)
+        exact = self.lengths[ids] == len(key)
+        order = np.lexsort((
+            ids, self.lengths[ids], self.kindCodes[ids], -similarity[ids], ~isPrefix[ids], ~(exact & isPrefix[ids])
+        ))
+        return ids[order], similarity
+
+    def candidate(self, entryId, similarity):
+        stateId = self.states[entryId]
+        return {
+            'name': self.names[entryId],
+            'kind': self.kinds[entryId],
+            'state': self.names[stateId] if stateId != -1 else None,
+            'score': round(float(similarity), 3),
+            'sources': sorted(self.sources[entryId]),
+        }
+
+    def search(self, query, limit=10, kind=None, state=None):
+        """Up to limit candidates for query, best first. kind limits them to
+        'district' or 'state'; state to the districts of the best matching
+        state (no match there means no candidates)."""
+        key = normalizeName(query)
+        cacheKey = (key, kind, normalizeName(state) if state else None, limit)
+        results = self.searchCache.get(cacheKey)
+        if results is not None:
+            return results
+        results = []
+        if key:
+            stateId = None
+            if state:
+                stateId = self.findState(state)
+                kind = 'district'
+            if stateId != -1:
+                ranked, similarity = self.rank(key, kind, stateId)
+                results = [self.candidate(entryId, similarity[entryId]) for entryId in ranked[:limit].tolist()]
+        self.searchCache.put(cacheKey, results)
+        return results
+
+    def resolve(self, district, state):
+        """(district name, state name) as the datasets spell them, either None
+        when nothing matches closely enough. The district is looked for within
+        the resolved state first and anywhere otherwise."""
+        cacheKey = (normalizeName(district or ''), normalizeName(state or ''))
+        resolved = self.resolveCache.get(cacheKey)
+        if resolved is not None:
+            return resolved
+        districtKey, stateKey = cacheKey
+        stateId = self.findState(stateKey) if stateKey else -1
+        districtId = -1
+        if districtKey:
+            for scope in ((stateId, None) if stateId != -1 else (None,)):
+                ranked, similarity = self.rank(districtKey, 'district', scope)
+                if len(ranked) and (similarity[ranked[0]] >= MIN_RESOLVE_SIMILARITY or
+                                    self.keys[ranked[0]] == districtKey):
+                    districtId = int(ranked[0])
+                    break
+        if stateId == -1 and districtId != -1:
+            stateId = self.states[districtId]
+        resolved = (
+            self.names[districtId] if districtId != -1 else None,
+            self.names[stateId] if stateId != -1 else None,
+        )
+        self.resolveCache.put(cacheKey, resolved)
+        return resolved
+
+    def stats(self):
+        return {
+            'entries': len(self.names),
+            'districts': self.kinds.count('district'),
+            'states': self.kinds.count('state'),
+            'trigrams': len(self.postings),
+            'searchCache': self.searchCache.stats(),
+            'resolveCache': self.resolveCache.stats(),
+        }
+
@@ -0,0 +1,355 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import anyio
+
+from datastore import STORE_PATH, DataStore, getStore
+from lru_cache import LRUCache
+from npz_arrays import MappedArrays
+from SVGcoloring import rainfallColoring, preMonsoonColoring, postMonsoonColoring, aquiferColoring
+
+# Data store tables a rendered map depends on, besides the map itself
+DATASET_TABLES = ["rainfall_database", "groundwater2023", "statewise_aquifier"]
+
+# layer -> (render function, whether it is a per-state map)
+LAYERS = {
+    "rainfall": (rainfallColoring, True),
+    "premonsoon": (preMonsoonColoring, True),
+    "postmonsoon": (postMonsoonColoring, True),
+    "aquifer": (aquiferColoring, False),
+}
+
+
+def renderMap(stateCode, layer, highlight=None, store=None):
+    renderFn, perState = LAYERS[layer]
+    if perState:
+        svg = renderFn(stateCode, None, highlight=highlight, store=store)
+    else:
+        svg = renderFn(None, highlight=highlight, store=store)
+    return svg.encode("utf-8")
+
+
+class StaleStore(Exception):
+    pass
+
+
+# The store a RenderPool process renders from, mapped on its first render
+workerStore = None
+
+
+def renderInWorker(stateCode, layer, highlight, sourceHash, storePath):
+    """renderMap in a RenderPool process. Raises StaleStore when the store
+    file is missing, unreadable or no longer holds the data (sourceHash) the
+    caller renders for."""
+    global workerStore
+    if workerStore is None or workerStore.sourceHash != sourceHash:
+        try:
+            workerStore = DataStore.load(storePath)
+        except (OSError, ValueError, KeyError) as e:
+            raise StaleStore(f"cannot load '{storePath}': {e}")
+        if workerStore.sourceHash != sourceHash:
+            raise StaleStore(f"'{storePath}' is {workerStore.sourceHash[:12]}, not {sourceHash[:12]}")
+    return renderMap(stateCode, layer, highlight, workerStore)
+
+
+class RenderPool:
+    """Map renders in a pool of worker processes, so template parsing and
+    recoloring run on other cores instead of in the server's threads.
+
+    Workers map the same compiled store file and parse their own templates;
+    they start on the first render, from a forkserver where there is one.
+    A render whose data the store file does not hold (a store built in
+    memory, or one hitting a broken pool) runs in a thread of this process
+    instead.
+
+    Forkserver and spawn workers re-import the launching script's __main__
+    module, so a script that creates the pool (e.g. imports integrated_app)
+    at module level must keep the code that renders under
+    if __name__ == "__main__"; otherwise the script runs again in the worker
+    and the pool fails to start. A pool that fails before it has rendered
+    anything is not started again: renders stay in this process, as with
+    RENDER_WORKERS=0 in integrated_app, which never creates the pool.
+    """
+
+    def __init__(self, workers, storePath=STORE_PATH):
+        self.workers = workers
+        self.storePath = storePath
+        self.executor = None
+        self.lock = threading.Lock()
+        self.renders = 0
+        self.workerRenders = 0
+        self.fallbacks = 0
+        self.disabled = False
+        self.renderSeconds = 0.0
+
+    def getExecutor(self):
+        with self.lock:
+            if self.executor is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                if context.get_start_method() == "forkserver":
+                    context.set_forkserver_preload(["map_cache"])
+                self.executor = ProcessPoolExecutor(self.workers, mp_context=context)
+            return self.executor
+
+    async def render(self, stateCode, layer, highlight=None, store=None):
+        store = store or getStore()
+        start = time.perf_counter()
+        data = None
+        # A store built in memory has no file for the workers to map
+        if isinstance(store.arrays, MappedArrays) and not self.disabled:
+            try:
+                data = await asyncio.get_running_loop().run_in_executor(
+                    self.getExecutor(), renderInWorker, stateCode, layer, highlight, store.sourceHash, self.storePath
+                )
+                self.workerRenders += 1
+            except (StaleStore, BrokenProcessPool, RuntimeError) as e:
+                # RuntimeError: the workers could not be started here
+                print(f"Warning: rendering {layer} map of {stateCode} in-process, render pool failed: "
+                      f"{type(e).__name__}: {' '.join(str(e).split())}")
+                if not isinstance(e, StaleStore):
+                    self.discard()
+        if data is None:
+            self.fallbacks += 1
+            data = await anyio.to_thread.run_sync(renderMap, stateCode, layer, highlight, store)
+        self.renders += 1
+        self.renderSeconds += time.perf_counter() - start
+        return data
+
+    def discard(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+            if not self.workerRenders and not self.disabled:
+                self.disabled = True
+                print("Warning: render pool failed before its first render; rendering maps in-process from now on")
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "started": self.executor is not None,
+            "disabled": self.disabled,
+            "renders": self.renders,
+            "fallbacks": self.fallbacks,
+            "avgRenderMs": round(self.renderSeconds * 1000 / self.renders, 3) if self.renders else None,
+        }
+
+
+def datasetHash(tables=None, mapsDir="maps", store=None):
+    """Hash of every input that changes how a map renders."""
+    store = store or getStore()
+    digest = hashlib.sha256()
+    for table in tables or DATASET_TABLES:
+        digest.update(f"{table}:{store.tableHashes[table]}".encode("utf-8"))
+    for name in sorted(n for n in os.listdir(mapsDir) if n.endswith(".svg")):
+        digest.update(name.encode("utf-8"))
+        with open(os.path.join(mapsDir, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class MapCache:
+    """Rendered SVG maps keyed by (state code, layer, dataset hash, highlight).
+
+    Renders happen once per key, in memory: the bytes are kept in a bounded
+    LRU and written under cacheDir with a name derived from the key, so the
+    URL handed to clients never changes content and survives restarts. The
+    directory is capped at maxDiskBytes, dropping least recently used files.
+    setDataset() moves the cache to new data; version and store are swapped
+    together so a render never files one store's colors under another's hash.
+    getAsync() is the event loop's way in: renders go to renderPool.
+    """
+
+    def __init__(self, cacheDir=os.path.join("static", "maps"), urlPrefix="/static/maps",
+                 maxEntries=256, maxDiskBytes=512 * 1024 * 1024, version=None, renderPool=None):
+        self.cacheDir = cacheDir
+        self.urlPrefix = urlPrefix
+        self.maxEntries = maxEntries
+        self.maxDiskBytes = maxDiskBytes
+        self.dataset = (version or datasetHash(), None)
+        self.entries = LRUCache(maxEntries)
+        self.lock = threading.Lock()
+        self.keyLocks = {}
+        self.renderPool = renderPool
+        # file name -> task loading it, for getAsync
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cacheDir, exist_ok=True)
+        self.diskBytes = self.cleanup()
+
+    @property
+    def version(self):
+        return self.dataset[0]
+
+    def setDataset(self, version, store=None):
+        self.dataset = (version, store)
+
+    def fileName(self, stateCode, layer, highlight=None, version=None):
+        key = f"{stateCode}|{layer}|{version or self.version}|{highlight or ''}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:20]
+        return f"{layer}-{stateCode}-{digest}.svg"
+
+    def url(self, stateCode, layer, highlight=None):
+        name = self.getName(stateCode, layer, highlight)
+        return f"{self.urlPrefix}/{name}"
+
+    async def urlAsync(self, stateCode, layer, highlight=None):
+        name, _ = await self.getAsync(stateCode, layer, highlight)
+        return f"{self.urlPrefix}/{name}"
+
+    def getBytes(self, stateCode, layer, highlight=None):
+        return self.get(stateCode, layer, highlight)[1]
+
+    def getName(self, stateCode, layer, highlight=None):
+        return self.get(stateCode, layer, highlight)[0]
+
+    def get(self, stateCode, layer, highlight=None):
+        """(file name, bytes) of a map, rendering it if needed."""
+        if layer not in LAYERS:
+            raise ValueError(f"Unknown map layer: {layer}")
+        version, store = self.dataset
+        name = self.fileName(stateCode, layer, highlight, version)
+
+        with self.lock:
+            data = self.entries.get(name)
+            if data is not None:
+                self.hits += 1
+                return name, data
+            keyLock = self.keyLocks.setdefault(name, threading.Lock())
+
+        # Only one thread renders a given key; the rest wait and reuse it
+        with keyLock:
+            with self.lock:
+                data = self.entries.get(name)
+                if data is not None:
+                    self.hits += 1
+                    return name, data
+                self.misses += 1
+
+            path = os.path.join(self.cacheDir, name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)
+            else:
+                data = self.render(stateCode, layer, highlight, store)
+                self.writeFile(path, data)
+
+            with self.lock:
+                self.remember(name, data)
+                self.keyLocks.pop(name, None)
+        return name, data
+
+    async def getAsync(self, stateCode, layer, highlight=None):
+        """get() without blocking the event loop: cached files are read
+        through anyio and renders run in renderPool (a worker thread when
+        there is none). Concurrent requests for a key share one load."""
+        if layer not in LAYERS:
+            raise ValueError(f"Unknown map layer: {layer}")
+        version, store = self.dataset
+        name = self.fileName(stateCode, layer, highlight, version)
+
+        with self.lock:
+            data = self.entries.get(name)
+            if data is not None:
+                self.hits += 1
+                return name, data
+            task = self.pending.get(name)
+            if task is None:
+                self.misses += 1
+                task = asyncio.ensure_future(self.load(name, stateCode, layer, highlight, store))
+                self.pending[name] = task
+        # A cancelled request leaves the load running for the others
+        return name, await asyncio.shield(task)
+
+    async def load(self, name, stateCode, layer, highlight, store):
+        try:
+            path = anyio.Path(self.cacheDir, name)
+            if await path.exists():
+                data = await path.read_bytes()
+                await path.touch()
+            else:
+                if self.renderPool is not None:
+                    data = await self.renderPool.render(stateCode, layer, highlight, store)
+                else:
+                    data = await anyio.to_thread.run_sync(self.render, stateCode, layer, highlight, store)
+                await anyio.to_thread.run_sync(self.writeFile, str(path), data)
+            with self.lock:
+                self.remember(name, data)
+            return data
+        finally:
+            with self.lock:
+                self.pending.pop(name, None)
+
+    def remember(self, name, data):
+        self.entries.put(name, data)
+
+    def render(self, stateCode, layer, highlight=None, store=None):
+        return renderMap(stateCode, layer, highlight, store)
+
+    def writeFile(self, path, data):
+        fd, tmpPath = tempfile.mkstemp(dir=self.cacheDir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmpPath, path)
+        with self.lock:
+            self.diskBytes += len(data)
+            overLimit = self.diskBytes > self.maxDiskBytes
+        if overLimit:
+            with self.lock:
+                self.diskBytes = self.cleanup()
+
+    def cleanup(self):
+        """Remove stale temp files and trim the directory to maxDiskBytes."""
+        files = []
+        for entry in os.scandir(self.cacheDir):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".tmp"):
+                # Left behind by a crashed writer; live ones are only seconds old
+                try:
+                    if entry.stat().st_mtime < time.time() - 600:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.maxDiskBytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+    def stats(self):
+        with self.lock:
+            return {
+                "version": self.version,
+                "entries": len(self.entries),
+                "bytes": sum(len(v) for v in self.entries.values()),
+                "diskBytes": self.diskBytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "renderPool": self.renderPool.stats() if self.renderPool is not None else None,
+            }
@@ -0,0 +1,143 @@
+import os
+import re
+import sys
+import threading
+import time
+
+from bs4 import BeautifulSoup
+from bs4.formatter import XMLFormatter
+
+MAPS_DIR = "maps"
+
+# Attributes a render may change on a <path>, in the order they are first set
+SLOT_ATTRIBUTES = ("fill", "stroke", "stroke-width")
+SLOT_PATTERN = re.compile(r' (fill|stroke|stroke-width)="@@slot(\d+)@@"')
+FORMATTER = XMLFormatter.REGISTRY["minimal"]
+
+
+def loadMap(mapName, mapsDir=MAPS_DIR):
+    with open(os.path.join(mapsDir, f"{mapName}.svg"), "r", encoding="utf-8") as f:
+        soup = BeautifulSoup(f, "lxml-xml")
+    if not soup.find("svg").has_attr("xmlns"):
+        soup.find("svg")["xmlns"] = "http://www.w3.org/2000/svg"
+    return soup
+
+
+def attributeText(name, value):
+    return f" {name}={FORMATTER.quoted_attribute_value(FORMATTER.attribute_value(value))}"
+
+
+class MapTemplate:
+    """One map parsed once and kept as its serialized text, split around the
+    fill/stroke/stroke-width attribute of every <path>.
+
+    render() fills those slots and joins the pieces, giving the same text
+    BeautifulSoup would write after setting the attributes on the tree.
+    """
+
+    def __init__(self, mapName, mapsDir=MAPS_DIR):
+        start = time.perf_counter()
+        soup = loadMap(mapName, mapsDir)
+        paths = soup.find_all("path")
+
+        self.name = mapName
+        self.pathIds = []
+        self.upperIndex = {}
+        self.exactIndex = {}
+        defaults = {}
+        for pos, path in enumerate(paths):
+            pathId = path.get("id", "")
+            self.pathIds.append(pathId)
+            self.upperIndex.setdefault(pathId.strip().upper(), pos)
+            self.exactIndex.setdefault(pathId, pos)
+            for attr in SLOT_ATTRIBUTES:
+                original = path.get(attr)
+                defaults[(pos, attr)] = "" if original is None else attributeText(attr, original)
+                # Existing attributes keep their place; new ones are appended
+                # in SLOT_ATTRIBUTES order, the same as a render would add them
+                path[attr] = f"@@slot{pos}@@"
+
+        pieces = SLOT_PATTERN.split(str(soup))
+        # pieces = [text, attr, pos, text, attr, pos, ..., text]
+        self.parts = [pieces[0]]
+        self.slots = {}
+        for i in range(1, len(pieces), 3):
+            attr, pos = pieces[i], int(pieces[i + 1])
+            self.slots[(pos, attr)] = len(self.parts)
+            self.parts.append(defaults[(pos, attr)])
+            self.parts.append(pieces[i + 2])
+
+        self.parseSeconds = time.perf_counter() - start
+        self.renders = 0
+        self.renderSeconds = 0.0
+
+    def render(self, colors=None, normalize=True, highlight=None):
+        """colors maps region name -> fill color, matched against path ids
+        upper-cased (or exactly, with normalize=False); highlight is the exact
+        id of a path to outline."""
+        start = time.perf_counter()
+        parts = list(self.parts)
+        index = self.upperIndex if normalize else self.exactIndex
+        for name, color in (colors or {}).items():
+            pos = index.get(name)
+            if pos is not None:
+                self.setSlot(parts, pos, "fill", color)
+                self.setSlot(parts, pos, "stroke", "#000000")
+                self.setSlot(parts, pos, "stroke-width", "0.75")
+        if highlight:
+            pos = self.exactIndex.get(highlight)
+            if pos is not None:
+                self.setSlot(parts, pos, "stroke", "#FF00FF")
+                self.setSlot(parts, pos, "stroke-width", "2.6")
+        svg = "".join(parts)
+        self.renders += 1
+        self.renderSeconds += time.perf_counter() - start
+        return svg
+
+    def setSlot(self, parts, pos, attr, value):
+        parts[self.slots[(pos, attr)]] = attributeText(attr, value)
+
+    def stats(self):
+        return {
+            "paths": len(self.pathIds),
+            "bytes": sum(sys.getsizeof(part) for part in self.parts),
+            "parseMs": round(self.parseSeconds * 1000, 3),
+            "renders": self.renders,
+            "avgRenderMs": round(self.renderSeconds * 1000 / self.renders, 3) if self.renders else None,
+        }
+
+
+class MapTemplateStore:
+    """MapTemplates by map name, parsed on first use (or all at once via preload)."""
+
+    def __init__(self, mapsDir=MAPS_DIR):
+        self.mapsDir = mapsDir
+        self.templates = {}
+        self.lock = threading.Lock()
+
+    def mapNames(self):
+        return sorted(name[:-4] for name in os.listdir(self.mapsDir) if name.endswith(".svg"))
+
+    def get(self, mapName):
+        template = self.templates.get(mapName)
+        if template is None:
+            with self.lock:
+                template = self.templates.get(mapName)
+                if template is None:
+                    template = MapTemplate(mapName, self.mapsDir)
+                    self.templates[mapName] = template
+        return template
+
+    def preload(self):
+        for mapName in self.mapNames():
+            self.get(mapName)
+
+    def stats(self):
+        maps = {name: template.stats() for name, template in sorted(self.templates.items())}
+        return {
+            "maps": maps,
+            "totalBytes": sum(m["bytes"] for m in maps.values()),
+        }
+
+
+templateStore = MapTemplateStore()
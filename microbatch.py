@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+
+class QueueFull(Exception):
+    """Raised by MicroBatcher.submit when the queue is at its limit."""
+
+
+class MicroBatcher:
+    """Gathers concurrent single requests into batches for one model call.
+
+    submit() queues an item and waits for its result. A worker task takes
+    the first queued item, keeps collecting for up to max_wait_ms or until
+    max_batch_size items, then runs predict_batch(items) in a thread and
+    hands each caller its own result. predict_batch must return one result
+    per item, in order. At most max_queue items wait at once; beyond that
+    submit raises QueueFull so callers can shed load.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=64, max_wait_ms=2.0, max_queue=1024):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.queue = None
+        self.worker = None
+        self.loop = None
+
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.failed_batches = 0
+        self.max_batch_seen = 0
+        self.batch_sizes = {"1": 0, "2-4": 0, "5-16": 0, "17-64": 0, "65+": 0}
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+        self.total_predict = 0.0
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self.worker is None or self.worker.done() or self.loop is not loop:
+            self.loop = loop
+            self.queue = asyncio.Queue(maxsize=self.max_queue)
+            self.worker = loop.create_task(self._run())
+
+    async def submit(self, item):
+        self._ensure_worker()
+        future = self.loop.create_future()
+        try:
+            self.queue.put_nowait((item, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFull(f"Prediction queue is full ({self.max_queue} waiting)")
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = self.loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - self.loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._process(batch)
+
+    async def _process(self, batch):
+        # Callers that gave up (e.g. client disconnected) are dropped here
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            waited = started - enqueued
+            self.total_wait += waited
+            self.max_wait_seen = max(self.max_wait_seen, waited)
+        self._record_size(len(batch))
+
+        try:
+            results = await self.loop.run_in_executor(None, self.predict_batch, [item for item, _, _ in batch])
+        except Exception as e:
+            self.failed_batches += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.total_predict += time.perf_counter() - started
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _record_size(self, size):
+        self.batches += 1
+        self.items += size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        if size == 1:
+            bucket = "1"
+        elif size <= 4:
+            bucket = "2-4"
+        elif size <= 16:
+            bucket = "5-16"
+        elif size <= 64:
+            bucket = "17-64"
+        else:
+            bucket = "65+"
+        self.batch_sizes[bucket] += 1
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_queue": self.max_queue,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "batches": self.batches,
+            "items": self.items,
+            "rejected": self.rejected,
+            "failed_batches": self.failed_batches,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0,
+            "max_batch_seen": self.max_batch_seen,
+            "batch_sizes": dict(self.batch_sizes),
+            "mean_queue_wait_ms": round(self.total_wait * 1000 / self.items, 3) if self.items else 0,
+            "max_queue_wait_ms": round(self.max_wait_seen * 1000, 3),
+            "mean_predict_ms": round(self.total_predict * 1000 / self.batches, 3) if self.batches else 0,
+        }
@@ -0,0 +1,74 @@
+import ast
+import zipfile
+
+import numpy as np
+
+
+def npy_header(data, pos):
+    """(shape, fortran_order, dtype, data offset) of the .npy stored at pos
+    in data. np.lib.format's readers re-tokenize every header, which
+    dominates opening an archive with many small members."""
+    if data[pos:pos + 6].tobytes() != b"\x93NUMPY":
+        raise ValueError("Not an .npy member")
+    major = int(data[pos + 6])
+    length_size = 2 if major == 1 else 4
+    header_start = pos + 8 + length_size
+    header_length = int.from_bytes(data[pos + 8:header_start].tobytes(), "little")
+    encoding = "utf8" if major >= 3 else "latin1"
+    header = ast.literal_eval(data[header_start:header_start + header_length].tobytes().decode(encoding))
+    dtype = np.lib.format.descr_to_dtype(header["descr"])
+    return header["shape"], header["fortran_order"], dtype, header_start + header_length
+
+
+def member_array(buffer, header_offset):
+    """The array in the stored (uncompressed) zip member whose local file
+    header starts at header_offset, as a read-only view of buffer."""
+    # Member data starts after its local file header (30 bytes + name + extra)
+    name_length = int.from_bytes(buffer[header_offset + 26:header_offset + 28].tobytes(), "little")
+    extra_length = int.from_bytes(buffer[header_offset + 28:header_offset + 30].tobytes(), "little")
+    shape, fortran_order, dtype, offset = npy_header(buffer, header_offset + 30 + name_length + extra_length)
+    return np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset, order="F" if fortran_order else "C")
+
+
+def load_arrays(path, mmap=True):
+    """Arrays of an uncompressed .npz, as read-only views over a memory map of
+    the file when mmap is set (np.load cannot map archive members itself)."""
+    if not mmap:
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    arrays = {}
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            arrays[name] = member_array(buffer, info.header_offset)
+    return arrays
+
+
+class MappedArrays:
+    """The arrays of an uncompressed .npz, memory-mapped, each one located
+    on first access so opening the store only reads the zip directory."""
+
+    def __init__(self, path):
+        self.buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        self.offsets = {}
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.compress_type != zipfile.ZIP_STORED:
+                    raise ValueError(f"'{path}' has compressed members; recompile it")
+                self.offsets[info.filename[:-4]] = info.header_offset
+        self.arrays = {}
+
+    def __contains__(self, name):
+        return name in self.offsets
+
+    def __getitem__(self, name):
+        array = self.arrays.get(name)
+        if array is None:
+            array = self.arrays[name] = member_array(self.buffer, self.offsets[name])
+        return array
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Pre-fork launcher: loads the app once, then forks uvicorn workers that
+share what it loaded.
+
+The data store (databases/datastore.npz) and the model artifact are
+memory-mapped, so every process reads the same page-cache pages whichever
+way it was started. What is built from them in Python (lookup tables,
+location resolver, crosswalk, map templates, the trends payload) is built
+in the parent before forking and shared copy-on-write; gc.freeze() keeps
+the collector in the workers from writing to, and so copying, those pages.
+
+Run from the project root:
+    python prefork.py serve [--workers N] [--host HOST] [--port PORT] [--app MODULE:APP]
+    python prefork.py report [--workers N] [--app MODULE:APP]
+
+report starts the workers both ways - each loading its own copy, as
+uvicorn --workers does, and forked from a preloaded parent - sends a few
+requests to each and prints per-process RSS and PSS (the process's share
+of the pages it maps) from /proc/<pid>/smaps_rollup. Linux only.
+"""
+
+import argparse
+import gc
+import importlib
+import os
+import signal
+import socket
+import sys
+import traceback
+
+DEFAULT_APP = "integrated_app:app"
+# Requests each report worker handles before it is measured
+SAMPLE_REQUESTS = [
+    ("POST", "/process-location",
+     {"district": "Chennai", "state": "Tamil Nadu", "roofArea": 100, "roofType": "Concrete", "dwellers": 4}),
+    ("POST", "/process-location",
+     {"district": "Pune", "state": "Maharashtra", "roofArea": 80, "roofType": "Metal", "dwellers": 3}),
+    ("GET", "/groundwater-trends", None),
+    ("GET", "/groundwater-trends/Karnataka", None),
+    ("GET", "/resolve-location?q=jaip", None),
+    ("GET", "/health", None),
+]
+MEMORY_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def loadApp(appPath):
+    """Import MODULE:APP, running the module's preload() when it has one."""
+    moduleName, _, attr = appPath.partition(":")
+    module = importlib.import_module(moduleName)
+    preload = getattr(module, "preload", None)
+    if preload is not None:
+        preload()
+    return getattr(module, attr or "app")
+
+
+def freeze():
+    # Everything allocated so far moves to a generation the collector never
+    # scans, so collections in the workers leave the shared pages alone
+    gc.collect()
+    gc.freeze()
+
+
+def serve(appPath, host, port, workers):
+    import uvicorn
+
+    app = loadApp(appPath)
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    config = uvicorn.Config(app, host=host, port=port)
+    freeze()
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                uvicorn.Server(config).run(sockets=[sock])
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            os._exit(code)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+    print(f"Serving {appPath} on {host}:{port} with {workers} preforked workers (parent {os.getpid()})")
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}, starting another")
+            spawn()
+    sock.close()
+
+
+def smapsRollup(pid):
+    """MEMORY_FIELDS of a process, in kB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            parts = rest.split()
+            if name in MEMORY_FIELDS and len(parts) == 2:
+                values[name] = int(parts[0])
+    return values
+
+
+def exercise(app):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    for method, path, body in SAMPLE_REQUESTS:
+        client.request(method, path, json=body)
+
+
+def startWorkers(appPath, workers, app=None):
+    """Fork workers that each handle SAMPLE_REQUESTS and then wait to be
+    measured; each loads its own app unless one is given. Returns (pids,
+    release) once all are ready; closing release lets them exit."""
+    readyRead, readyWrite = os.pipe()
+    releaseRead, releaseWrite = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(readyRead)
+            os.close(releaseWrite)
+            code = 0
+            try:
+                exercise(app if app is not None else loadApp(appPath))
+                os.write(readyWrite, b"1")
+                os.read(releaseRead, 1)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            os._exit(code)
+        pids.append(pid)
+    os.close(readyWrite)
+    os.close(releaseRead)
+
+    ready = b""
+    while len(ready) < workers:
+        chunk = os.read(readyRead, workers)
+        if not chunk:
+            break
+        ready += chunk
+    os.close(readyRead)
+    if len(ready) < workers:
+        stopWorkers(pids, releaseWrite)
+        raise SystemExit("A report worker failed to start")
+    return pids, releaseWrite
+
+
+def stopWorkers(pids, release):
+    os.close(release)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+
+def printTable(title, processes):
+    mib = lambda kb: f"{kb / 1024:10.1f}"
+    print(title)
+    print(f"  {'process':<16}{'RSS MiB':>10}{'PSS MiB':>10}{'shared':>10}{'private':>10}")
+    totals = dict.fromkeys(("Rss", "Pss", "shared", "private"), 0)
+    for name, values in processes:
+        shared = values["Shared_Clean"] + values["Shared_Dirty"]
+        private = values["Private_Clean"] + values["Private_Dirty"]
+        for key, value in (("Rss", values["Rss"]), ("Pss", values["Pss"]), ("shared", shared), ("private", private)):
+            totals[key] += value
+        print(f"  {name:<16}{mib(values['Rss'])}{mib(values['Pss'])}{mib(shared)}{mib(private)}")
+    print(f"  {'total':<16}{mib(totals['Rss'])}{mib(totals['Pss'])}{mib(totals['shared'])}{mib(totals['private'])}")
+    print()
+    return totals
+
+
+def report(appPath, workers):
+    print(f"{workers} workers of {appPath}, measured after {len(SAMPLE_REQUESTS)} requests each\n")
+
+    # Before: every worker imports and loads the app itself. This process
+    # has not loaded anything yet, so the forks start as clean as a new
+    # interpreter would
+    pids, release = startWorkers(appPath, workers)
+    before = printTable(
+        "Independent workers (each loads its own copy)",
+        [(f"worker {pid}", smapsRollup(pid)) for pid in pids],
+    )
+    stopWorkers(pids, release)
+
+    # After: load once here, then fork. The parent stays resident while
+    # serving, so it is counted too
+    app = loadApp(appPath)
+    freeze()
+    pids, release = startWorkers(appPath, workers, app)
+    parent = smapsRollup(os.getpid())
+    after = printTable(
+        "Preforked workers (share the parent's copy)",
+        [(f"parent {os.getpid()}", parent)] + [(f"worker {pid}", smapsRollup(pid)) for pid in pids],
+    )
+    stopWorkers(pids, release)
+
+    saved = before["Pss"] - after["Pss"]
+    print(f"Total PSS: {before['Pss'] / 1024:.1f} MiB -> {after['Pss'] / 1024:.1f} MiB "
+          f"({saved / 1024:.1f} MiB, {100 * saved / before['Pss']:.0f}% less)")
+    print(f"Per worker PSS: {before['Pss'] / workers / 1024:.1f} MiB -> "
+          f"{(after['Pss'] - parent['Pss']) / workers / 1024:.1f} MiB (plus {parent['Pss'] / 1024:.1f} MiB parent)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the app from preforked workers sharing one loaded copy")
+    parser.add_argument("command", choices=["serve", "report"])
+    parser.add_argument("--app", default=DEFAULT_APP, help="MODULE:APP to serve")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    sys.path.insert(0, os.getcwd())
+    if args.command == "serve":
+        serve(args.app, args.host, args.port, args.workers)
+    else:
+        report(args.app, args.workers)
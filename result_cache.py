@@ -0,0 +1,94 @@
+import os
+import threading
+
+from lru_cache import LRUCache
+
+
+def envTtl(name, default):
+    # "0" or "none" disables expiry
+    value = os.environ.get(name, default)
+    return None if value.lower() in ("0", "none", "") else float(value)
+
+
+class ResultCache:
+    """Two-level cache for /process-location.
+
+    contexts holds the resolved location data (rainfall, aquifer type and
+    score, groundwater levels) per (district, state), which is all that
+    needs the data tables. responses optionally holds whole responses per
+    normalized request. Entries belong to the data snapshot they were made
+    from: keys carry its version, and both levels are emptied when a newer
+    snapshot shows up. Failed lookups are not cached.
+    """
+
+    def __init__(self, contextSize=2048, contextTtl=3600.0, responseSize=4096, responseTtl=300.0,
+                 cacheResponses=False):
+        self.contexts = LRUCache(contextSize, contextTtl)
+        self.responses = LRUCache(responseSize if cacheResponses else 0, responseTtl)
+        self.cacheResponses = cacheResponses
+        self.lock = threading.Lock()
+        self.dataVersion = None
+        self.dataCreatedAt = 0.0
+        self.invalidations = 0
+
+    def sync(self, snapshot):
+        # A request still holding an older snapshot does not clear anything
+        if snapshot.version != self.dataVersion and snapshot.createdAt >= self.dataCreatedAt:
+            with self.lock:
+                if snapshot.version != self.dataVersion and snapshot.createdAt >= self.dataCreatedAt:
+                    if self.dataVersion is not None:
+                        self.invalidations += 1
+                    self.contexts.clear()
+                    self.responses.clear()
+                    self.dataVersion = snapshot.version
+                    self.dataCreatedAt = snapshot.createdAt
+
+    def locationContext(self, snapshot, districtName, stateName):
+        self.sync(snapshot)
+        # The lookups only ever see the upper-cased names
+        key = (snapshot.version, districtName.upper(), stateName.upper())
+        context = self.contexts.get(key)
+        if context is None:
+            context = snapshot.crosswalk.locationContext(districtName, stateName)
+            self.contexts.put(key, context)
+        return dict(context)
+
+    def responseKey(self, snapshot, data):
+        return (snapshot.version, data.district.upper(), data.state.upper(), float(data.roofArea),
+                data.roofType.upper(), data.dwellers, getattr(data, "lat", None), getattr(data, "lon", None),
+                getattr(data, "useForecast", False))
+
+    def response(self, snapshot, data):
+        """The cached response for a request (with its own spelling of the
+        names echoed back), or None."""
+        if not self.cacheResponses:
+            return None
+        self.sync(snapshot)
+        response = self.responses.get(self.responseKey(snapshot, data))
+        if response is None:
+            return None
+        return {**response, "district": data.district, "state": data.state,
+                "roofType": data.roofType, "roofArea": data.roofArea}
+
+    def storeResponse(self, snapshot, data, response):
+        if self.cacheResponses:
+            self.responses.put(self.responseKey(snapshot, data), response)
+
+    def stats(self):
+        return {
+            "dataVersion": self.dataVersion,
+            "invalidations": self.invalidations,
+            "contexts": self.contexts.stats(),
+            "responses": self.responses.stats() if self.cacheResponses else None,
+        }
+
+
+# LOCATION_CACHE_SIZE / LOCATION_CACHE_TTL bound the per-district cache;
+# RESPONSE_CACHE=1 turns on whole-response caching (RESPONSE_CACHE_SIZE / _TTL)
+resultCache = ResultCache(
+    contextSize=int(os.environ.get("LOCATION_CACHE_SIZE", "2048")),
+    contextTtl=envTtl("LOCATION_CACHE_TTL", "3600"),
+    responseSize=int(os.environ.get("RESPONSE_CACHE_SIZE", "4096")),
+    responseTtl=envTtl("RESPONSE_CACHE_TTL", "300"),
+    cacheResponses=os.environ.get("RESPONSE_CACHE", "0") == "1",
+)
@@ -1,5 +1,24 @@
+import numpy as np
 import pandas as pd
-from file_handling import parseDepth
+from depth_range import DepthRange
+
+RUNOFF_COEFF = {
+    "CONCRETE": 0.85,
+    "GI_SHEET": 0.80,
+    "TILE": 0.75,
+    "THATCHED": 0.60
+}
+# Roof type categories for array inputs; code -1 is an unknown roof (coefficient 0)
+ROOF_TYPES = list(RUNOFF_COEFF)
+ROOF_COEFF_BY_CODE = np.array([RUNOFF_COEFF[t] for t in ROOF_TYPES] + [0.0])
+# Groundwater depth assumed when a season's level is missing
+ASSUMED_DEPTH = DepthRange.parse('10')
+
+
+def groundwaterDepth(level):
+    """Depth feasibility scores a groundwater level (label or DepthRange) with."""
+    level = DepthRange.parse(level)
+    return ASSUMED_DEPTH.high if level.missing else level.high
 
 class RainwaterHarvesting:
     def __init__(self, roofArea, roofType, rainfallMM, dwellers, dailyDemand=7):
@@ -8,12 +27,7 @@ class RainwaterHarvesting:
         self.rainfallMM = rainfallMM
         self.dwellers = dwellers
         self.dailyDemand = dailyDemand
-        self.runoffCoeff = {
-            "CONCRETE": 0.85,
-            "GI_SHEET": 0.80,
-            "TILE": 0.75,
-            "THATCHED": 0.60
-        }
+        self.runoffCoeff = RUNOFF_COEFF
 
     def annualDemand(self):
         return self.dwellers * self.dailyDemand * 365
@@ -33,20 +47,20 @@ class RainwaterHarvesting:
         if self.rainfallMM < 350:
             return -1
 
+        groundwaterPre = DepthRange.parse(groundwaterPre)
+        groundwaterPost = DepthRange.parse(groundwaterPost)
         remark = ""
-        if groundwaterPre == 'N.A.':
+        if groundwaterPre.missing:
             remark = 'Missing PreMonsoon groundwater Data, using assumptions...'
-            groundwaterPre = '10'
-        if groundwaterPost == 'N.A.':
+            groundwaterPre = ASSUMED_DEPTH
+        if groundwaterPost.missing:
             remark = 'Missing PostMonsoon groundwater Data, using assumptions...'
-            groundwaterPost = '10'
+            groundwaterPost = ASSUMED_DEPTH
         if groundwaterPost == '2':
             remark = 'No real need for as groundwater is available at just 2 mbgl'
 
-        groundwaterLevel = max(
-            0, 
-            (parseDepth(groundwaterPre) - parseDepth(groundwaterPost)) / parseDepth(groundwaterPre)
-        )
+        preDepth = groundwaterPre.high
+        groundwaterLevel = max(0, (preDepth - groundwaterPost.high) / preDepth) if preDepth > 0 else 0
 
         aquiferFactor = aquiferScore / 5
 
@@ -58,3 +72,93 @@ class RainwaterHarvesting:
         )
 
         return feasibility
+
+
+# ---------------- Array versions ----------------
+# Same arithmetic as RainwaterHarvesting, over whole arrays of rooftops. Inputs
+# broadcast, so e.g. rainfall of shape (scenarios, 1) against roofs of shape
+# (roofs,) gives every scenario for every roof. Rows the scalar class would
+# reject (e.g. a zero roof area) come out as NaN.
+def roofTypeCodes(roofType):
+    """Roof types as codes into ROOF_TYPES (-1 when unknown). Accepts names,
+    a pandas Categorical or codes that are already integers."""
+    if isinstance(roofType, (pd.Series, pd.Categorical)) and isinstance(roofType.dtype, pd.CategoricalDtype):
+        roofType = pd.Series(roofType)
+        categoryCodes = roofTypeCodes(roofType.cat.categories.to_numpy())
+        codes = roofType.cat.codes.to_numpy()
+        return np.where(codes >= 0, categoryCodes[codes], -1)
+    roofType = np.asarray(roofType)
+    if np.issubdtype(roofType.dtype, np.integer):
+        return np.where((roofType >= 0) & (roofType < len(ROOF_TYPES)), roofType, -1)
+    names = pd.Series(roofType.ravel(), dtype=object).astype(str).str.upper()
+    codes = names.map({t: i for i, t in enumerate(ROOF_TYPES)}).fillna(-1)
+    return codes.to_numpy(dtype=np.int64).reshape(roofType.shape)
+
+
+def runoffCoeffArray(roofType):
+    return ROOF_COEFF_BY_CODE[roofTypeCodes(roofType)]
+
+
+def depthArray(groundwaterLevel):
+    """groundwaterDepth over an array of depth labels or DepthRanges, looking
+    at each distinct label once. Numeric input is taken as depths that are
+    already parsed."""
+    levels = np.asarray(groundwaterLevel)
+    if np.issubdtype(levels.dtype, np.number):
+        return levels.astype(float)
+    codes, uniques = pd.factorize(pd.Series(levels.ravel(), dtype=object), use_na_sentinel=False)
+    depths = np.array([groundwaterDepth(level) for level in uniques], dtype=float)
+    return depths[codes].reshape(levels.shape)
+
+
+class RainwaterHarvestingBatch:
+    """Array counterpart of RainwaterHarvesting: every method returns one
+    value per rooftop, matching the scalar class number for number."""
+
+    def __init__(self, roofArea, roofType, rainfallMM, dwellers, dailyDemand=7):
+        self.roofArea = np.asarray(roofArea, dtype=float)
+        self.roofTypeCode = roofTypeCodes(roofType)
+        self.rainfallMM = np.asarray(rainfallMM, dtype=float)
+        self.dwellers = np.asarray(dwellers)
+        self.dailyDemand = dailyDemand
+
+    @classmethod
+    def fromFrame(cls, frame, dailyDemand=7):
+        """Build from a DataFrame with roofArea, roofType, rainfallMM and dwellers columns."""
+        return cls(
+            frame["roofArea"].to_numpy(),
+            frame["roofType"],
+            frame["rainfallMM"].to_numpy(),
+            frame["dwellers"].to_numpy(),
+            dailyDemand
+        )
+
+    def annualDemand(self):
+        return self.dwellers * self.dailyDemand * 365
+
+    def harvestedWaterFromRoof(self):
+        return self.rainfallMM * self.roofArea * ROOF_COEFF_BY_CODE[self.roofTypeCode]
+
+    def rainfallFactor(self):
+        return np.minimum(self.rainfallMM / 1000, 1)
+
+    def runoffFactor(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.minimum(self.harvestedWaterFromRoof() / (self.roofArea * 600), 1)
+
+    def groundwaterFactor(self, groundwaterPre, groundwaterPost):
+        pre = depthArray(groundwaterPre)
+        post = depthArray(groundwaterPost)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # fmax, like max(0, x) in the scalar version, turns NaN into 0
+            return np.fmax(0, (pre - post) / pre)
+
+    def feasibility(self, groundwaterPre, groundwaterPost, aquiferScore):
+        aquiferFactor = np.asarray(aquiferScore, dtype=float) / 5
+        feasibility = (
+            0.3 * self.rainfallFactor() +
+            0.25 * self.runoffFactor() +
+            0.25 * self.groundwaterFactor(groundwaterPre, groundwaterPost) +
+            0.2 * aquiferFactor
+        )
+        return np.where(self.rainfallMM < 350, -1.0, feasibility)
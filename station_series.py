@@ -0,0 +1,298 @@
+import numpy as np
+import pandas as pd
+
+from location_resolver import normalizeName
+from lru_cache import LRUCache
+from stations import STATION_COLUMNS, STATION_TABLE, cleanReadings, stationIds
+
+# Readings within this many days before a reading (itself included) make up
+# its rolling mean
+ROLLING_DAYS = 365
+# Season of each month (index 1-12). CGWB measures in January, in the
+# pre-monsoon months (March-May), in August and after the monsoon (November)
+SEASONS = ["winter", "preMonsoon", "monsoon", "postMonsoon"]
+MONTH_SEASONS = np.array([-1, 0, 0, 1, 1, 1, 2, 2, 2, 2, 3, 3, 3])
+PRE_MONSOON, POST_MONSOON = SEASONS.index("preMonsoon"), SEASONS.index("postMonsoon")
+STATION_FIELDS = ["id", "station", "district", "state", "lat", "lon"]
+
+
+def groupStarts(*keys):
+    """Rows where any of the (sorted) key arrays changes value, starting at 0."""
+    change = np.zeros(len(keys[0]), dtype=bool)
+    if len(change):
+        change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+
+def aggregate(station, key, values):
+    """Mean, min, max and count of values over each run of equal (station,
+    key) in arrays sorted by both."""
+    starts = groupStarts(station, key)
+    if not len(starts):
+        empty = np.empty(0)
+        return {"station": station[:0], "key": key[:0], "mean": empty, "min": empty, "max": empty,
+                "count": np.empty(0, dtype=np.int64)}
+    counts = np.diff(np.append(starts, len(values)))
+    return {
+        "station": station[starts],
+        "key": key[starts],
+        "mean": np.add.reduceat(values, starts) / counts,
+        "min": np.minimum.reduceat(values, starts),
+        "max": np.maximum.reduceat(values, starts),
+        "count": counts,
+    }
+
+
+def rollingMeans(station, day, values, days=ROLLING_DAYS):
+    """Per reading, the mean of its station's readings in the days-long
+    window ending on it, from one cumulative sum over all stations."""
+    if not len(values):
+        return np.empty(0)
+    # One sorted key for (station, day), with a gap of more than days between
+    # stations so no window reaches into the previous station
+    span = int(day.max() - day.min()) + days + 1
+    key = station * span + (day - day.min())
+    rows = np.arange(len(values))
+    first = np.searchsorted(key, key - days + 1, side="left")
+    total = np.concatenate([[0.0], np.cumsum(values)])
+    return (total[rows + 1] - total[first]) / (rows + 1 - first)
+
+
+def monsoonDeltas(seasonal):
+    """Pre- and post-monsoon mean level per station and year, and recharge
+    (pre minus post: how far the water table rose over the monsoon)."""
+    station, year, season = seasonal["station"], seasonal["key"] // 4, seasonal["key"] % 4
+    wanted = (season == PRE_MONSOON) | (season == POST_MONSOON)
+    station, year, season, mean = station[wanted], year[wanted], season[wanted], seasonal["mean"][wanted]
+    starts = groupStarts(station, year)
+    group = np.zeros(len(station), dtype=np.int64)
+    group[starts] = 1
+    group = np.cumsum(group) - 1
+    pre = np.full(len(starts), np.nan)
+    post = np.full(len(starts), np.nan)
+    pre[group[season == PRE_MONSOON]] = mean[season == PRE_MONSOON]
+    post[group[season == POST_MONSOON]] = mean[season == POST_MONSOON]
+    return {"station": station[starts], "year": year[starts], "preMonsoon": pre, "postMonsoon": post,
+            "recharge": pre - post}
+
+
+def deriveTables(readings, rollingDays=ROLLING_DAYS):
+    """Every table served for readings sorted by station and day: the
+    readings with their rolling means, monthly and seasonal aggregates and
+    monsoon deltas, all keyed by station and in the same order."""
+    station, day, level = readings["station"], readings["day"], readings["currentlevel"]
+    dates = day.astype("datetime64[D]")
+    month = dates.astype("datetime64[M]").astype(np.int64)
+    year = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+    season = MONTH_SEASONS[month % 12 + 1]
+    seasonal = aggregate(station, year * 4 + season, level)
+    return {
+        "readings": {**readings, "rollingMean": rollingMeans(station, day, level, rollingDays)},
+        "monthly": aggregate(station, month, level),
+        "seasonal": seasonal,
+        "deltas": monsoonDeltas(seasonal),
+    }
+
+
+def take(table, rows):
+    return {name: values[rows] for name, values in table.items()}
+
+
+def splice(table, replacement, stations):
+    """table with the rows of stations replaced by replacement's, still
+    sorted by station (each station's rows keep their order)."""
+    keep = ~np.isin(table["station"], stations)
+    merged = {name: np.concatenate([values[keep], replacement[name]]) for name, values in table.items()}
+    return take(merged, np.argsort(merged["station"], kind="stable"))
+
+
+def readingArrays(frame, codes):
+    """Readings of frame as arrays sorted by station code and day."""
+    day = frame["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    order = np.lexsort((day, codes))
+    return {
+        "station": np.asarray(codes, dtype=np.int64)[order],
+        "day": day[order],
+        "currentlevel": frame["currentlevel"].to_numpy(dtype=float)[order],
+        "levelDiff": frame["levelDiff"].to_numpy(dtype=float)[order],
+    }
+
+
+def nullable(values, digits=3):
+    return [None if np.isnan(v) else v for v in np.round(values.astype(float), digits).tolist()]
+
+
+class StationSeries:
+    """Reading history of every groundwater monitoring station.
+
+    The readings are sorted and grouped once: one set of arrays ordered by
+    station and date, so each station is a contiguous slice (offsets). The
+    aggregates (rolling means, monthly and seasonal levels, monsoon deltas)
+    are computed for all stations together with whole-array operations and
+    kept the same way. append() adds readings by recomputing only the
+    stations they belong to and splicing those into the arrays.
+    """
+
+    def __init__(self, stations, tables, rollingDays=ROLLING_DAYS):
+        self.stations = stations.reset_index(drop=True)
+        self.tables = tables
+        self.rollingDays = rollingDays
+        self.codes = {stationId: code for code, stationId in enumerate(self.stations["id"])}
+        # (name, latitude, longitude) -> code, the key readings are matched on
+        self.keyCodes = {
+            key: code for code, key in enumerate(zip(self.stations["station"], self.stations["lat"], self.stations["lon"]))
+        }
+        bounds = np.arange(len(self.stations) + 1)
+        self.offsets = {name: np.searchsorted(table["station"], bounds) for name, table in tables.items()}
+        # Normalized "STATE|DISTRICT" of each station, normalizing each pair once
+        pairs, names = pd.factorize(pd.Series(list(zip(self.stations["state"], self.stations["district"])),
+                                              dtype=object))
+        districtKeys = np.array([f"{normalizeName(state)}|{normalizeName(district)}" for state, district in names],
+                                dtype=object)
+        self.districtKeys = districtKeys[pairs]
+        self.districtCache = LRUCache(256)
+
+    @classmethod
+    def fromFrame(cls, frame, rollingDays=ROLLING_DAYS):
+        """Build from readings with STATION_COLUMNS' (renamed) columns."""
+        frame = cleanReadings(frame)
+        stations = frame.drop_duplicates(["station", "lat", "lon"])
+        stations = stations.sort_values(["state", "district", "station"], kind="mergesort").reset_index(drop=True)
+        stations = stations.assign(id=stationIds(stations))[STATION_FIELDS]
+        codes = pd.MultiIndex.from_frame(stations[["station", "lat", "lon"]]).get_indexer(
+            pd.MultiIndex.from_frame(frame[["station", "lat", "lon"]])
+        )
+        return cls(stations, deriveTables(readingArrays(frame, codes), rollingDays), rollingDays)
+
+    @classmethod
+    def fromStore(cls, store, table=STATION_TABLE):
+        if table not in store.tables():
+            return cls.fromFrame(pd.DataFrame(columns=list(STATION_COLUMNS.values())))
+        return cls.fromFrame(store.frame(table, list(STATION_COLUMNS)).rename(columns=STATION_COLUMNS))
+
+    def __len__(self):
+        return len(self.stations)
+
+    def append(self, frame):
+        """A new StationSeries with frame's readings added. Only the stations
+        they belong to (new ones included) are recomputed."""
+        frame = cleanReadings(frame)
+        if frame.empty:
+            return self
+        stations = self.stations
+        new = frame.drop_duplicates(["station", "lat", "lon"])
+        new = new[[(key not in self.keyCodes) for key in zip(new["station"], new["lat"], new["lon"])]]
+        if len(new):
+            new = new.assign(id=stationIds(new))[STATION_FIELDS]
+            stations = pd.concat([stations, new], ignore_index=True)
+        keyCodes = dict(self.keyCodes)
+        for code, key in enumerate(zip(new["station"], new["lat"], new["lon"]), len(self.stations)):
+            keyCodes[key] = code
+        codes = np.array([keyCodes[key] for key in zip(frame["station"], frame["lat"], frame["lon"])], dtype=np.int64)
+        affected = np.unique(codes)
+
+        readings = self.tables["readings"]
+        old = take(readings, np.isin(readings["station"], affected))
+        added = readingArrays(frame, codes)
+        merged = {name: np.concatenate([old[name], added[name]]) for name in added}
+        merged = take(merged, np.lexsort((merged["day"], merged["station"])))
+        replacement = deriveTables(merged, self.rollingDays)
+        tables = {name: splice(table, replacement[name], affected) for name, table in self.tables.items()}
+        return StationSeries(stations, tables, self.rollingDays)
+
+    def rows(self, table, code):
+        offsets = self.offsets[table]
+        return slice(offsets[code], offsets[code + 1])
+
+    def payload(self, tables):
+        """Column-wise JSON lists of one group's tables."""
+        readings, monthly, seasonal, deltas = (tables[name] for name in ("readings", "monthly", "seasonal", "deltas"))
+        months = monthly["key"].astype("datetime64[M]")
+        return {
+            "readings": {
+                "date": np.datetime_as_string(readings["day"].astype("datetime64[D]")).tolist(),
+                "currentlevel": nullable(readings["currentlevel"]),
+                "levelDiff": nullable(readings["levelDiff"]),
+                "rollingMean": nullable(readings["rollingMean"]),
+            },
+            "monthly": {
+                "month": np.datetime_as_string(months).tolist(),
+                "mean": nullable(monthly["mean"]),
+                "min": nullable(monthly["min"]),
+                "max": nullable(monthly["max"]),
+                "count": monthly["count"].tolist(),
+            },
+            "seasonal": {
+                "year": (seasonal["key"] // 4).tolist(),
+                "season": [SEASONS[s] for s in (seasonal["key"] % 4).tolist()],
+                "mean": nullable(seasonal["mean"]),
+                "count": seasonal["count"].tolist(),
+            },
+            "monsoonDeltas": {
+                "year": deltas["year"].tolist(),
+                "preMonsoon": nullable(deltas["preMonsoon"]),
+                "postMonsoon": nullable(deltas["postMonsoon"]),
+                "recharge": nullable(deltas["recharge"]),
+            },
+        }
+
+    def describe(self, code):
+        row = self.stations.iloc[code]
+        return {"id": row["id"], "station": row["station"], "district": row["district"], "state": row["state"],
+                "latitude": float(row["lat"]), "longitude": float(row["lon"])}
+
+    def station(self, stationId):
+        """One station's readings and aggregates, or None for an unknown id."""
+        code = self.codes.get(stationId)
+        if code is None:
+            return None
+        tables = {name: take(table, self.rows(name, code)) for name, table in self.tables.items()}
+        return {**self.describe(code), "rollingDays": self.rollingDays, **self.payload(tables)}
+
+    def district(self, state, district):
+        """Readings of all of a district's stations, aggregated together as
+        one series, or None when it has no stations."""
+        key = f"{normalizeName(state)}|{normalizeName(district)}"
+        result = self.districtCache.get(key)
+        if result is not None:
+            return result
+        codes = np.flatnonzero(self.districtKeys == key)
+        if not len(codes):
+            return None
+        readings = self.tables["readings"]
+        rows = np.flatnonzero(np.isin(readings["station"], codes))
+        pooled = {name: readings[name][rows] for name in ("day", "currentlevel", "levelDiff")}
+        order = np.argsort(pooled["day"], kind="stable")
+        pooled = {name: values[order] for name, values in pooled.items()}
+        pooled["station"] = np.zeros(len(rows), dtype=np.int64)
+        first = self.stations.iloc[codes[0]]
+        result = {
+            "district": first["district"],
+            "state": first["state"],
+            "stations": [self.describe(code) for code in codes.tolist()],
+            "rollingDays": self.rollingDays,
+            **self.payload(deriveTables(pooled, self.rollingDays)),
+        }
+        self.districtCache.put(key, result)
+        return result
+
+    def stats(self):
+        return {"stations": len(self), "readings": len(self.tables["readings"]["day"]),
+                "districtCache": self.districtCache.stats()}
+
+
+def appendedReadings(previousStore, store, table=STATION_TABLE):
+    """The rows added to the end of table since previousStore, as a renamed
+    frame, or None when it changed in any other way (or did not change)."""
+    if table not in previousStore.tables() or table not in store.tables():
+        return None
+    before, after = previousStore.rows(table), store.rows(table)
+    if after <= before:
+        return None
+    for column in STATION_COLUMNS:
+        if not pd.Series(store.column(table, column)[:before]).equals(pd.Series(previousStore.column(table, column))):
+            return None
+    tail = {column: store.column(table, column)[before:] for column in STATION_COLUMNS}
+    return pd.DataFrame(tail).rename(columns=STATION_COLUMNS)
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+STATION_TABLE = "cgwb_groundwater_levels"
+STATION_COLUMNS = {
+    "Date (date)": "date",
+    "State Name (state_name)": "state",
+    "District Name (district_name)": "district",
+    "Station Name (station_name)": "station",
+    "Latitude (latitude)": "lat",
+    "Longitude (longitude)": "lon",
+    "currentlevel": "currentlevel",
+    "level_diff": "levelDiff",
+}
+EARTH_RADIUS_KM = 6371.0088
+# How many stations a measured level is averaged over, and how far away
+# they may be before the district's ranges are used instead
+NEAREST_STATIONS = int(os.environ.get("NEAREST_STATIONS", "5"))
+STATION_MAX_KM = float(os.environ.get("STATION_MAX_KM", "100"))
+# Distances below this count as this, so a station at the query point does
+# not get an infinite weight
+MIN_DISTANCE_KM = 0.01
+
+
+def unitVectors(lat, lon):
+    """Points on the unit sphere for latitudes and longitudes in degrees.
+    Straight-line (chord) distance between them orders pairs exactly as
+    great-circle distance does, so a plain KD-tree finds nearest stations."""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    cosLat = np.cos(lat)
+    return np.stack([cosLat * np.cos(lon), cosLat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chordToKm(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.asarray(chord) / 2, 1.0))
+
+
+def kmToChord(km):
+    return 2 * np.sin(np.minimum(km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+def stationId(name, lat, lon):
+    """A station's id in URLs: its name as a slug and a short hash of its
+    coordinates ("dharapuram2-1f0c3a"), stable across reloads."""
+    slug = re.sub(r"[^a-z0-9]+", "-", str(name).lower()).strip("-") or "station"
+    digest = hashlib.sha1(f"{name}|{lat:.5f}|{lon:.5f}".encode()).hexdigest()[:6]
+    return f"{slug}-{digest}"
+
+
+def stationIds(frame):
+    return [stationId(name, lat, lon) for name, lat, lon in zip(frame["station"], frame["lat"], frame["lon"])]
+
+
+def cleanReadings(frame):
+    """Readings with a location, a level and a date; the station index and
+    the station series both start from these, so every indexed station has
+    a history."""
+    frame = frame.dropna(subset=["lat", "lon", "currentlevel"])
+    frame = frame.assign(date=pd.to_datetime(frame["date"], errors="coerce"))
+    return frame.dropna(subset=["date"])
+
+
+def latestReadings(frame):
+    """One row per station (name and coordinates), its most recent reading."""
+    ordered = cleanReadings(frame).sort_values("date", kind="mergesort")
+    latest = ordered.drop_duplicates(["station", "lat", "lon"], keep="last")
+    return latest.sort_values(["state", "district", "station"], kind="mergesort").reset_index(drop=True)
+
+
+class StationIndex:
+    """Measured groundwater levels of the CGWB observation wells, searchable
+    by location.
+
+    Holds each station's latest reading and a KD-tree over the stations'
+    unit vectors. A query is one tree lookup, O(log n) in the number of
+    stations, and distances come back as great-circle kilometres.
+    """
+
+    def __init__(self, stations):
+        self.stations = stations
+        self.ids = np.array(stationIds(stations), dtype=object)
+        self.names = stations["station"].to_numpy(dtype=object)
+        self.districts = stations["district"].to_numpy(dtype=object)
+        self.states = stations["state"].to_numpy(dtype=object)
+        self.dates = stations["date"].dt.strftime("%Y-%m-%d").to_numpy(dtype=object)
+        self.lat = stations["lat"].to_numpy(dtype=float)
+        self.lon = stations["lon"].to_numpy(dtype=float)
+        self.levels = stations["currentlevel"].to_numpy(dtype=float)
+        self.levelDiffs = stations["levelDiff"].to_numpy(dtype=float)
+        self.tree = cKDTree(unitVectors(self.lat, self.lon)) if len(stations) else None
+
+    @classmethod
+    def fromStore(cls, store, table=STATION_TABLE):
+        if table not in store.tables():
+            return cls(latestReadings(pd.DataFrame(columns=list(STATION_COLUMNS.values()))))
+        frame = store.frame(table, list(STATION_COLUMNS)).rename(columns=STATION_COLUMNS)
+        return cls(latestReadings(frame))
+
+    def __len__(self):
+        return len(self.levels)
+
+    def query(self, lat, lon, k=5, maxKm=None):
+        """(indices, distancesKm) of the k nearest stations, nearest first,
+        leaving out any farther than maxKm."""
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        bound = np.inf if maxKm is None else kmToChord(maxKm)
+        chords, indices = self.tree.query(unitVectors(lat, lon), k=k, distance_upper_bound=bound)
+        chords, indices = np.atleast_1d(chords), np.atleast_1d(indices)
+        found = np.isfinite(chords)
+        return indices[found], chordToKm(chords[found])
+
+    def station(self, i, distanceKm=None):
+        result = {
+            "id": self.ids[i],
+            "station": self.names[i],
+            "district": self.districts[i],
+            "state": self.states[i],
+            "latitude": float(self.lat[i]),
+            "longitude": float(self.lon[i]),
+            "date": self.dates[i],
+            "currentlevel": float(self.levels[i]),
+            "levelDiff": float(self.levelDiffs[i]),
+        }
+        if distanceKm is not None:
+            result["distanceKm"] = round(float(distanceKm), 3)
+        return result
+
+    def nearest(self, lat, lon, k=5, maxKm=None):
+        indices, distances = self.query(lat, lon, k, maxKm)
+        return [self.station(i, d) for i, d in zip(indices, distances)]
+
+    def estimate(self, lat, lon, k=5, maxKm=None, power=2):
+        """Inverse-distance weighted currentlevel (metres below ground) of the
+        k nearest stations within maxKm, with the stations used, or None when
+        there are none."""
+        indices, distances = self.query(lat, lon, k, maxKm)
+        if not len(indices):
+            return None
+        weights = 1 / np.maximum(distances, MIN_DISTANCE_KM) ** power
+        level = (weights * self.levels[indices]).sum() / weights.sum()
+        return {
+            "currentlevel": round(float(level), 3),
+            "k": len(indices),
+            "stations": [self.station(i, d) for i, d in zip(indices, distances)],
+        }
+
+    def estimateLevels(self, lat, lon, k=5, maxKm=None, power=2):
+        """estimate's currentlevel for arrays of points in one tree query;
+        NaN for points without a station in range or without coordinates."""
+        lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+        levels = np.full(len(lat), np.nan)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        k = min(k, len(self))
+        if k <= 0 or not valid.any():
+            return levels
+        bound = np.inf if maxKm is None else kmToChord(maxKm)
+        chords, indices = self.tree.query(unitVectors(lat[valid], lon[valid]), k=k, distance_upper_bound=bound)
+        chords, indices = chords.reshape(-1, k), indices.reshape(-1, k)
+        found = np.isfinite(chords)
+        distances = chordToKm(np.where(found, chords, 0))
+        weights = np.where(found, 1 / np.maximum(distances, MIN_DISTANCE_KM) ** power, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            level = (weights * self.levels[np.where(found, indices, 0)]).sum(axis=1) / weights.sum(axis=1)
+        levels[valid] = np.round(level, 3)
+        return levels
+
+    def stats(self):
+        return {"stations": len(self), "oldestReading": min(self.dates, default=None),
+                "latestReading": max(self.dates, default=None)}
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("sklearn")
+
+from aquifer_model import LEVEL_CHUNK, SMALL_BATCH, AquiferPredictor, CompiledAquiferPredictor
+
+# The pickled scaler was fitted on a DataFrame; the tests also pass arrays
+pytestmark = pytest.mark.filterwarnings("ignore:X does not have valid feature names")
+BATCH_SIZES = [1, 2, SMALL_BATCH, SMALL_BATCH + 1, 100, LEVEL_CHUNK + 1, 10000]
+
+
+@pytest.fixture(scope="module")
+def predictors():
+    return AquiferPredictor.load(), CompiledAquiferPredictor.load()
+
+
+def compiledScaled(compiled, Xf):
+    """The compiled forest's probabilities for rows already scaled to float32,
+    through the path predict_proba takes for a batch of that size."""
+    if len(Xf) <= SMALL_BATCH:
+        return compiled._predict_small(Xf)
+    proba = np.zeros((len(Xf), compiled.value.shape[1]))
+    for start in range(0, len(Xf), LEVEL_CHUNK):
+        compiled._predict_levels(Xf[start:start + LEVEL_CHUNK], proba[start:start + LEVEL_CHUNK])
+    return proba / compiled.n_trees
+
+
+def onThresholds(compiled, rows, rng):
+    """Scaled rows whose features sit exactly on split thresholds of the
+    forest (as float32) or one float32 step either side of them."""
+    split = compiled.left != -1
+    Xf = rng.standard_normal((rows, len(compiled.features))).astype(np.float32)
+    for column in range(len(compiled.features)):
+        thresholds = compiled.threshold[split & (compiled.feature == column)].astype(np.float32)
+        if not len(thresholds):
+            continue
+        values = rng.choice(thresholds, rows)
+        step = rng.integers(-1, 2, rows)
+        values[step < 0] = np.nextafter(values[step < 0], np.float32(-np.inf))
+        values[step > 0] = np.nextafter(values[step > 0], np.float32(np.inf))
+        Xf[:, column] = values
+    return Xf
+
+
+@pytest.mark.parametrize("rows", BATCH_SIZES)
+def test_compiled_matches_sklearn(predictors, rows):
+    predictor, compiled = predictors
+    rng = np.random.default_rng(rows)
+    X = predictor.scaler.mean_ + predictor.scaler.scale_ * rng.standard_normal((rows, len(predictor.features)))
+
+    proba = compiled.predict_proba(X)
+    np.testing.assert_array_equal(proba, predictor.predict_proba(X))
+    scaled = predictor.scaler.transform(pd.DataFrame(X, columns=predictor.features))
+    labels = predictor.target_encoder.inverse_transform(predictor.model.predict(scaled))
+    assert [compiled.classes[i] for i in proba.argmax(axis=1)] == list(labels)
+
+
+@pytest.mark.parametrize("rows", [1, SMALL_BATCH, 100, LEVEL_CHUNK + 1, 10000])
+def test_compiled_matches_sklearn_on_thresholds(predictors, rows):
+    predictor, compiled = predictors
+    Xf = onThresholds(compiled, rows, np.random.default_rng(rows))
+
+    expected = predictor.model.predict_proba(Xf)
+    np.testing.assert_array_equal(compiledScaled(compiled, Xf), expected)
+    np.testing.assert_array_equal(compiledScaled(compiled, Xf).argmax(axis=1), expected.argmax(axis=1))
+
+
+def test_compiled_predict_matches_sklearn(predictors):
+    predictor, compiled = predictors
+    rng = np.random.default_rng(0)
+    labels = list(predictor.label_codes)
+    depths = ["0-2", "2-5", "5-10", "10-20", "20-40", ">40", "not a depth"]
+
+    class Request:
+        def __init__(self):
+            self.state, self.district = rng.choice(labels, 2)
+            self.pre_monsoon, self.post_monsoon = rng.choice(depths, 2)
+            self.fluctuation, self.elevation = rng.normal(0, 3), rng.uniform(0, 2000)
+            self.actual_rainfall, self.normal_rainfall = rng.uniform(200, 3000, 2)
+            self.percent_dep = rng.normal(0, 30)
+
+    requests = [Request() for _ in range(500)]
+    assert compiled.predict(requests) == predictor.predict(requests)
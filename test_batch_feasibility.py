@@ -0,0 +1,116 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from data_registry import registry
+from integrated_app import app
+
+NUMBERS = ["rainfallMM", "aquiferScore", "annualDemandLiters", "harvestedWaterLiters", "feasibilityScore"]
+# The batch body is written with 15 significant digits
+PRECISION = 1e-14
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+def rooftops():
+    rows = sorted(registry.current().crosswalk.rows.values(), key=lambda row: (row.state, row.district))
+    roofTypes = ["CONCRETE", "GI_SHEET", "TILE", "THATCHED"]
+    records = [
+        {"district": row.district, "state": row.state, "roofArea": 40 + 15 * i,
+         "roofType": roofTypes[i % 4], "dwellers": 1 + i % 6}
+        for i, row in enumerate(rows[::8])
+    ]
+    # Spelled as users type them, and a district no table knows
+    records.append({"district": "pune", "state": "maharashtra", "roofArea": 90, "roofType": "tile", "dwellers": 3})
+    records.append({"district": "Atlantis", "state": "Kerala", "roofArea": 90, "roofType": "TILE", "dwellers": 3})
+    return records
+
+
+def test_batch_matches_process_location(client):
+    records = rooftops()
+    response = client.post("/process-location/batch", json=records)
+    assert response.status_code == 200
+    results = response.json()
+    assert len(results) == len(records)
+
+    for record, result in zip(records, results):
+        single = client.post("/process-location", json=record)
+        if result["error"] is not None:
+            assert single.status_code == 500, record
+            continue
+        assert single.status_code == 200, (record, single.text)
+        expected = single.json()
+        assert result["aquiferType"] == expected["aquiferType"], record
+        for column in NUMBERS:
+            assert result[column] == pytest.approx(expected[column], rel=PRECISION), (record, column)
+
+
+def test_batch_with_coordinates_matches_process_location(client):
+    stations = registry.current().stations
+    records = [
+        {"lat": float(stations.lat[i]) + 0.01, "lon": float(stations.lon[i]) - 0.01,
+         "roofArea": 75, "roofType": "CONCRETE", "dwellers": 4}
+        for i in range(0, len(stations), 40)
+    ]
+    results = client.post("/process-location/batch", json=records).json()
+
+    for record, result in zip(records, results):
+        single = client.post("/process-location", json=record)
+        if result["error"] is not None:
+            assert single.status_code == 500, record
+            continue
+        expected = single.json()
+        assert (result["district"], result["state"]) == (expected["district"], expected["state"])
+        assert result["groundwaterMeasured"] == expected["groundwaterMeasured"]["currentlevel"]
+        for column in NUMBERS:
+            assert result[column] == pytest.approx(expected[column], rel=PRECISION), (record, column)
+
+
+def test_csv_and_ndjson_match_json(client):
+    records = rooftops()[:10]
+    columns = ["district", "state", "roofArea", "roofType", "dwellers"]
+    csv = "\n".join([",".join(columns)] + [",".join(str(record[c]) for c in columns) for record in records])
+    ndjson = "\n".join(json.dumps(record) for record in records)
+
+    expected = client.post("/process-location/batch", json=records).json()
+    for body, contentType in ((csv, "text/csv"), (ndjson, "application/x-ndjson")):
+        response = client.post("/process-location/batch", content=body, headers={"Content-Type": contentType})
+        assert response.json() == expected
+
+
+@pytest.mark.parametrize("body,contentType", [
+    ("[]", "application/json"), ('{"records": []}', "application/json"),
+    ("district,state,roofArea,roofType,dwellers\n", "text/csv"), ("\n", "application/x-ndjson"),
+])
+def test_empty_batch_gives_empty_result(client, body, contentType):
+    response = client.post("/process-location/batch", content=body, headers={"Content-Type": contentType})
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_row_limit(client, monkeypatch):
+    import batch_feasibility
+    monkeypatch.setattr(batch_feasibility, "MAX_BATCH_ROWS", 3)
+    records = rooftops()[:4]
+    assert client.post("/process-location/batch", json=records[:3]).status_code == 200
+    assert client.post("/process-location/batch", json=records).status_code == 413
+    ndjson = "\n".join(json.dumps(record) for record in records)
+    response = client.post("/process-location/batch", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 413
+
+
+def test_body_limit(client, monkeypatch):
+    import integrated_app
+    monkeypatch.setattr(integrated_app, "MAX_BATCH_BYTES", 1000)
+    body = json.dumps(rooftops()[:20]).encode()
+    assert len(body) > 1000
+    assert client.post("/process-location/batch", content=body).status_code == 413
+    # Without a Content-Length the body is streamed, and cut off past the limit
+    chunks = (body[i:i + 100] for i in range(0, len(body), 100))
+    assert client.post("/process-location/batch", content=chunks).status_code == 413
+    assert client.post("/process-location/batch", json=rooftops()[:2]).status_code == 200
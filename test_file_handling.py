@@ -0,0 +1,43 @@
+import re
+
+import pandas as pd
+import pytest
+
+from data_registry import registry
+from file_handling import LocationIndex
+
+# Keys as users send them: names with brackets and dots, partial names,
+# and keys that are only valid (or invalid) as regular expressions
+KEYS = ["Kamrup (Metro)", "kamrup.", "^South", "24 Parg", "North|South", "[AB]arpeta",
+        "Dadra.*Haveli", "east", "NAGAR", "(", "Leh (Ladakh", "Nowhere"]
+
+
+def containsScan(names, key):
+    """The lookup LocationIndex replaced: an exact match, else the first
+    name str.contains matches (None when the key is not a valid pattern)."""
+    names = pd.Series(names, dtype=object).str.upper()
+    exact = names == key.upper()
+    if exact.any():
+        return int(exact.to_numpy().argmax())
+    try:
+        hits = names.str.contains(key.upper(), na=False).to_numpy()
+    except re.error:
+        return None
+    return int(hits.argmax()) if hits.any() else None
+
+
+@pytest.mark.filterwarnings("ignore:This pattern is interpreted as a regular expression")
+@pytest.mark.parametrize("table,column", [
+    ("rainfall_database", "NAME"), ("statewise_aquifier", "State"), ("groundwater2023", "District"),
+])
+def test_find_matches_str_contains(table, column):
+    names = registry.current().store.keys(table, column)
+    index = LocationIndex(names)
+    keys = KEYS + [str(name)[1:-1] for name in names[::7] if isinstance(name, str)]
+    for key in keys:
+        assert index.find(key) == containsScan(names, key), key
+
+
+def test_regex_keys_find_their_district():
+    tables = registry.current().tables
+    assert tables.getRainfall("Kamrup (Metro)", "Assam") != tables.getRainfall("", "Assam")
@@ -19,6 +19,21 @@ try:
         if hasattr(route, 'path') and hasattr(route, 'methods'):
             print(f"   {route.methods} {route.path}")
 
+    # A forecast projected up to the surface (0 m) must not reach the
+    # feasibility score as a zero pre-monsoon depth
+    from fastapi.testclient import TestClient
+    from integrated_app import groundwaterTrends
+    surfaced = [d for d in groundwaterTrends.forecast().all()["districts"]
+                if d["preMonsoon"]["projected"] == 0 or d["postMonsoon"]["projected"] == 0]
+    with TestClient(app) as client:
+        for district in surfaced[:3]:
+            response = client.post("/process-location", json={
+                "district": district["district"], "state": district["state"],
+                "roofArea": 100, "roofType": "CONCRETE", "dwellers": 4, "useForecast": True,
+            })
+            assert response.status_code == 200, (district["district"], response.text)
+    print(f"✅ Forecast projected to the surface handled ({len(surfaced)} districts)")
+
     print("\n✅ Integration successful!")
     print("🚀 You can now run: uvicorn integrated_app:app --reload")
 
@@ -0,0 +1,39 @@
+import time
+
+from lru_cache import MISSING, LRUCache
+
+
+def test_drops_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evicted"] == 1
+    assert len(cache) == 2
+
+
+def test_none_is_a_value():
+    cache = LRUCache(2)
+    cache.put("nothing", None)
+    assert cache.get("nothing", MISSING) is None
+    assert cache.get("unknown", MISSING) is MISSING
+
+
+def test_entries_expire_after_ttl():
+    cache = LRUCache(4, ttl=0.05)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expired"], stats["size"]) == (1, 1, 1, 0)
+
+
+def test_zero_size_caches_nothing():
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert cache.values() == []
@@ -0,0 +1,48 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from data_registry import registry
+from integrated_app import app
+from result_cache import ResultCache
+
+ROOFTOP = {"roofArea": 100, "roofType": "CONCRETE", "dwellers": 4}
+# District spellings the response cache keys alike: one with a crosswalk row
+# and one (Ahmadabad) that only the Gujarat map knows
+SPELLINGS = [
+    [("BALASORE", "Odisha"), ("balasore", "odisha"), ("Balasore", "ODISHA")],
+    [("Ahmadabad", "Gujarat"), ("AHMADABAD", "gujarat"), ("ahmadabad", "Gujarat")],
+]
+
+
+class Request:
+    def __init__(self, district, state, **rooftop):
+        self.district, self.state = district, state
+        self.roofArea, self.roofType, self.dwellers = rooftop["roofArea"], rooftop["roofType"], rooftop["dwellers"]
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("spellings", SPELLINGS)
+def test_spellings_sharing_a_cache_key_get_the_same_maps(client, spellings):
+    snapshot = registry.current()
+    keys = {ResultCache().responseKey(snapshot, Request(*names, **ROOFTOP)) for names in spellings}
+    assert len(keys) == 1
+
+    maps = []
+    for district, state in spellings:
+        response = client.post("/process-location", json={"district": district, "state": state, **ROOFTOP})
+        assert response.status_code == 200, response.text
+        maps.append(response.json()["maps"])
+    assert all(m == maps[0] for m in maps)
+    assert set(maps[0]) == {"rainfall", "premonsoon", "postmonsoon", "aquifer"}
+
+
+def test_highlight_is_the_map_path_id():
+    crosswalk = registry.current().crosswalk
+    assert crosswalk.pathId("GJ", "ahmadabad") == crosswalk.pathId("GJ", " AHMADABAD ") == "Ahmadabad"
+    assert crosswalk.pathId("OD", "balasore") == crosswalk.svgPathId(crosswalk.get("BALASORE", "Odisha"))
+    assert crosswalk.pathId("GJ", "Atlantis") is None
@@ -0,0 +1,53 @@
+import itertools
+
+import numpy as np
+
+from depth_range import DepthRange
+from rwh import RainwaterHarvesting, RainwaterHarvestingBatch
+
+ROOF_AREAS = [1, 45.5, 100, 2500]
+ROOF_TYPES = ["CONCRETE", "gi_sheet", "Tile", "THATCHED", "ASBESTOS"]
+RAINFALL = [0, 349.9, 350, 893.4, 1000, 3200]
+DWELLERS = [1, 4, 12]
+# Labels as they appear in the groundwater tables, missing ones, and depths
+# at and around the surface
+DEPTHS = ["0-2", "2-5", "5-10", "10-20", "20-40", ">40", "2", "", None, DepthRange.single(0.0), DepthRange.single(7.25)]
+
+
+def scalarFeasibility(roofArea, roofType, rainfall, dwellers, pre, post, aquiferScore):
+    rwh = RainwaterHarvesting(roofArea, roofType, rainfall, dwellers)
+    return rwh.annualDemand(), rwh.harvestedWaterFromRoof(), rwh.feasibility(pre, post, aquiferScore)
+
+
+def test_batch_matches_scalar_rooftops():
+    rows = list(itertools.product(ROOF_AREAS, ROOF_TYPES, RAINFALL, DWELLERS))
+    roofArea, roofType, rainfall, dwellers = (list(column) for column in zip(*rows))
+    pre, post, score = ["5-10"] * len(rows), ["2-5"] * len(rows), [3] * len(rows)
+    batch = RainwaterHarvestingBatch(roofArea, roofType, rainfall, dwellers)
+
+    expected = np.array([scalarFeasibility(*row, "5-10", "2-5", 3) for row in rows], dtype=float)
+    np.testing.assert_array_equal(batch.annualDemand(), expected[:, 0])
+    np.testing.assert_array_equal(batch.harvestedWaterFromRoof(), expected[:, 1])
+    np.testing.assert_array_equal(batch.feasibility(pre, post, score), expected[:, 2])
+
+
+def test_batch_matches_scalar_groundwater():
+    pairs = list(itertools.product(DEPTHS, DEPTHS, [0, 2.5, 5]))
+    pre, post, score = (list(column) for column in zip(*pairs))
+    batch = RainwaterHarvestingBatch([120] * len(pairs), ["TILE"] * len(pairs), [1100] * len(pairs), [4] * len(pairs))
+
+    expected = [scalarFeasibility(120, "TILE", 1100, 4, *pair)[2] for pair in pairs]
+    np.testing.assert_array_equal(batch.feasibility(pre, post, score), expected)
+
+
+def test_batch_broadcasts_scenarios():
+    rainfall = np.array([[300], [800], [1500]])
+    batch = RainwaterHarvestingBatch([50, 200], ["CONCRETE", "THATCHED"], rainfall, [3, 6])
+    result = batch.feasibility("10-20", "5-10", 4)
+
+    assert result.shape == (3, 2)
+    for (scenario, roof), value in np.ndenumerate(result):
+        expected = scalarFeasibility(
+            [50, 200][roof], ["CONCRETE", "THATCHED"][roof], rainfall[scenario, 0], [3, 6][roof], "10-20", "5-10", 4
+        )[2]
+        assert value == expected
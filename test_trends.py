@@ -0,0 +1,71 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+from integrated_app import app
+
+IDENTITY = {"Accept-Encoding": "identity"}
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def tags(client):
+    plain = client.get("/groundwater-trends", headers=IDENTITY)
+    gzipped = client.get("/groundwater-trends", headers=GZIP)
+    return plain.headers["etag"], gzipped.headers["etag"]
+
+
+def test_each_encoding_has_its_own_etag(client, tags):
+    plain = client.get("/groundwater-trends", headers=IDENTITY)
+    gzipped = client.get("/groundwater-trends", headers=GZIP)
+    assert plain.status_code == gzipped.status_code == 200
+    assert "content-encoding" not in plain.headers
+    assert gzipped.headers["content-encoding"] == "gzip"
+    # httpx decodes the gzip body; both must be the same JSON
+    assert gzipped.content == plain.content
+    assert plain.headers["vary"] == gzipped.headers["vary"] == "Accept-Encoding"
+    etag, gzipEtag = tags
+    assert etag != gzipEtag
+    assert gzipEtag == etag[:-1] + '-gzip"'
+
+
+def test_gzip_body_is_compressed(client):
+    with client.stream("GET", "/groundwater-trends", headers=GZIP) as response:
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw) == client.get("/groundwater-trends", headers=IDENTITY).content
+
+
+@pytest.mark.parametrize("headers", [IDENTITY, GZIP])
+@pytest.mark.parametrize("which", [0, 1])
+def test_matching_etag_is_not_modified(client, tags, headers, which):
+    response = client.get("/groundwater-trends", headers={**headers, "If-None-Match": tags[which]})
+    assert response.status_code == 304
+    assert response.content == b""
+    # The tag of the encoding the client would get
+    assert response.headers["etag"] == tags[headers is GZIP]
+
+
+@pytest.mark.parametrize("ifNoneMatch", [
+    '"stale", {}', '{}, "stale"', 'W/{}', '"a", W/{}, "b"', "*",
+])
+def test_if_none_match_lists(client, tags, ifNoneMatch):
+    for tag in tags:
+        for headers in (IDENTITY, GZIP):
+            response = client.get("/groundwater-trends", headers={**headers, "If-None-Match": ifNoneMatch.format(tag)})
+            assert response.status_code == 304, (ifNoneMatch, tag, headers)
+
+
+@pytest.mark.parametrize("ifNoneMatch", ['"stale"', '"stale", W/"older"', ""])
+def test_other_etags_get_the_body(client, tags, ifNoneMatch):
+    for headers in (IDENTITY, GZIP):
+        response = client.get("/groundwater-trends", headers={**headers, "If-None-Match": ifNoneMatch})
+        assert response.status_code == 200
+        assert response.headers["etag"] == tags[headers is GZIP]
+        assert response.json()
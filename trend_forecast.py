@@ -0,0 +1,166 @@
+import os
+import re
+import warnings
+
+import numpy as np
+
+# Trends shallower than this (metres per year, either way) count as stable
+STABLE_SLOPE = float(os.environ.get("FORECAST_STABLE_SLOPE", "0.25"))
+# A season needs this many years with a known depth to be fitted
+MIN_YEARS = 3
+SEASONS = ("preMonsoon", "postMonsoon")
+
+
+def yearValue(label):
+    """First year of a year label ("2019-20" -> 2019), or NaN."""
+    match = re.match(r"\s*(\d{4})", str(label))
+    return float(match.group(1)) if match else np.nan
+
+
+def yearLabel(year, labels):
+    # In the labels' own style when they are water years ("2023-24")
+    if len(labels) and all(re.fullmatch(r"\d{4}-\d{2}", str(label)) for label in labels):
+        return f"{year}-{(year + 1) % 100:02d}"
+    return str(year)
+
+
+def theilSen(x, Y):
+    """Theil-Sen fit of every row of Y against x at once: slope is the
+    median of the slopes between all pairs of years, intercept the median
+    of y - slope * x. NaN in Y marks a missing year. Returns (slope,
+    intercept, years); rows with fewer than MIN_YEARS values get NaN."""
+    first, second = np.triu_indices(len(x), 1)
+    years = np.isfinite(Y).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        # Rows without a single pair are all NaN; they are masked below
+        warnings.simplefilter("ignore", RuntimeWarning)
+        slope = np.nanmedian((Y[:, second] - Y[:, first]) / (x[second] - x[first]), axis=1)
+        intercept = np.nanmedian(Y - slope[:, None] * x, axis=1)
+    enough = years >= MIN_YEARS
+    return np.where(enough, slope, np.nan), np.where(enough, intercept, np.nan), years
+
+
+def classify(slope, stable=STABLE_SLOPE):
+    """Depth growing means the water table is falling: "declining"."""
+    labels = np.select([slope > stable, slope < -stable], ["declining", "recovering"], "stable").astype(object)
+    labels[np.isnan(slope)] = None
+    return labels
+
+
+class TrendForecast:
+    """A Theil-Sen trend of every district's pre- and post-monsoon depth
+    (range midpoints, metres below ground) over the yearly groundwater
+    tables, projected forward.
+
+    The histories of a TrendIndex are laid out as one (district x year)
+    matrix per season with NaN for missing years, and all of them are
+    fitted in one batch. Built with the TrendIndex, so it is cached for as
+    long as the groundwater tables do not change; payloads are memoized per
+    number of years ahead.
+    """
+
+    def __init__(self, index, stable=STABLE_SLOPE):
+        self.index = index
+        self.stable = stable
+        spans = sorted(index.districtLookup.items(), key=lambda item: item[1][0])
+        self.keys = [key for key, _ in spans]
+        self.lookup = {key: group for group, key in enumerate(self.keys)}
+        starts = np.array([start for _, (start, _) in spans], dtype=np.int64)
+        ends = np.array([end for _, (_, end) in spans], dtype=np.int64)
+        # Row of the index and district of every history entry
+        lengths = ends - starts
+        group = np.repeat(np.arange(len(spans)), lengths)
+        order = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+        years = np.array([yearValue(label) for label in index.yearLabels], dtype=float)
+        known = np.isfinite(years)
+        self.lastYear = int(years[known].max()) if known.any() else 0
+        x = years[known] - self.lastYear
+        column = np.cumsum(known) - 1
+        midpoints = np.array([np.nan if m is None else m for m in index.depthMidpoints], dtype=float)
+
+        yearCodes = index.yearCodes[order]
+        rows = known[yearCodes]
+        Y = np.full((len(SEASONS), len(spans), len(x)), np.nan)
+        for season, codes in enumerate((index.preCodes, index.postCodes)):
+            Y[season, group[rows], column[yearCodes[rows]]] = midpoints[codes[order][rows]]
+        slope, intercept, counts = theilSen(x, Y.reshape(-1, len(x)))
+        self.slope = slope.reshape(len(SEASONS), -1)
+        self.intercept = intercept.reshape(len(SEASONS), -1)
+        self.years = counts.reshape(len(SEASONS), -1)
+        self.trend = classify(self.slope, stable)
+        self.summary = {
+            name: {label: int((self.trend[season] == label).sum()) for label in ("declining", "stable", "recovering")}
+            for season, name in enumerate(SEASONS)
+        }
+        self.payloads = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def projected(self, yearsAhead=1):
+        """Projected depth of every district and season, never above ground."""
+        return np.maximum(self.intercept + self.slope * yearsAhead, 0)
+
+    def record(self, group, projected):
+        stateCode, districtKey = self.keys[group]
+        start, _ = self.index.districtLookup[self.keys[group]]
+        record = {"state": self.index.stateNames[stateCode],
+                  "district": self.index.districtNames[self.index.districtCodes[start]]}
+        for season, name in enumerate(SEASONS):
+            fitted = not np.isnan(self.slope[season, group])
+            record[name] = {
+                "slope": round(float(self.slope[season, group]), 4) if fitted else None,
+                "projected": round(float(projected[season, group]), 3) if fitted else None,
+                "trend": self.trend[season, group],
+                "years": int(self.years[season, group]),
+            }
+        return record
+
+    def find(self, state, district):
+        stateCode = self.index.findState(state)
+        if stateCode is None:
+            return None
+        return self.lookup.get((stateCode, district.strip().upper()))
+
+    def district(self, state, district, yearsAhead=1):
+        """One district's forecast, or None when it has no history."""
+        group = self.find(state, district)
+        if group is None:
+            return None
+        return {"projectionYear": yearLabel(self.lastYear + yearsAhead, self.index.yearLabels),
+                **self.record(group, self.projected(yearsAhead))}
+
+    def all(self, yearsAhead=1, state=None):
+        """Every district's forecast (one state's, with state), or None for
+        an unknown state."""
+        stateCode = None
+        if state is not None:
+            stateCode = self.index.findState(state)
+            if stateCode is None:
+                return None
+        payload = self.payloads.get((yearsAhead, stateCode))
+        if payload is None:
+            projected = self.projected(yearsAhead)
+            payload = {
+                "method": "theil-sen",
+                "projectionYear": yearLabel(self.lastYear + yearsAhead, self.index.yearLabels),
+                "stableSlope": self.stable,
+                "districts": [
+                    self.record(group, projected) for group, key in enumerate(self.keys)
+                    if stateCode is None or key[0] == stateCode
+                ],
+            }
+            if stateCode is None:
+                payload["summary"] = self.summary
+            self.payloads[(yearsAhead, stateCode)] = payload
+        return payload
+
+    def projectedDepths(self, state, district, yearsAhead=1):
+        """(pre-monsoon, post-monsoon) projected depth, None where a season
+        could not be fitted; None when the district has no history."""
+        group = self.find(state, district)
+        if group is None:
+            return None
+        projected = self.projected(yearsAhead)[:, group]
+        return tuple(None if np.isnan(depth) else float(round(depth, 3)) for depth in projected)
@@ -0,0 +1,288 @@
+import fnmatch
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from depth_range import parseDepthRange
+from datastore import storeHolder
+from trend_forecast import TrendForecast
+
+TRENDS_TABLES = "groundwater*"
+GROUNDWATER_COLUMNS = ["Year", "State", "District", "Post_Monsoon", "Pre_Monsoon"]
+# Per-district series a trend query can select
+TREND_FIELDS = ["Year", "Pre_Monsoon", "Post_Monsoon", "Pre_Monsoon_Midpoint", "Post_Monsoon_Midpoint"]
+
+
+def loadGroundwaterTables(store, tables):
+    """Concatenate the groundwater tables, skipping any table whose rows all
+    appear in the tables before it (groundwater_combined repeats the yearly
+    files). Combined tables are taken last. Returns (frame, skipped)."""
+    frames, seen, skipped = [], set(), []
+    for table in sorted(tables, key=lambda t: ("combined" in t, t)):
+        frame = store.frame(table, GROUNDWATER_COLUMNS)
+        rows = set(frame.itertuples(index=False, name=None))
+        if rows and rows <= seen:
+            skipped.append(table)
+            continue
+        seen |= rows
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=GROUNDWATER_COLUMNS), skipped
+    return pd.concat(frames, ignore_index=True), skipped
+
+
+def trendPayload(groundwater):
+    """{district: {"Pre_Monsoon": [[year, range], ...], "Post_Monsoon": [...]}}
+    with districts in name order and each history in year order."""
+    ordered = groundwater.sort_values(["District", "Year"], kind="mergesort")
+    trendData = {}
+    for district, year, pre, post in zip(
+        ordered["District"], ordered["Year"], ordered["Pre_Monsoon"], ordered["Post_Monsoon"]
+    ):
+        entry = trendData.get(district)
+        if entry is None:
+            entry = trendData[district] = {"Pre_Monsoon": [], "Post_Monsoon": []}
+        entry["Pre_Monsoon"].append([year, pre])
+        entry["Post_Monsoon"].append([year, post])
+    return trendData
+
+
+class TrendIndex:
+    """Groundwater history grouped by (state, district) for filtered queries.
+
+    Names, years and depth ranges are stored as categorical codes and the
+    depth ranges also as midpoints, in one set of arrays sorted by state,
+    district and year; each district is a contiguous slice of them.
+    """
+
+    def __init__(self, groundwater):
+        states = pd.Categorical(groundwater["State"])
+        districts = pd.Categorical(groundwater["District"])
+        years = pd.Categorical(groundwater["Year"])
+        depths = pd.Categorical(pd.concat([groundwater["Pre_Monsoon"], groundwater["Post_Monsoon"]]))
+        order = np.lexsort((years.codes, districts.codes, states.codes))
+
+        self.stateNames = list(states.categories)
+        self.districtNames = list(districts.categories)
+        self.yearLabels = np.array(years.categories, dtype=object)
+        self.depthLabels = np.array(depths.categories, dtype=object)
+        self.depthMidpoints = np.array(
+            [None if np.isnan(r.midpoint) else r.midpoint for r in map(parseDepthRange, self.depthLabels)], dtype=object
+        )
+
+        self.stateCodes = states.codes[order]
+        self.districtCodes = districts.codes[order]
+        self.yearCodes = years.codes[order]
+        self.preCodes = depths.codes[:len(groundwater)][order]
+        self.postCodes = depths.codes[len(groundwater):][order]
+
+        # Group boundaries: each (state, district) run in the sorted arrays
+        change = np.flatnonzero(
+            (np.diff(self.stateCodes) != 0) | (np.diff(self.districtCodes) != 0)
+        ) + 1
+        starts = np.concatenate([[0], change]) if len(order) else change
+        ends = np.concatenate([change, [len(order)]]) if len(order) else change
+
+        self.stateLookup = {name.strip().upper(): code for code, name in enumerate(self.stateNames)}
+        # state code -> [(district name key, start, end)], districts in name order
+        self.groups = {code: [] for code in range(len(self.stateNames))}
+        self.districtLookup = {}
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            stateCode = int(self.stateCodes[start])
+            districtName = self.districtNames[self.districtCodes[start]]
+            self.groups[stateCode].append((districtName, start, end))
+            self.districtLookup[(stateCode, districtName.strip().upper())] = (start, end)
+
+    def findState(self, state):
+        return self.stateLookup.get(state.strip().upper())
+
+    def series(self, stateCode, districtName, start, end, fields):
+        record = {"state": self.stateNames[stateCode], "district": districtName}
+        for field in fields:
+            if field == "Year":
+                record[field] = self.yearLabels[self.yearCodes[start:end]].tolist()
+            elif field == "Pre_Monsoon":
+                record[field] = self.depthLabels[self.preCodes[start:end]].tolist()
+            elif field == "Post_Monsoon":
+                record[field] = self.depthLabels[self.postCodes[start:end]].tolist()
+            elif field == "Pre_Monsoon_Midpoint":
+                record[field] = self.depthMidpoints[self.preCodes[start:end]].tolist()
+            elif field == "Post_Monsoon_Midpoint":
+                record[field] = self.depthMidpoints[self.postCodes[start:end]].tolist()
+        return record
+
+    def district(self, state, district, fields=TREND_FIELDS):
+        """One district's history, or None when the state or district is unknown."""
+        stateCode = self.findState(state)
+        if stateCode is None:
+            return None
+        span = self.districtLookup.get((stateCode, district.strip().upper()))
+        if span is None:
+            return None
+        start, end = span
+        return self.series(stateCode, self.districtNames[self.districtCodes[start]], start, end, fields)
+
+    def state(self, state, offset=0, limit=50, fields=TREND_FIELDS):
+        """A page of a state's district histories, or None for an unknown state."""
+        stateCode = self.findState(state)
+        if stateCode is None:
+            return None
+        groups = self.groups[stateCode]
+        return {
+            "state": self.stateNames[stateCode],
+            "total": len(groups),
+            "offset": offset,
+            "limit": limit,
+            "districts": [
+                self.series(stateCode, name, start, end, fields)
+                for name, start, end in groups[offset:offset + limit]
+            ],
+        }
+
+
+def parseFields(fields):
+    """Comma separated TREND_FIELDS (case-insensitive) -> list; None means all.
+    Raises ValueError naming any unknown field."""
+    if not fields:
+        return TREND_FIELDS
+    known = {field.upper(): field for field in TREND_FIELDS}
+    selected, unknown = [], []
+    for name in fields.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        field = known.get(name.upper())
+        if field is None:
+            unknown.append(name)
+        elif field not in selected:
+            selected.append(field)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(TREND_FIELDS)}")
+    return selected
+
+
+def etagMatches(ifNoneMatch, *etags):
+    if not ifNoneMatch:
+        return False
+    if ifNoneMatch.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    for tag in ifNoneMatch.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in etags:
+            return True
+    return False
+
+
+def acceptsGzip(acceptEncoding):
+    for coding in (acceptEncoding or "").lower().split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class GroundwaterTrends:
+    """The /groundwater-trends payload, built once and kept as encoded JSON.
+
+    The body, its gzip form and a strong ETag for each are rebuilt only when the
+    groundwater tables in the data store change, i.e. when their source
+    CSVs hash differently after the store is recompiled. While a rebuild
+    runs, other requests keep getting the previous build.
+    """
+
+    def __init__(self, holder=storeHolder, tablePattern=TRENDS_TABLES):
+        self.holder = holder
+        self.tablePattern = tablePattern
+        self.lock = threading.Lock()
+        self.sourceKey = None
+        # (body, gzip body, etag, gzip etag), swapped as one so readers never mix builds
+        self.encoded = None
+        self.trendIndex = None
+        self.trendForecast = None
+        self.files = []
+        self.duplicateFiles = []
+        self.builds = 0
+        self.buildSeconds = 0.0
+        self.notModified = 0
+        self.served = 0
+
+    def refresh(self):
+        store = self.holder.get()
+        tables = sorted(fnmatch.filter(store.tables(), self.tablePattern))
+        sourceKey = tuple((table, store.tableHashes[table]) for table in tables)
+        if sourceKey == self.sourceKey:
+            return
+        if not self.lock.acquire(blocking=self.encoded is None):
+            return
+        try:
+            if sourceKey != self.sourceKey:
+                self.build(store, tables)
+                self.sourceKey = sourceKey
+        finally:
+            self.lock.release()
+
+    def build(self, store, tables):
+        start = time.perf_counter()
+        groundwater, skipped = loadGroundwaterTables(store, tables)
+        # Same encoding as FastAPI's JSONResponse
+        body = json.dumps(
+            trendPayload(groundwater), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.trendIndex = TrendIndex(groundwater)
+        self.trendForecast = TrendForecast(self.trendIndex)
+        self.encoded = (body, gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}"', f'"{digest}-gzip"')
+        self.files = [f"{table}.csv" for table in tables if table not in skipped]
+        self.duplicateFiles = [f"{table}.csv" for table in skipped]
+        self.builds += 1
+        self.buildSeconds = time.perf_counter() - start
+
+    def index(self):
+        """The TrendIndex of the current build."""
+        self.refresh()
+        return self.trendIndex
+
+    def forecast(self):
+        """The TrendForecast of the current build."""
+        self.refresh()
+        return self.trendForecast
+
+    def response(self, ifNoneMatch=None, acceptEncoding=None):
+        """(status, body, headers) for a GET with the given request headers."""
+        self.refresh()
+        body, gzipBody, etag, gzipEtag = self.encoded
+        gzipped = acceptsGzip(acceptEncoding)
+        headers = {"ETag": gzipEtag if gzipped else etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        # Either tag names the current build, whichever encoding it was cached in
+        if etagMatches(ifNoneMatch, etag, gzipEtag):
+            self.notModified += 1
+            return 304, b"", headers
+        self.served += 1
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+            return 200, gzipBody, headers
+        return 200, body, headers
+
+    def stats(self):
+        body, gzipBody, etag, gzipEtag = self.encoded or (b"", b"", None, None)
+        return {
+            "files": self.files,
+            "duplicateFiles": self.duplicateFiles,
+            "etag": etag,
+            "gzipEtag": gzipEtag,
+            "bytes": len(body),
+            "gzipBytes": len(gzipBody),
+            "builds": self.builds,
+            "lastBuildMs": round(self.buildSeconds * 1000, 3),
+            "forecast": self.trendForecast.summary if self.trendForecast is not None else None,
+            "served": self.served,
+            "notModified": self.notModified,
+        }